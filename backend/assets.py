@@ -0,0 +1,98 @@
+import collections
+import functools
+import os
+
+# ================================
+# Asset Cache
+# ================================
+# Images and fonts are loaded once per process on first use, and rotated sprites are
+# cached per angle bucket so drawing never calls pygame.transform.rotate twice for the
+# same sprite and angle. pygame itself is only imported on first use, so importing the
+# simulation classes stays cheap and headless.
+#
+# Relative asset paths resolve against ASSET_DIR (this package, or $PARKING_ASSETS),
+# not the working directory.
+
+ASSET_DIR = os.environ.get("PARKING_ASSETS") or os.path.dirname(os.path.abspath(__file__))
+
+CAR_SIZE = (60, 30)
+CART_SIZE = (40, 20)
+CART_COLOR = (0, 100, 200)
+
+
+def asset_path(name):
+    return name if os.path.isabs(name) else os.path.join(ASSET_DIR, name)
+
+@functools.lru_cache(maxsize=None)
+def load_image(path, size=None):
+    import pygame
+    image = pygame.image.load(asset_path(path))
+    if size is not None:
+        image = pygame.transform.scale(image, size)
+    return image
+
+def car_image():
+    return load_image("car.png", CAR_SIZE)
+
+@functools.lru_cache(maxsize=None)
+def solid_image(size, color):
+    import pygame
+    image = pygame.Surface(size, pygame.SRCALPHA)
+    image.fill(color)
+    return image
+
+def cart_image():
+    return solid_image(CART_SIZE, CART_COLOR)
+
+@functools.lru_cache(maxsize=None)
+def get_font(name, size):
+    import pygame
+    if not pygame.font.get_init():
+        pygame.font.init()
+    return pygame.font.SysFont(name, size)
+
+
+class RotationCache:
+    # LRU of rotated sprites keyed by (sprite key, angle bucket)
+    def __init__(self, resolution=1.0, max_entries=2048):
+        self.resolution = resolution
+        self.max_entries = max_entries
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def bucket(self, angle_deg):
+        return int(round(angle_deg / self.resolution)) % int(round(360 / self.resolution))
+
+    def rotated(self, key, image, angle_deg):
+        # Same result as pygame.transform.rotate(image, angle_deg), snapped to the resolution
+        entry_key = (key, self.bucket(angle_deg))
+        sprite = self.entries.get(entry_key)
+        if sprite is not None:
+            self.hits += 1
+            self.entries.move_to_end(entry_key)
+            return sprite
+        self.misses += 1
+        import pygame
+        sprite = pygame.transform.rotate(image, entry_key[1] * self.resolution)
+        self.entries[entry_key] = sprite
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return sprite
+
+    def prerotate(self, key, image):
+        # Fill every bucket up front, e.g. before recording a long replay
+        steps = int(round(360 / self.resolution))
+        for i in range(steps):
+            self.rotated(key, image, i * self.resolution)
+
+    def clear(self):
+        self.entries.clear()
+
+
+rotation_cache = RotationCache()
+
+def blit_rotated(surface, key, image, angle_deg, center):
+    # Draw image rotated by angle_deg (pygame convention) centered on center; returns the rect
+    sprite = rotation_cache.rotated(key, image, angle_deg)
+    return surface.blit(sprite, sprite.get_rect(center=center))
@@ -0,0 +1,137 @@
+import numpy as np
+
+from car import Car, WIDTH, HEIGHT
+from collision import car_boxes, collided
+from physics import integrate
+from raycast import MAX_SENSOR_DISTANCE, SENSOR_LABELS, cast_sensors
+
+# ================================
+# Batched Car Environment
+# ================================
+# N cars stored as structure-of-arrays and advanced with one vectorized bicycle-model
+# update. Mirrors Car.apply_action / Car.update_position so results match the scalar model.
+# Cars are driven by actions only (no rule-based auto mode) and there is no reward
+# signal: rewards are zeros, and an episode ends on a collision (with
+# terminate_on_collision) or after max_steps. With sensors=True every step also casts
+# the 8 distance sensors of all cars against geometry in one call (sensor_distances).
+
+# Observation columns
+X, Y, ANGLE, SPEED, STEERING = range(5)
+OBS_SIZE = 5
+
+
+class BatchCarEnv:
+    def __init__(self, num_envs, start=(400, 300), start_noise=0.0, max_steps=1000, seed=None,
+                 geometry=None, terminate_on_collision=True, dt=1.0, substeps=1, integrator="euler",
+                 sensors=False):
+        self.num_envs = num_envs
+        self.start = start
+        self.start_noise = start_noise
+        self.max_steps = max_steps
+        self.geometry = geometry        # static SceneGeometry shared by every env, or None
+        self.terminate_on_collision = terminate_on_collision
+        self.sensors = sensors
+        self.dt = dt
+        self.substeps = substeps
+        self.integrator = integrator
+
+        # Share the car parameters with the scalar model
+        ref = Car(0, 0)
+        self.max_speed = ref.max_speed
+        self.acceleration = ref.acceleration
+        self.max_steering = ref.max_steering
+        self.length = ref.length
+        self.steer_rate = np.radians(2)
+
+        self.x = np.zeros(num_envs)
+        self.y = np.zeros(num_envs)
+        self.angle = np.zeros(num_envs)
+        self.speed = np.zeros(num_envs)
+        self.steering_angle = np.zeros(num_envs)
+        self.steps = np.zeros(num_envs, dtype=np.int32)
+        self.collided = np.zeros(num_envs, dtype=bool)
+        # Clipped like ParkingEnv's observation: MAX_SENSOR_DISTANCE when nothing is hit
+        self.sensor_distances = np.full((num_envs, len(SENSOR_LABELS)), float(MAX_SENSOR_DISTANCE))
+
+        self.obs = np.zeros((num_envs, OBS_SIZE), dtype=np.float32)
+        self.rng = np.random.default_rng(seed)
+
+    def reset(self, seed=None, mask=None):
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+        if mask is None:
+            mask = np.ones(self.num_envs, dtype=bool)
+        n = int(np.count_nonzero(mask))
+
+        self.x[mask] = self.start[0]
+        self.y[mask] = self.start[1]
+        if self.start_noise:
+            self.x[mask] += self.rng.uniform(-self.start_noise, self.start_noise, n)
+            self.y[mask] += self.rng.uniform(-self.start_noise, self.start_noise, n)
+        self.angle[mask] = 0
+        self.speed[mask] = 0
+        self.steering_angle[mask] = 0
+        self.steps[mask] = 0
+        self.collided[mask] = False
+        return self.observe(), {}
+
+    def observe(self):
+        obs = self.obs
+        obs[:, X] = self.x
+        obs[:, Y] = self.y
+        obs[:, ANGLE] = self.angle
+        obs[:, SPEED] = self.speed
+        obs[:, STEERING] = self.steering_angle
+        return obs
+
+    def apply_action(self, throttle, steer):
+        # Same branches as Car.apply_action, evaluated for every car at once
+        dt = self.dt
+        speed = self.speed
+        self.speed = np.where(
+            throttle > 0, np.minimum(speed + throttle * self.acceleration * dt, self.max_speed),
+            np.where(throttle < 0, np.maximum(speed + throttle * self.acceleration * dt, -self.max_speed / 2),
+                     speed * 0.95 ** dt))
+
+        steering = self.steering_angle
+        self.steering_angle = np.where(
+            steer < 0, np.maximum(steering + steer * self.steer_rate * dt, -self.max_steering),
+            np.where(steer > 0, np.minimum(steering + steer * self.steer_rate * dt, self.max_steering),
+                     steering * 0.8 ** dt))
+
+        self.update_position()
+
+    def update_position(self):
+        # Same integrator as Car.update_position, clamped to screen bounds
+        self.x, self.y, self.angle = integrate(
+            self.x, self.y, self.angle, self.speed, self.steering_angle, self.length,
+            self.dt, self.substeps, self.integrator, bounds=(WIDTH, HEIGHT), xp=np)
+
+    def step(self, actions):
+        actions = np.asarray(actions, dtype=np.float64)
+        self.apply_action(actions[:, 0], actions[:, 1])
+        self.steps += 1
+
+        if self.geometry is not None:
+            self.collided = collided(car_boxes(self.x, self.y, self.angle), self.geometry)
+
+        obs = self.observe()
+        rewards = np.zeros(self.num_envs, dtype=np.float32)
+        if self.terminate_on_collision:
+            terminated = self.collided.copy()
+        else:
+            terminated = np.zeros(self.num_envs, dtype=bool)
+        truncated = self.steps >= self.max_steps
+        infos = {"collision": self.collided.copy()}
+
+        # Auto-reset finished envs, keeping their last observation like gym vector envs
+        done = terminated | truncated
+        if done.any():
+            infos["final_observation"] = obs[done].copy()
+            infos["final_index"] = np.flatnonzero(done)
+            self.reset(mask=done)
+        if self.sensors and self.geometry is not None:
+            # After the auto-reset, so the readings match the returned observations
+            np.minimum(cast_sensors(self.x, self.y, self.angle, self.geometry), MAX_SENSOR_DISTANCE,
+                       out=self.sensor_distances)
+        return obs, rewards, terminated, truncated, infos
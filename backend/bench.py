@@ -0,0 +1,259 @@
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+# Benchmarks run without a real window
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import numpy as np
+import pygame
+
+from assets import asset_path
+from batch_env import BatchCarEnv
+from car import Car
+from parking_env import OBS_SIZE
+from policy import MLPPolicy
+from raycast import SceneGeometry
+from scenarios import generate_valid, random_layout
+from sim import Simulation
+from store import ObstacleStore
+from yellow import LineTracker, YellowMap
+
+# ================================
+# Benchmark runner
+# ================================
+# python bench.py [--output results.json] [--baseline baseline.json]
+# Assets are found next to the modules (see assets.ASSET_DIR). Without car.png and
+# background.png the yellow benchmarks run on a generated scenario's parking lines and
+# the frame benchmarks (which draw the game itself) are skipped.
+
+ASSETS = ("car.png", "background.png")
+
+def measure(fn, min_time=0.2, min_reps=5):
+    # Call fn until min_time has passed; per-call timings in microseconds
+    times = []
+    start = time.perf_counter()
+    while len(times) < min_reps or time.perf_counter() - start < min_time:
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1e6)
+    times.sort()
+    return {
+        "reps": len(times),
+        "mean_us": statistics.fmean(times),
+        "median_us": statistics.median(times),
+        "min_us": times[0],
+        "p95_us": times[int(0.95 * (len(times) - 1))],
+        "ops_per_s": 1e6 / statistics.median(times),
+    }
+
+def random_obstacles(n, rng):
+    # Spread over the whole screen, not just the lot
+    return random_layout(rng, n, area=(0, 0, 800, 600))
+
+
+def bench_cast_sensor(results, rng, surface):
+    car = Car(400, 300)
+    for n in (0, 10, 100, 1000):
+        obstacles = random_obstacles(n, rng)
+        results[f"cast_sensor[{n}]"] = measure(lambda: car.cast_sensor(obstacles))
+        store, _ = ObstacleStore.from_obstacles(obstacles)
+        results[f"cast_sensor_store[{n}]"] = measure(lambda: car.cast_sensor(store.geometry()))
+    results["cast_sensor_draw[10]"] = measure(lambda: car.cast_sensor(random_obstacles(10, rng), surface))
+
+def bench_sensor_circle(results, surface, yellow_map):
+    car = Car(300, 150)
+    for radius in (70, 80, 150):
+        results[f"cast_sensor_circle_surface[{radius}]"] = measure(
+            lambda: car.cast_sensor_circle(surface, radius, visualize=False))
+    car.yellow_map = yellow_map
+    for radius in (70, 80, 150):
+        results[f"cast_sensor_circle_map[{radius}]"] = measure(
+            lambda: car.cast_sensor_circle(None, radius, visualize=False))
+
+def bench_yellow(results, yellow_map):
+    results["line_samples[150]"] = measure(lambda: yellow_map.line_samples((300, 150), 150))
+    # Car driving back and forth, so segments enter and leave the sensor disk
+    path = [(300 + dx, 150) for dx in range(-40, 41, 2)] + [(300 - dx, 150) for dx in range(-40, 41, 2)]
+    tracker = LineTracker(yellow_map, 150)
+    positions = itertools.cycle(path)
+    results["line_tracker_moving"] = measure(lambda: tracker.update(*next(positions)))
+
+    sim = Simulation(yellow_map=yellow_map, start=(300, 150))
+    positions = itertools.cycle(path)
+
+    def update_segments():
+        sim.car.x, sim.car.y = next(positions)
+        sim.update_yellow_segments()
+    results["update_yellow_segments_moving"] = measure(update_segments)
+
+def bench_update_position(results):
+    car = Car(400, 300)
+    car.speed, car.steering_angle = 2.0, 0.2
+
+    def run():
+        for _ in range(1000):
+            car.update_position()
+    stats = measure(run)
+    results["update_position[x1000]"] = {**stats, "ops_per_s": stats["ops_per_s"] * 1000}
+
+def bench_frame(results, random_car, yellow_map, rng):
+    # One iteration of random_car.main() without clock.tick; the static layer is
+    # invalidated every frame for frame_full to time a full redraw
+    random_car.obstacles[:] = random_obstacles(10, rng)
+    random_car.sim = sim = Simulation(random_car.obstacles, yellow_map, start=(300, 150))
+
+    def frame(mode):
+        random_car.handle_events()
+        random_car.update_logic(sim, mode)
+        random_car.renderer.draw(lambda surface: random_car.draw_ui(surface, mode), random_car.draw_scene)
+        random_car.renderer.present()
+
+    results["frame_manual"] = measure(lambda: frame("manual"))
+
+    def full_frame():
+        random_car.renderer.invalidate()
+        frame("manual")
+    results["frame_full"] = measure(full_frame)
+    sim.reset()
+    with contextlib.redirect_stdout(io.StringIO()):
+        results["frame_auto"] = measure(lambda: frame("auto"))
+
+def bench_headless(results, yellow_map, rng, steps=2000):
+    for label, ymap in (("headless_steps", None), ("headless_steps_yellow", yellow_map)):
+        sim = Simulation(random_obstacles(10, rng), ymap, start=(300, 150))
+        with contextlib.redirect_stdout(io.StringIO()):
+            t0 = time.perf_counter()
+            for i in range(steps):
+                sim.step(None if i % 2 else (1, 0.3))
+            elapsed = time.perf_counter() - t0
+        results[label] = {"reps": steps, "mean_us": elapsed / steps * 1e6,
+                          "median_us": elapsed / steps * 1e6, "steps_per_s": steps / elapsed,
+                          "ops_per_s": steps / elapsed}
+
+def bench_batch(results, rng, cars=256, steps=200):
+    # Training throughput: every car's kinematics, collisions and 8 sensors in one call
+    # per step, against the same 10-obstacle scenes as bench_headless. Counts car-steps.
+    geometry = SceneGeometry.from_obstacles(random_obstacles(10, rng))
+    env = BatchCarEnv(cars, start_noise=150, seed=0, geometry=geometry, terminate_on_collision=False,
+                      sensors=True)
+    env.reset()
+    actions = np.random.default_rng(0).uniform(-1, 1, size=(steps, cars, 2))
+    t0 = time.perf_counter()
+    for a in actions:
+        env.step(a)
+    elapsed = time.perf_counter() - t0
+    results[f"batch_steps[{cars}]"] = {"reps": steps, "mean_us": elapsed / steps * 1e6,
+                                        "median_us": elapsed / steps * 1e6,
+                                        "steps_per_s": steps * cars / elapsed, "ops_per_s": steps / elapsed}
+
+def bench_policy(results, seed, cars=64):
+    # One stacked call for every car against one call per car
+    policy = MLPPolicy.random((OBS_SIZE, 64, 64, 2), seed)
+    obs = np.random.default_rng(seed).normal(size=(cars, OBS_SIZE)).astype(np.float32)
+    results[f"policy_batched[{cars}]"] = measure(lambda: policy(obs))
+
+    def per_car():
+        for i in range(cars):
+            policy(obs[i:i + 1])
+    results[f"policy_per_car[{cars}]"] = measure(per_car)
+
+def bench_import(results):
+    # Cold start of a worker process that only needs the simulation
+    command = [sys.executable, "-c", "import sim"]
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    results["import_sim_process"] = measure(lambda: subprocess.run(command, cwd=cwd, check=True), min_reps=3)
+
+
+def load_scene(seed):
+    # -> (yellow_map, surface, random_car or None). The game's background when the
+    # assets exist, otherwise the lines of generate_valid(seed) painted on black.
+    missing = [name for name in ASSETS if not os.path.exists(asset_path(name))]
+    if not missing:
+        import random_car
+        random_car.init_display()  # opens the (dummy) display and loads assets
+        return YellowMap.from_image(asset_path("background.png")), random_car.background.copy(), random_car
+    print(f"bench: {', '.join(missing)} not found in {os.path.dirname(asset_path(missing[0]))} "
+          "(set PARKING_ASSETS); using a generated scenario and skipping the frame benchmarks",
+          file=sys.stderr)
+    yellow_map = generate_valid(seed).yellow_map
+    pixels = np.zeros(yellow_map.sensor_mask.shape + (3,), dtype=np.uint8)
+    pixels[yellow_map.sensor_mask] = (255, 220, 0)
+    return yellow_map, pygame.surfarray.make_surface(pixels), None
+
+
+def run_all(seed=0):
+    rng = random.Random(seed)
+    yellow_map, surface, random_car = load_scene(seed)
+
+    results = {}
+    bench_cast_sensor(results, rng, surface)
+    bench_sensor_circle(results, surface, yellow_map)
+    bench_yellow(results, yellow_map)
+    bench_update_position(results)
+    if random_car is not None:
+        bench_frame(results, random_car, yellow_map, rng)
+    bench_headless(results, yellow_map, rng)
+    bench_batch(results, rng)
+    bench_policy(results, seed)
+    bench_import(results)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "seed": seed,
+            "assets": random_car is not None,
+        },
+        "results": results,
+    }
+
+def compare(current, baseline, threshold):
+    # Returns names whose median got slower than baseline by more than threshold
+    regressions = []
+    for name, stats in current["results"].items():
+        base = baseline["results"].get(name)
+        if not base:
+            continue
+        ratio = stats["median_us"] / base["median_us"]
+        flag = "REGRESSION" if ratio > threshold else ""
+        print(f"{name:40s} {base['median_us']:12.1f} -> {stats['median_us']:12.1f} us  x{ratio:5.2f} {flag}")
+        if ratio > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time simulator hot paths")
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--baseline", help="compare against a stored results JSON")
+    parser.add_argument("--threshold", type=float, default=1.2, help="slowdown ratio counted as a regression")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    current = run_all(args.seed)
+    text = json.dumps(current, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if compare(current, baseline, args.threshold):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,19 @@
 
-import pygame
 import sys
 import math
 import random
 
+from assets import blit_rotated, car_image, get_font
 from obstacle import *
+from physics import integrate
+from raycast import SENSOR_CONFIGS, MAX_SENSOR_DISTANCE, SceneGeometry, cast_sensors
+from telemetry import NULL_TELEMETRY, EVENT, DEBUG
+from yellow import disk_pixels, sensor_yellow
 
 # Screen setup
 WIDTH, HEIGHT = 800, 600  # Wider screen
 GAME_WIDTH = 600           # Game area
 
-# Load car sprite
-car_image = pygame.image.load("car.png")
-car_image = pygame.transform.scale(car_image, (60, 30))
-
 # ================================
 # Car Class
 # ================================
@@ -28,55 +28,84 @@ class Car:
         self.steering_angle = 0
         self.max_steering = math.radians(30)
         self.length = 50
+        self.dt = 1.0                  # Model time per step, in 60 FPS frames
+        self.substeps = 1              # Integrator sub-steps per step
+        self.integrator = "euler"      # "euler" (semi-implicit, the original) or "rk4"
         self.auto_state = "scanning"   # Initial auto mode state
         self.sensor_data = {}          # Store sensor distances
+        self.sensor_distances = [math.inf] * len(SENSOR_CONFIGS)  # Latest cast, inf = no hit
         self.parked_timer = 0          # Time counter to stop at final state
+        self.yellow_map = None         # Optional YellowMap, replaces reading the screen
+        self.spot_map = None           # Optional OccupancyGrid, replaces both for the spot test
+        self.plan = None               # planner.Plan tracked in the "following" state
+        self.telemetry = NULL_TELEMETRY  # Controller events; see telemetry.py
+        self._last_decision = None     # Last DEBUG decision logged, to skip repeats
+
+    def draw(self, surface, pose=None):
+        # pose: optional (x, y, angle) to draw instead of the physics state, e.g. interpolated
+        import pygame
+        x, y, angle = pose or (self.x, self.y, self.angle)
 
-    def draw(self, surface):
         # Draw sensor circle around the car
         sensor_radius = 150
-        pygame.draw.circle(surface, (200, 200, 200), (int(self.x), int(self.y)), sensor_radius, 1)
+        circle_rect = pygame.draw.circle(surface, (200, 200, 200), (int(x), int(y)), sensor_radius, 1)
 
         # Draw the car image rotated
-        rotated_car = pygame.transform.rotate(car_image, -math.degrees(self.angle))
-        rect = rotated_car.get_rect(center=(self.x, self.y))
-        surface.blit(rotated_car, rect.topleft)
+        return circle_rect.union(blit_rotated(surface, "car", car_image(), -math.degrees(angle), (x, y)))
 
     def move_manual(self, keys):
-        if keys[pygame.K_UP]:
-            self.speed = min(self.speed + self.acceleration, self.max_speed)
-        elif keys[pygame.K_DOWN]:
-            self.speed = max(self.speed - self.acceleration, -self.max_speed / 2)
+        import pygame
+        throttle = 1 if keys[pygame.K_UP] else -1 if keys[pygame.K_DOWN] else 0
+        steer = -1 if keys[pygame.K_LEFT] else 1 if keys[pygame.K_RIGHT] else 0
+        self.apply_action(throttle, steer)
+
+    def apply_action(self, throttle, steer):
+        # throttle / steer in [-1, 1]; 0 lets speed and steering relax like releasing the keys
+        # Rates are per frame, so scale them by dt
+        dt = self.dt
+        if throttle > 0:
+            self.speed = min(self.speed + throttle * self.acceleration * dt, self.max_speed)
+        elif throttle < 0:
+            self.speed = max(self.speed + throttle * self.acceleration * dt, -self.max_speed / 2)
         else:
-            self.speed *= 0.95
+            self.speed *= 0.95 ** dt
 
-        if keys[pygame.K_LEFT]:
-            self.steering_angle = max(self.steering_angle - math.radians(2), -self.max_steering)
-        elif keys[pygame.K_RIGHT]:
-            self.steering_angle = min(self.steering_angle + math.radians(2), self.max_steering)
+        if steer < 0:
+            self.steering_angle = max(self.steering_angle + steer * math.radians(2) * dt, -self.max_steering)
+        elif steer > 0:
+            self.steering_angle = min(self.steering_angle + steer * math.radians(2) * dt, self.max_steering)
         else:
-            self.steering_angle *= 0.8
+            self.steering_angle *= 0.8 ** dt
 
         self.update_position()
 
-    def cast_sensor_circle(self, surface, radius=80, visualize=True):
+    def cast_sensor_circle(self, surface=None, radius=80, visualize=True):
+        if self.spot_map is not None and not visualize:
+            # Count the yellow pixels mapped so far instead of the current frame
+            return self.spot_map.spot_detected(self.x, self.y, radius)
         yellow_threshold = 20
         yellow_count = 0
         points = []
 
-        for dx in range(-radius, radius):
-            for dy in range(-radius, radius):
-                if dx**2 + dy**2 <= radius**2:
-                    sx = int(self.x + dx)
-                    sy = int(self.y + dy)
-
-                    if 0 <= sx < WIDTH and 0 <= sy < HEIGHT:
-                        r, g, b = surface.get_at((sx, sy))[:3]
-                        if r > 200 and g > 200 and b < 100:
-                            yellow_count += 1
-                            points.append((sx, sy))
-
-        if visualize:
+        if self.yellow_map is not None:
+            # Headless: count from the precomputed mask instead of the drawn frame
+            yellow_count = self.yellow_map.count_in_disk(self.x, self.y, radius)
+            if visualize and surface is not None:
+                points = self.yellow_map.points_in_disk(self.x, self.y, radius)
+        elif surface is not None:
+            import pygame
+            # Same pixels as the old get_at loop, tested in one NumPy pass
+            x0 = max(0, int(self.x) - radius - 1)
+            y0 = max(0, int(self.y) - radius - 1)
+            pixels = pygame.surfarray.pixels3d(surface)
+            window = sensor_yellow(pixels[x0:int(self.x) + radius + 1, y0:int(self.y) + radius + 1])
+            del pixels  # unlock the surface
+            sx, sy = disk_pixels(window, self.x - x0, self.y - y0, radius)
+            yellow_count = len(sx)
+            points = list(zip((sx + x0).tolist(), (sy + y0).tolist()))
+
+        if visualize and surface is not None:
+            import pygame
             # Create a transparent surface for the sensor circle
             overlay = pygame.Surface((radius * 2, radius * 2), pygame.SRCALPHA)
             pygame.draw.circle(overlay, (255, 255, 0, 100), (radius, radius), radius)
@@ -89,77 +118,73 @@ class Car:
 
 
         
-    def cast_sensor(self, obstacles, surface):
-        sensor_configs = [
-            ("Front Left", self.angle - math.pi / 6, (0, 255, 0)),
-            ("Front Center", self.angle, (0, 255, 0)),
-            ("Front Right", self.angle + math.pi / 6, (0, 255, 0)),
-            ("Rear Left", self.angle + math.pi - math.pi / 6, (0, 200, 255)),
-            ("Rear Center", self.angle + math.pi, (0, 200, 255)),
-            ("Rear Right", self.angle + math.pi + math.pi / 6, (0, 200, 255)),
-            ("Side Left", self.angle - math.pi / 2, (255, 165, 0)),  # Orange
-            ("Side Right", self.angle + math.pi / 2, (255, 165, 0))
-        ]
-
-        max_distance = 150
-        font_small = pygame.font.SysFont(None, 20)
-
-        for label, angle, base_color in sensor_configs:
-            for dist in range(0, max_distance, 5):
-                sx = int(self.x + dist * math.cos(angle))
-                sy = int(self.y + dist * math.sin(angle))
-
-                if sx < 0 or sx >= WIDTH or sy < 0 or sy >= HEIGHT:
-                    break
-
-                hit = False
-                for obj in obstacles:
-                    if isinstance(obj, CircleObstacle):
-                        if math.hypot(obj.x - sx, obj.y - sy) <= obj.radius:
-                            hit = True
-                            break
-                    elif isinstance(obj, (CarObstacle, CartObstacle)):
-                        obj_rect = pygame.Rect(obj.x - 30, obj.y - 15, 60, 30)
-                        if obj_rect.collidepoint(sx, sy):
-                            hit = True
-                            break
-
-                    elif isinstance(obj, LineSegment):
-                        if segments_intersect((self.x, self.y), (sx, sy), obj.start, obj.end):
-                            hit = True
-                            break
-                
-                if hit:
-                    self.sensor_data[label] = dist
-                    if dist < 80:
-                        color = (255, 0, 0)
-                    elif dist < 120:
-                        color = (255, 255, 0)
-                    else:
-                        color = base_color
-
-                    pygame.draw.line(surface, color, (self.x, self.y), (sx, sy), 2)
-
-                    # Draw distance label
-                    label_text = font_small.render(f"{label}: {dist}", True, color)
-                    surface.blit(label_text, (sx + 5, sy))
-                    break
+    def cast_sensor(self, obstacles, surface=None):
+        # Exact ray/shape intersections for all 8 sensors at once (see raycast.py).
+        # obstacles may be a list of Obstacle objects or a prebuilt SceneGeometry.
+        geometry = obstacles if isinstance(obstacles, SceneGeometry) else SceneGeometry.from_obstacles(obstacles)
+        self.sensor_distances = cast_sensors(self.x, self.y, self.angle, geometry, MAX_SENSOR_DISTANCE).tolist()
+
+        for (label, _, _), dist in zip(SENSOR_CONFIGS, self.sensor_distances):
+            if dist != math.inf:
+                self.sensor_data[label] = dist
+
+        if surface is not None:
+            self.draw_sensors(surface)
+
+    def draw_sensors(self, surface, pose=None):
+        # Draw the rays of the latest cast; returns the rects touched
+        import pygame
+        x, y, heading = pose or (self.x, self.y, self.angle)
+        max_distance = MAX_SENSOR_DISTANCE
+        font_small = get_font(None, 20)
+        rects = []
+
+        for (label, offset, base_color), dist in zip(SENSOR_CONFIGS, self.sensor_distances):
+            angle = heading + offset
+            if dist != math.inf:
+                if dist < 80:
+                    color = (255, 0, 0)
+                elif dist < 120:
+                    color = (255, 255, 0)
+                else:
+                    color = base_color
+
+                sx = x + dist * math.cos(angle)
+                sy = y + dist * math.sin(angle)
+                rects.append(pygame.draw.line(surface, color, (x, y), (sx, sy), 2))
+
+                # Draw distance label
+                label_text = font_small.render(f"{label}: {dist:.1f}", True, color)
+                rects.append(surface.blit(label_text, (sx + 5, sy)))
             else:
                 # Draw full range if no hit
-                end_x = int(self.x + max_distance * math.cos(angle))
-                end_y = int(self.y + max_distance * math.sin(angle))
-                pygame.draw.line(surface, base_color, (self.x, self.y), (end_x, end_y), 1)
-
-
-    def move_auto(self, surface):
-        self.cast_sensor(obstacles=[], surface=surface)  # Required before using sensor_data
+                end_x = int(x + max_distance * math.cos(angle))
+                end_y = int(y + max_distance * math.sin(angle))
+                rects.append(pygame.draw.line(surface, base_color, (x, y), (end_x, end_y), 1))
+        return rects
+
+    def set_auto_state(self, state):
+        if self.telemetry.level >= EVENT:
+            self.telemetry.emit("state", old=self.auto_state, new=state, x=round(self.x, 1), y=round(self.y, 1))
+        self.auto_state = state
+
+    def log_decision(self, decision, **fields):
+        # DEBUG detail, rate-limited to changes of decision
+        if decision != self._last_decision:
+            self._last_decision = decision
+            self.telemetry.emit("decision", decision=decision, **fields)
+
+    def move_auto(self, surface=None):
+        # Reads sensor_data as left by the latest cast_sensor (Simulation.sense)
+        debug = self.telemetry.level >= DEBUG
 
         if self.auto_state == "scanning":
-            if self.cast_sensor_circle(surface):
-                pygame.draw.circle(surface, (255, 255, 0), (int(self.x), int(self.y)), 10)
-                self.auto_state = "parking"
+            if self.cast_sensor_circle(surface, visualize=surface is not None):
+                if surface is not None:
+                    import pygame
+                    pygame.draw.circle(surface, (255, 255, 0), (int(self.x), int(self.y)), 10)
+                self.set_auto_state("parking")
                 self.speed = 0
-                print("Yellow lines detected: switching to parking mode")
                 return
 
             self.speed = 2
@@ -170,13 +195,16 @@ class Car:
             if front < 80:
                 self.speed = 0
                 self.steering_angle = math.radians(-25 if left > right else 25)
-                print("Obstacle ahead! Turning to avoid")
+                if debug:
+                    self.log_decision("obstacle_ahead")
             elif left < 50:
                 self.steering_angle = math.radians(20)
-                print("Obstacle on left! Steering right")
+                if debug:
+                    self.log_decision("obstacle_left")
             elif right < 50:
                 self.steering_angle = math.radians(-20)
-                print("Obstacle on right! Steering left")
+                if debug:
+                    self.log_decision("obstacle_right")
             left_side = self.sensor_data.get("Side Left", 200)
             right_side = self.sensor_data.get("Side Right", 200)
 
@@ -184,40 +212,49 @@ class Car:
             if left_side < 40 and right_side < 40:
                 self.speed = 0
                 self.steering_angle = math.radians(30 if left_side > right_side else -30)
-                print("Tight squeeze! Steering sharply to avoid.")
+                if debug:
+                    self.log_decision("tight_squeeze")
             elif left_side < 50:
                 self.steering_angle = math.radians(20)
-                print("Wall too close on left! Steering right")
+                if debug:
+                    self.log_decision("wall_left")
             elif right_side < 50:
                 self.steering_angle = math.radians(-20)
-                print("Wall too close on right! Steering left")
+                if debug:
+                    self.log_decision("wall_right")
 
             else:
                 self.steering_angle *= 0.9
-                print("Clear path, going forward")
+                if debug:
+                    self.log_decision("clear")
 
         elif self.auto_state == "parking":
-            self.execute_parking_maneuver()
+            self.execute_parking_maneuver(surface)
+
+        elif self.auto_state == "following":
+            self.follow_plan()
 
         self.update_position()
 
 
     def update_position(self):
-        if self.steering_angle:
-            turning_radius = self.length / math.tan(self.steering_angle)
-            angular_velocity = self.speed / turning_radius
-        else:
-            angular_velocity = 0
-
-        self.angle += angular_velocity
-        self.x += self.speed * math.cos(self.angle)
-        self.y += self.speed * math.sin(self.angle)
-
-        # Clamp to screen bounds
-        self.x = max(0, min(WIDTH, self.x))
-        self.y = max(0, min(HEIGHT, self.y))
+        # Bicycle model over dt, clamped to screen bounds (see physics.py)
+        self.x, self.y, self.angle = integrate(
+            self.x, self.y, self.angle, self.speed, self.steering_angle, self.length,
+            self.dt, self.substeps, self.integrator, bounds=(WIDTH, HEIGHT))
+
+    def follow_plan(self):
+        # Track the planned path one frame at a time; parked when the plan runs out
+        action = self.plan.next_action(self) if self.plan is not None else None
+        if action is None:
+            self.speed = 0
+            self.steering_angle = 0
+            self.plan = None
+            self.set_auto_state("parked")
+            return
+        self.speed, self.steering_angle = action
 
-    def execute_parking_maneuver(self):
+    def execute_parking_maneuver(self, surface=None):
         # Constants
         REVERSE_SPEED = -1.5
         FORWARD_SPEED = 2.0
@@ -236,7 +273,7 @@ class Car:
         side_right = self.sensor_data.get("Side Right", 200)
 
         # Are we inside the parking spot?
-        in_spot = self.cast_sensor_circle(surface=pygame.display.get_surface(), radius=70, visualize=False)
+        in_spot = self.cast_sensor_circle(surface=surface, radius=70, visualize=False)
 
         # Recovery mode: sharply turn out of danger
         if getattr(self, "recovery_timer", 0) > 0:
@@ -244,7 +281,8 @@ class Car:
             self.parked_timer = 0
             self.speed = FORWARD_SPEED
             self.steering_angle = self.recovery_steering_angle
-            print(f"🛠️ Recovering from danger... Frames left: {self.recovery_timer}")
+            if self.recovery_timer == 0 and self.telemetry.level >= EVENT:
+                self.telemetry.emit("recovery_end", x=round(self.x, 1), y=round(self.y, 1))
             return
 
         # Trigger recovery if too close to yellow lines
@@ -254,7 +292,9 @@ class Car:
                 self.recovery_steering_angle = PARKING_ANGLE  # Steer left
             else:
                 self.recovery_steering_angle = -PARKING_ANGLE # Steer right
-            print(f"Too close to line! Initiating recovery. Sides: {side_left}, {side_right}")
+            if self.telemetry.level >= EVENT:
+                self.telemetry.emit("recovery_start", side_left=side_left, side_right=side_right,
+                                    x=round(self.x, 1), y=round(self.y, 1))
             return  # Start recovery next frame
 
         # Check if well parked
@@ -262,7 +302,8 @@ class Car:
             self.parked_timer += 1
             self.speed = 0
             self.steering_angle = 0
-            print(f"Holding... Parked timer: {self.parked_timer}")
+            if self.telemetry.level >= DEBUG:
+                self.log_decision("holding")
         
         else:
             self.parked_timer = 0
@@ -276,11 +317,11 @@ class Car:
             else:
                 self.steering_angle = CENTERING_ANGLE
 
-            print(f"Parking... Reverse. Rear: {rear_center}, Sides: {side_left}, {side_right}")
+            if self.telemetry.level >= DEBUG:
+                self.log_decision("reversing", rear=rear_center, side_left=side_left, side_right=side_right)
 
         # Success
         if self.parked_timer >= SUCCESS_TIMER_LIMIT:
             self.speed = 0
             self.steering_angle = 0
-            self.auto_state = "parked"
-            print("Successfully parked!")
+            self.set_auto_state("parked")
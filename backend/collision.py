@@ -0,0 +1,207 @@
+from collections import namedtuple
+
+import numpy as np
+
+from raycast import SceneGeometry
+
+# ================================
+# Collision detection
+# ================================
+# The car footprint is an oriented box the size of its sprite. Narrow phase uses
+# separating-axis tests against oriented boxes, circles and segments; the broad phase
+# is an AABB overlap test (or SpatialGrid.query_rect for a single car), so only nearby
+# pairs reach the narrow phase. Everything works on arrays, for one car or a batch.
+# Boxes are rows (cx, cy, half_w, half_h, angle), as in SceneGeometry.
+
+CAR_HALF_EXTENTS = (30.0, 15.0)   # 60 x 30 sprite
+
+# Shape kind codes used by collide(); store.ObstacleStore lays out its arrays the same way
+BOX, CIRCLE, SEGMENT = 0, 1, 2
+KIND_NAMES = ("box", "circle", "segment")
+
+# kind: "box", "circle" or "segment"; index: row in the SceneGeometry array of that kind;
+# depth: penetration along the axis of least overlap; obstacle: the source object, if known
+Contact = namedtuple("Contact", "car kind index depth obstacle")
+
+
+def car_boxes(x, y, angle, half_extents=CAR_HALF_EXTENTS):
+    x, y, angle = np.broadcast_arrays(*(np.atleast_1d(np.asarray(v, float)) for v in (x, y, angle)))
+    boxes = np.empty((len(x), 5))
+    boxes[:, 0], boxes[:, 1] = x, y
+    boxes[:, 2], boxes[:, 3] = half_extents
+    boxes[:, 4] = angle
+    return boxes
+
+def box_aabbs(boxes):
+    cos_a, sin_a = np.abs(np.cos(boxes[:, 4])), np.abs(np.sin(boxes[:, 4]))
+    ex = cos_a * boxes[:, 2] + sin_a * boxes[:, 3]
+    ey = sin_a * boxes[:, 2] + cos_a * boxes[:, 3]
+    return np.stack([boxes[:, 0] - ex, boxes[:, 1] - ey, boxes[:, 0] + ex, boxes[:, 1] + ey], axis=1)
+
+def circle_aabbs(circles):
+    return np.stack([circles[:, 0] - circles[:, 2], circles[:, 1] - circles[:, 2],
+                     circles[:, 0] + circles[:, 2], circles[:, 1] + circles[:, 2]], axis=1)
+
+def segment_aabbs(segments):
+    return np.stack([np.minimum(segments[:, 0], segments[:, 2]), np.minimum(segments[:, 1], segments[:, 3]),
+                     np.maximum(segments[:, 0], segments[:, 2]), np.maximum(segments[:, 1], segments[:, 3])], axis=1)
+
+
+# ---- narrow phase, pairwise over rows ----
+# Vectors are (x, y) pairs of column arrays; two multiplies and an add per dot product
+# cost much less than stacking (n, 2) arrays and summing along axis 1.
+
+def _axes(boxes):
+    cos_a, sin_a = np.cos(boxes[:, 4]), np.sin(boxes[:, 4])
+    return (cos_a, sin_a), (-sin_a, cos_a)
+
+def _dot(u, v):
+    return u[0] * v[0] + u[1] * v[1]
+
+def _radius_on(boxes, ux, uy, axis):
+    # Half-length of each box projected on axis
+    return boxes[:, 2] * np.abs(_dot(ux, axis)) + boxes[:, 3] * np.abs(_dot(uy, axis))
+
+def obb_vs_obb(a, b):
+    ax, ay = _axes(a)
+    bx, by = _axes(b)
+    d = (b[:, 0] - a[:, 0], b[:, 1] - a[:, 1])
+    depth = np.full(len(a), np.inf)
+    for axis in (ax, ay, bx, by):
+        overlap = _radius_on(a, ax, ay, axis) + _radius_on(b, bx, by, axis) - np.abs(_dot(d, axis))
+        depth = np.minimum(depth, overlap)
+    return depth > 0, depth
+
+def obb_vs_circle(boxes, circles):
+    ux, uy = _axes(boxes)
+    d = (circles[:, 0] - boxes[:, 0], circles[:, 1] - boxes[:, 1])
+    lx, ly = _dot(d, ux), _dot(d, uy)
+    hw, hh, r = boxes[:, 2], boxes[:, 3], circles[:, 2]
+    # Closest point of the box to the circle center
+    dist = np.hypot(lx - np.clip(lx, -hw, hw), ly - np.clip(ly, -hh, hh))
+    inside = (np.abs(lx) <= hw) & (np.abs(ly) <= hh)
+    depth = np.where(inside, r + np.minimum(hw - np.abs(lx), hh - np.abs(ly)), r - dist)
+    return depth > 0, depth
+
+def obb_vs_segment(boxes, segments):
+    ux, uy = _axes(boxes)
+    p1 = (segments[:, 0] - boxes[:, 0], segments[:, 1] - boxes[:, 1])
+    p2 = (segments[:, 2] - boxes[:, 0], segments[:, 3] - boxes[:, 1])
+    depth = np.full(len(boxes), np.inf)
+
+    # Box axes: segment interval [lo, hi] against [-half, half]. Depth is the shorter push
+    # out either way, as in obb_vs_obb, so a segment along an axis still has depth > 0.
+    for axis, half in ((ux, boxes[:, 2]), (uy, boxes[:, 3])):
+        s1, s2 = _dot(p1, axis), _dot(p2, axis)
+        overlap = np.minimum(np.maximum(s1, s2) + half, half - np.minimum(s1, s2))
+        depth = np.minimum(depth, overlap)
+
+    # Segment normal: the segment projects to a point
+    ex, ey = p2[0] - p1[0], p2[1] - p1[1]
+    length = np.hypot(ex, ey)
+    safe = np.where(length > 0, length, 1.0)
+    normal = (np.where(length > 0, -ey / safe, 1.0), np.where(length > 0, ex / safe, 0.0))
+    c = _dot(p1, normal)
+    r = _radius_on(boxes, ux, uy, normal)
+    depth = np.minimum(depth, r - np.abs(c))
+    return depth > 0, depth
+
+
+# ---- broad + narrow ----
+
+def _overlapping_pairs(a_bounds, b_bounds):
+    hit = ((a_bounds[:, None, 0] <= b_bounds[None, :, 2]) & (a_bounds[:, None, 2] >= b_bounds[None, :, 0])
+           & (a_bounds[:, None, 1] <= b_bounds[None, :, 3]) & (a_bounds[:, None, 3] >= b_bounds[None, :, 1]))
+    return np.nonzero(hit)
+
+def collide(cars, geometry):
+    # cars: (N, 5) boxes from car_boxes(). Returns contact arrays (car, kind, index, depth),
+    # kind coded BOX, CIRCLE or SEGMENT.
+    car_bounds = box_aabbs(cars)
+    out_car, out_kind, out_index, out_depth = [], [], [], []
+    tests = ((BOX, geometry.boxes, box_aabbs, obb_vs_obb),
+             (CIRCLE, geometry.circles, circle_aabbs, obb_vs_circle),
+             (SEGMENT, geometry.segments, segment_aabbs, obb_vs_segment))
+    for code, shapes, bounds, narrow in tests:
+        if not len(shapes):
+            continue
+        ci, si = _overlapping_pairs(car_bounds, bounds(shapes))
+        if not len(ci):
+            continue
+        hit, depth = narrow(cars[ci], shapes[si])
+        out_car.append(ci[hit])
+        out_kind.append(np.full(int(hit.sum()), code))
+        out_index.append(si[hit])
+        out_depth.append(depth[hit])
+    if not out_car:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty, np.zeros(0)
+    return np.concatenate(out_car), np.concatenate(out_kind), np.concatenate(out_index), np.concatenate(out_depth)
+
+def collided(cars, geometry):
+    # Boolean per car
+    car_index = collide(cars, geometry)[0]
+    hit = np.zeros(len(cars), dtype=bool)
+    hit[car_index] = True
+    return hit
+
+# ---- clearance ----
+# Exact distance from one box to the nearest shape. Two convex shapes that do not overlap
+# are as far apart as their closest pair of edges (segments count as one edge, circles as
+# a center point less the radius); shapes the SAT tests find overlapping report minus
+# their penetration depth instead.
+
+def box_edges(boxes):
+    # (4 * len(boxes), 4) outline segments (x1, y1, x2, y2)
+    ux, uy = _axes(boxes)
+    hw, hh = boxes[:, 2], boxes[:, 3]
+    corners = [(boxes[:, 0] + sx * hw * ux[0] + sy * hh * uy[0], boxes[:, 1] + sx * hw * ux[1] + sy * hh * uy[1])
+               for sx, sy in ((-1, -1), (1, -1), (1, 1), (-1, 1))]
+    return np.stack([np.stack([*corners[i], *corners[(i + 1) % 4]], axis=1) for i in range(4)], axis=1).reshape(-1, 4)
+
+def point_segment_distance(px, py, segments):
+    # Broadcast points (...) against segments (M, 4) -> (..., M)
+    x1, y1, x2, y2 = (segments[:, i] for i in range(4))
+    ex, ey = x2 - x1, y2 - y1
+    length_sq = ex * ex + ey * ey
+    wx, wy = px[..., None] - x1, py[..., None] - y1
+    t = np.clip((wx * ex + wy * ey) / np.where(length_sq > 0, length_sq, 1.0), 0, 1)
+    return np.hypot(wx - t * ex, wy - t * ey)
+
+def segment_distance(a, b):
+    # (len(a), len(b)) distances between segments that do not cross: the closest pair of
+    # points always has an endpoint of one of them
+    return np.minimum(
+        np.minimum(point_segment_distance(a[:, 0], a[:, 1], b), point_segment_distance(a[:, 2], a[:, 3], b)),
+        np.minimum(point_segment_distance(b[:, 0], b[:, 1], a), point_segment_distance(b[:, 2], b[:, 3], a)).T)
+
+def obstacle_edges(geometry):
+    # Box outlines and segments of geometry as one (M, 4) segment array
+    return np.concatenate([box_edges(geometry.boxes), geometry.segments])
+
+def box_clearance(box, geometry, edges=None):
+    # Distance from one (5,) box row to the nearest shape in geometry, inf without shapes;
+    # negative (minus the deepest penetration) when the box overlaps something. edges:
+    # obstacle_edges(geometry), for callers testing many boxes against the same shapes.
+    box = np.asarray(box, dtype=float).reshape(1, 5)
+    depth = collide(box, geometry)[3]
+    if len(depth):
+        return -float(depth.max())
+    if edges is None:
+        edges = obstacle_edges(geometry)
+    outline = box_edges(box)
+    gaps = [np.inf]
+    if len(edges):
+        gaps.append(segment_distance(outline, edges).min())
+    if len(geometry.circles):
+        circles = geometry.circles
+        gaps.append((point_segment_distance(circles[:, 0], circles[:, 1], outline).min(axis=1) - circles[:, 2]).min())
+    return float(min(gaps))
+
+def car_contacts(car, obstacles):
+    # Contacts for one Car against a list of obstacles (e.g. from SpatialGrid.query_rect)
+    geometry = obstacles if isinstance(obstacles, SceneGeometry) else SceneGeometry.from_obstacles(obstacles)
+    car_index, kind, index, depth = collide(car_boxes(car.x, car.y, car.angle), geometry)
+    sources = geometry.sources
+    return [Contact(int(c), KIND_NAMES[k], int(i), float(d), sources[KIND_NAMES[k]][i] if sources else None)
+            for c, k, i, d in zip(car_index.tolist(), kind.tolist(), index.tolist(), depth.tolist())]
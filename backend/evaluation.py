@@ -0,0 +1,316 @@
+import argparse
+import math
+import multiprocessing as mp
+import os
+import sys
+import time
+
+import numpy as np
+
+from collision import CAR_HALF_EXTENTS, box_clearance, car_boxes, obstacle_edges
+from parking_env import OBS_SIZE, observe
+from policy import load_policy
+from scenarios import Scenario, ScenarioLibrary, generate_valid
+from sim import Simulation
+from telemetry import EVENT, Telemetry
+
+# ================================
+# Evaluation runner
+# ================================
+# Runs every (controller, scenario seed) episode across worker processes and streams
+# one result per episode as it finishes:
+#   python evaluation.py --controllers rules planner policy.npz --seeds 0:200 --output results.npz
+# Controllers are "rules" (Car.move_auto), "rules_mapped" (the same reading an occupancy
+# grid), "planner" (hybrid A* to the nearest free bay) or a policy file (see policy.py).
+# Scenarios come from generate_valid(seed), or from a ScenarioLibrary with --library.
+# The same seeds give the same episodes on every run.
+#
+# An episode ends when the controller declares "parked", when the car has stood still
+# in a free bay for HOLD_STEPS (policies never declare), or after max_steps. It is a
+# success when the car's footprint ends up inside a free bay, whatever the controller
+# claimed.
+
+HOLD_STEPS = 40
+STOPPED_SPEED = 0.05
+CHECKPOINT_EVERY = 50            # episodes between rewrites of the output file
+
+COLUMNS = (("controller", "U64"), ("seed", np.int64), ("success", np.bool_), ("parked", np.bool_),
+           ("steps", np.int64), ("recoveries", np.int64), ("collision_steps", np.int64),
+           ("min_clearance", np.float64), ("wall_s", np.float64))
+
+
+class EventCounter:
+    # Telemetry sink that only counts events by name
+    def __init__(self):
+        self.counts = {}
+
+    def write(self, records):
+        for r in records:
+            self.counts[r["event"]] = self.counts.get(r["event"], 0) + 1
+
+    def close(self):
+        pass
+
+
+# ---- controllers ----
+# controller(sim, scenario) -> step function driving sim one frame, or None when the
+# controller gives up before moving (e.g. no plan found)
+
+def rules_controller(sim, scenario):
+    return sim.step
+
+def mapped_rules_controller(sim, scenario):
+    # Car.move_auto with the parking-spot test read from the occupancy grid
+    sim.enable_mapping(spot_test=True)
+    return sim.step
+
+def planner_controller(sim, scenario):
+    x, y, _ = scenario.start
+    for bay in sorted(scenario.free_bays, key=lambda bay: math.hypot(bay["x"] - x, bay["y"] - y)):
+        if sim.plan_parking(Scenario.bay_pose(bay)) is not None:
+            return sim.step
+    return None
+
+_policies = {}
+
+def policy_controller(path):
+    def controller(sim, scenario):
+        policy = _policies.get(path)
+        if policy is None:
+            policy = _policies[path] = load_policy(path)
+        obs = np.zeros((1, OBS_SIZE), dtype=np.float32)
+
+        def step():
+            observe(sim, obs[0])
+            sim.step(tuple(policy(obs)[0].tolist()))
+        return step
+    return controller
+
+CONTROLLERS = {"rules": rules_controller, "rules_mapped": mapped_rules_controller,
+               "planner": planner_controller}
+
+def get_controller(name):
+    return CONTROLLERS[name] if name in CONTROLLERS else policy_controller(name)
+
+
+# ---- episodes ----
+
+def bay_rects(scenario):
+    # (n, 5) free bays as (x, y, heading radians, width, depth)
+    rows = [(*Scenario.bay_pose(bay), bay["width"], bay["depth"]) for bay in scenario.free_bays]
+    return np.array(rows, dtype=float).reshape(-1, 5)
+
+def in_bay(car, bays):
+    # Whole footprint between the lines of some free bay (line centers), either way round
+    if not len(bays):
+        return False
+    half_l, half_w = CAR_HALF_EXTENTS
+    c, s = math.cos(car.angle), math.sin(car.angle)
+    corners = np.array([(car.x + dx * c - dy * s, car.y + dx * s + dy * c)
+                        for dx in (-half_l, half_l) for dy in (-half_w, half_w)])
+    dx = corners[:, 0][None] - bays[:, 0:1]
+    dy = corners[:, 1][None] - bays[:, 1:2]
+    ux, uy = np.cos(bays[:, 2:3]), np.sin(bays[:, 2:3])
+    along = np.abs(dx * ux + dy * uy) <= bays[:, 4:5] / 2
+    across = np.abs(-dx * uy + dy * ux) <= bays[:, 3:4] / 2
+    return bool((along & across).all(axis=1).any())
+
+def run_episode(scenario, controller, max_steps=3000):
+    # -> dict with one value per COLUMNS entry except controller and seed
+    t0 = time.perf_counter()
+    sim = scenario.apply(Simulation(), objects=False)
+    counter = EventCounter()
+    sim.car.telemetry = Telemetry(counter, level=EVENT)
+    bays = bay_rects(scenario)
+
+    # Exact distance from the car footprint to the collidable obstacles, negative while
+    # they overlap; parking lines are sensed, not collided with, so they are left out
+    obstacles = sim.store.geometry(list(sim.grid.entries))
+    edges = obstacle_edges(obstacles)
+    min_clearance = math.inf
+
+    step = controller(sim, scenario)
+    car = sim.car
+    collision_steps = 0
+    held = 0
+    parked = False
+    while step is not None and sim.steps < max_steps:
+        step()
+        collision_steps += sim.collided
+        min_clearance = min(min_clearance, box_clearance(car_boxes(car.x, car.y, car.angle)[0], obstacles, edges))
+        if car.auto_state == "parked":
+            parked = True
+            break
+        held = held + 1 if abs(car.speed) < STOPPED_SPEED and in_bay(car, bays) else 0
+        if held >= HOLD_STEPS:
+            parked = True
+            break
+
+    car.telemetry.close()
+    return {"success": in_bay(car, bays), "parked": parked, "steps": sim.steps,
+            "recoveries": counter.counts.get("recovery_start", 0), "collision_steps": collision_steps,
+            "min_clearance": min_clearance if min_clearance != math.inf else np.nan,
+            "wall_s": time.perf_counter() - t0}
+
+
+# ---- workers ----
+
+_worker = {}
+
+def _init_worker(library_dir, max_steps):
+    _worker["library"] = ScenarioLibrary(library_dir) if library_dir else None
+    _worker["max_steps"] = max_steps
+
+def _load_scenario(seed):
+    library = _worker["library"]
+    return library.load(seed) if library is not None else generate_valid(seed)
+
+def _run_task(task):
+    name, seed = task
+    result = run_episode(_load_scenario(seed), get_controller(name), _worker["max_steps"])
+    return {"controller": name, "seed": seed, **result}
+
+def run(controllers, seeds, workers=None, library_dir=None, max_steps=3000, output=None, on_result=None):
+    # Returns one row per episode; on_result sees each as it finishes. output (.npz) is
+    # rewritten every CHECKPOINT_EVERY episodes and at the end, so an interrupted run
+    # keeps what it finished.
+    tasks = [(name, seed) for seed in seeds for name in controllers]
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    rows = []
+
+    if workers <= 1:
+        _init_worker(library_dir, max_steps)
+        results = map(_run_task, tasks)
+        pool = None
+    else:
+        pool = mp.get_context().Pool(workers, _init_worker, (library_dir, max_steps))
+        results = pool.imap_unordered(_run_task, tasks)
+    try:
+        for row in results:
+            rows.append(row)
+            if on_result is not None:
+                on_result(row)
+            if output and len(rows) % CHECKPOINT_EVERY == 0:
+                save_results(output, rows)
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+    if output:
+        save_results(output, rows)
+    return rows
+
+
+# ================================
+# Results
+# ================================
+# .npz with one array per COLUMNS name, rows in completion order
+
+def columns_of(rows):
+    return {name: np.array([row[name] for row in rows], dtype=dtype).reshape(len(rows))
+            for name, dtype in COLUMNS}
+
+def save_results(path, rows):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        np.savez(f, **columns_of(rows))
+    os.replace(tmp, path)
+
+def load_results(path):
+    with np.load(path) as data:
+        return {name: data[name] for name, _ in COLUMNS}
+
+def _wilson(successes, n, z=1.96):
+    # 95% score interval for a success rate
+    if n == 0:
+        return 0.0, 0.0
+    p = successes / n
+    centre = (p + z * z / (2 * n)) / (1 + z * z / n)
+    half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / (1 + z * z / n)
+    return centre - half, centre + half
+
+def summarize(columns, wall_s=None):
+    # Per-controller aggregates
+    summary = {}
+    for name in sorted(set(columns["controller"].tolist())):
+        mask = columns["controller"] == name
+        n = int(mask.sum())
+        success = columns["success"][mask]
+        steps = columns["steps"][mask]
+        low, high = _wilson(int(success.sum()), n)
+        summary[name] = {
+            "episodes": n,
+            "success_rate": float(success.mean()),
+            "success_ci95": (low, high),
+            "steps_to_park": float(np.median(steps[success])) if success.any() else math.nan,
+            "recoveries": float(columns["recoveries"][mask].mean()),
+            "collision_rate": float((columns["collision_steps"][mask] > 0).mean()),
+            "min_clearance": float(np.nanmedian(columns["min_clearance"][mask])),
+            "sim_steps_per_s": float(steps.sum() / columns["wall_s"][mask].sum()),
+        }
+    if wall_s:
+        summary["_total"] = {"episodes": len(columns["seed"]), "wall_s": wall_s,
+                             "episodes_per_s": len(columns["seed"]) / wall_s}
+    return summary
+
+def print_summary(summary, baseline=None):
+    print(f"{'controller':24s} {'episodes':>8s} {'success':>8s} {'95% CI':>13s} {'steps':>6s}"
+          f" {'recov':>6s} {'collide':>8s} {'clear px':>8s} {'steps/s':>8s}")
+    for name, s in summary.items():
+        if name.startswith("_"):
+            continue
+        low, high = s["success_ci95"]
+        line = (f"{name[-24:]:24s} {s['episodes']:8d} {s['success_rate']:8.1%} {low:6.1%}-{high:6.1%}"
+                f" {s['steps_to_park']:6.0f} {s['recoveries']:6.2f} {s['collision_rate']:8.1%}"
+                f" {s['min_clearance']:8.1f} {s['sim_steps_per_s']:8.0f}")
+        if baseline and name in baseline:
+            b = baseline[name]
+            line += (f"   vs baseline: success {s['success_rate'] - b['success_rate']:+.1%},"
+                     f" steps {s['steps_to_park'] - b['steps_to_park']:+.0f}")
+        print(line)
+    total = summary.get("_total")
+    if total:
+        print(f"{total['episodes']} episodes in {total['wall_s']:.1f} s ({total['episodes_per_s']:.1f} episodes/s)")
+
+
+def parse_seeds(text):
+    # "0:100" (range) or "1,5,9"
+    if ":" in text:
+        start, stop = text.split(":")
+        return list(range(int(start), int(stop)))
+    return [int(seed) for seed in text.split(",")]
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate parking controllers on generated lots")
+    parser.add_argument("--controllers", nargs="+", default=["rules"],
+                        help="rules, rules_mapped, planner, or policy files (.npz / .onnx)")
+    parser.add_argument("--seeds", default="0:100", help="START:STOP or a comma list")
+    parser.add_argument("--library", help="ScenarioLibrary directory (default: generate per seed)")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: CPU count)")
+    parser.add_argument("--max-steps", type=int, default=3000)
+    parser.add_argument("--output", help="results .npz")
+    parser.add_argument("--baseline", help="earlier results .npz to compare against")
+    parser.add_argument("--summarize", help="print the summary of a results .npz and exit")
+    parser.add_argument("--quiet", action="store_true", help="no per-episode lines")
+    args = parser.parse_args()
+
+    if args.summarize:
+        print_summary(summarize(load_results(args.summarize)))
+        return
+
+    def report(row):
+        if not args.quiet:
+            print(f"{row['controller'][-24:]:24s} seed {row['seed']:5d}  "
+                  f"{'success' if row['success'] else 'failed ':7s} {row['steps']:5d} steps"
+                  f"  {row['recoveries']:2d} recoveries  {row['collision_steps']:4d} collision steps"
+                  f"  clearance {row['min_clearance']:6.1f} px  {row['wall_s']:.2f} s", flush=True)
+
+    t0 = time.perf_counter()
+    rows = run(args.controllers, parse_seeds(args.seeds), args.workers, args.library, args.max_steps,
+               args.output, report)
+    baseline = summarize(load_results(args.baseline)) if args.baseline else None
+    print_summary(summarize(columns_of(rows), time.perf_counter() - t0), baseline)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,17 +1,16 @@
-import pygame
 import sys
 import math
 import random
 
-# Load car sprite
-car_image = pygame.image.load("car.png")
-car_image = pygame.transform.scale(car_image, (60, 30))
+from assets import blit_rotated, car_image, cart_image
 
 # ================================
 # Obstacle Class
 # ================================
 
 class Obstacle:
+    __slots__ = ()
+
     def draw(self, surface):
         pass
     def is_clicked(self, pos):
@@ -22,19 +21,25 @@ class Obstacle:
         pass
 
 class CarObstacle(Obstacle):
+    __slots__ = ("x", "y", "angle")
+    width, height = 60, 30
+
     def __init__(self, x, y):
-        self.image = pygame.transform.scale(car_image, (60, 30))
         self.angle = 0
         self.x = x
         self.y = y
 
+    @property
+    def image(self):
+        return car_image()
+
     def draw(self, surface):
-        rotated = pygame.transform.rotate(self.image, -self.angle)
-        rect = rotated.get_rect(center=(self.x, self.y))
-        surface.blit(rotated, rect.topleft)
+        return blit_rotated(surface, "car", self.image, -self.angle, (self.x, self.y))
 
     def is_clicked(self, pos):
-        rect = self.image.get_rect(center=(self.x, self.y))
+        import pygame
+        rect = pygame.Rect(0, 0, self.width, self.height)
+        rect.center = (self.x, self.y)
         return rect.collidepoint(pos)
 
     def move_to(self, x, y):
@@ -45,23 +50,29 @@ class CarObstacle(Obstacle):
 
     def draw_outline(self, surface):
         if hasattr(self, 'x') and hasattr(self, 'y'):
-            pygame.draw.circle(surface, (255, 0, 0), (int(self.x), int(self.y)), 40, 2)
+            import pygame
+            return pygame.draw.circle(surface, (255, 0, 0), (int(self.x), int(self.y)), 40, 2)
 
 class CartObstacle(Obstacle):
+    __slots__ = ("x", "y", "angle")
+    width, height = 40, 20
+
     def __init__(self, x, y):
-        self.image = pygame.Surface((40, 20), pygame.SRCALPHA)
-        self.image.fill((0, 100, 200))
         self.angle = 0
         self.x = x
         self.y = y
 
+    @property
+    def image(self):
+        return cart_image()
+
     def draw(self, surface):
-        rotated = pygame.transform.rotate(self.image, -self.angle)
-        rect = rotated.get_rect(center=(self.x, self.y))
-        surface.blit(rotated, rect.topleft)
+        return blit_rotated(surface, "cart", self.image, -self.angle, (self.x, self.y))
 
     def is_clicked(self, pos):
-        rect = self.image.get_rect(center=(self.x, self.y))
+        import pygame
+        rect = pygame.Rect(0, 0, self.width, self.height)
+        rect.center = (self.x, self.y)
         return rect.collidepoint(pos)
 
     def move_to(self, x, y):
@@ -72,16 +83,20 @@ class CartObstacle(Obstacle):
 
     def draw_outline(self, surface):
         if hasattr(self, 'x') and hasattr(self, 'y'):
-            pygame.draw.circle(surface, (255, 0, 0), (int(self.x), int(self.y)), 40, 2)
+            import pygame
+            return pygame.draw.circle(surface, (255, 0, 0), (int(self.x), int(self.y)), 40, 2)
 
 class CircleObstacle(Obstacle):
+    __slots__ = ("x", "y", "radius")
+
     def __init__(self, x, y):
         self.x = x
         self.y = y
         self.radius = 15
 
     def draw(self, surface):
-        pygame.draw.circle(surface, (0, 200, 100), (self.x, self.y), self.radius)
+        import pygame
+        return pygame.draw.circle(surface, (0, 200, 100), (self.x, self.y), self.radius)
 
     def is_clicked(self, pos):
         return math.hypot(pos[0] - self.x, pos[1] - self.y) <= self.radius
@@ -91,9 +106,12 @@ class CircleObstacle(Obstacle):
 
     def draw_outline(self, surface):
         if hasattr(self, 'x') and hasattr(self, 'y'):
-            pygame.draw.circle(surface, (255, 0, 0), (int(self.x), int(self.y)), 40, 2)
+            import pygame
+            return pygame.draw.circle(surface, (255, 0, 0), (int(self.x), int(self.y)), 40, 2)
 
 class LineSegment(Obstacle):
+    __slots__ = ("start", "end", "color", "thickness")
+
     def __init__(self, start_pos, end_pos):
         self.start = start_pos
         self.end = end_pos
@@ -101,12 +119,43 @@ class LineSegment(Obstacle):
         self.thickness = 7
 
     def draw(self, surface):
-        pygame.draw.line(surface, self.color, self.start, self.end, self.thickness)
+        import pygame
+        return pygame.draw.line(surface, self.color, self.start, self.end, self.thickness)
 
     def is_clicked(self, pos):
         # Optional: implement pixel-perfect check or bounding box
         return False
 
+# ================================
+# Plain-data form
+# ================================
+# Dicts of JSON types, for recordings and scene files.
+
+def obstacle_to_dict(obj):
+    if isinstance(obj, CarObstacle):
+        return {"type": "car", "x": obj.x, "y": obj.y, "angle": obj.angle}
+    if isinstance(obj, CartObstacle):
+        return {"type": "cart", "x": obj.x, "y": obj.y, "angle": obj.angle}
+    if isinstance(obj, CircleObstacle):
+        return {"type": "circle", "x": obj.x, "y": obj.y, "radius": obj.radius}
+    if isinstance(obj, LineSegment):
+        return {"type": "segment", "start": list(obj.start), "end": list(obj.end)}
+    raise TypeError(f"Cannot serialize obstacle of type {type(obj).__name__}")
+
+def obstacle_from_dict(data):
+    kind = data["type"]
+    if kind in ("car", "cart"):
+        obj = (CarObstacle if kind == "car" else CartObstacle)(data["x"], data["y"])
+        obj.angle = data.get("angle", 0)
+    elif kind == "circle":
+        obj = CircleObstacle(data["x"], data["y"])
+        obj.radius = data.get("radius", obj.radius)
+    elif kind == "segment":
+        obj = LineSegment(tuple(data["start"]), tuple(data["end"]))
+    else:
+        raise ValueError(f"Unknown obstacle type {kind!r}")
+    return obj
+
 def segments_intersect(p1, p2, q1, q2):
     def ccw(a, b, c):
         return (c[1]-a[1]) * (b[0]-a[0]) > (b[1]-a[1]) * (c[0]-a[0])
@@ -0,0 +1,206 @@
+import functools
+import math
+
+import numpy as np
+
+from collision import CAR_HALF_EXTENTS
+from raycast import MAX_SENSOR_DISTANCE, SENSOR_OFFSETS
+from yellow import disk_pixels
+
+WIDTH, HEIGHT = 800, 600
+
+# ================================
+# Occupancy grid
+# ================================
+# Log-odds occupancy in the world frame on a CELL px lattice, indexed [x, y] like the
+# yellow masks. Two layers built up from what the car has sensed:
+#   log_odds: the 8 sensor rays. Cells a ray passes through are evidence of free space,
+#     the cell it stops in is evidence of an obstacle (or a parking line, which the
+#     rays also hit).
+#   lines: the yellow sensor. Cells in the sensor disk with yellow pixels are evidence
+#     of a line, the rest of the disk evidence of none.
+# Each update only adds to the cells it observed, clamped so the map can change its
+# mind. `changed` holds the flat indices of the cells the last update touched (with
+# repeats). The yellow pixels the sensor has reported are also kept at full resolution
+# (seen_yellow), so the parking-spot test can count them exactly like the pixel test.
+
+CELL = 4                       # px, the planner's ObstacleField cell
+L_HIT, L_MISS = 0.85, -0.4     # log-odds per observation
+L_MIN, L_MAX = -4.0, 4.0
+OCCUPIED = 0.5                 # log-odds above which a cell counts as occupied / a line
+FREE = -0.5                    # and below which it counts as free
+LINE_RADIUS = 80               # yellow detections per update: cast_sensor_circle's largest disk
+SPOT_RADIUS = 70               # parking-spot test, as cast_sensor_circle(radius=70)
+SPOT_MIN_PIXELS = 20           # cast_sensor_circle's yellow_threshold
+
+
+@functools.lru_cache(maxsize=None)
+def disk_cells(radius):
+    # Cell offsets (dx, dy) with centers within radius cells of the center cell
+    r = int(math.ceil(radius))
+    d = np.arange(-r, r + 1)
+    dx, dy = np.meshgrid(d, d, indexing="ij")
+    inside = dx ** 2 + dy ** 2 <= radius ** 2
+    return dx[inside], dy[inside]
+
+
+@functools.lru_cache(maxsize=None)
+def pixel_disk(r):
+    # (2r + 1, 2r + 1) mask of the pixels within r of the center pixel
+    d = np.arange(-r, r + 1)
+    return d[:, None] ** 2 + d[None, :] ** 2 <= r * r
+
+
+class OccupancyGrid:
+    def __init__(self, cell=CELL, size=(WIDTH, HEIGHT)):
+        self.cell = cell
+        self.size = size
+        self.shape = (-(-size[0] // cell), -(-size[1] // cell))
+        self.log_odds = np.zeros(self.shape, dtype=np.float32)
+        self.lines = np.zeros(self.shape, dtype=np.float32)
+        self.seen_yellow = np.zeros(size, dtype=bool)
+        self.changed = np.zeros(0, dtype=np.int64)
+        self.updates = 0
+        self._line_source = None   # YellowMap behind _line_counts
+        self._line_counts = None   # yellow sensor pixels per cell
+
+    def reset(self):
+        self.log_odds.fill(0)
+        self.lines.fill(0)
+        self.seen_yellow.fill(False)
+        self.changed = np.zeros(0, dtype=np.int64)
+        self.updates = 0
+
+    def cells(self, x, y):
+        # World px -> clipped cell indices
+        cols, rows = self.shape
+        ix = np.clip(np.floor(np.asarray(x, dtype=float) / self.cell).astype(np.int64), 0, cols - 1)
+        iy = np.clip(np.floor(np.asarray(y, dtype=float) / self.cell).astype(np.int64), 0, rows - 1)
+        return ix, iy
+
+    # ---- updates ----
+
+    def update(self, car, yellow_map=None, line_radius=LINE_RADIUS):
+        # One step of the car's sensing: its latest ray cast, then the yellow disk
+        touched = self.integrate_rays(car.x, car.y, car.angle + SENSOR_OFFSETS, car.sensor_distances)
+        if yellow_map is not None:
+            touched = np.concatenate([touched, self.integrate_lines(car.x, car.y, line_radius, yellow_map)])
+        self.changed = touched
+        self.updates += 1
+        return touched
+
+    def integrate_rays(self, x, y, angles, distances, max_distance=MAX_SENSOR_DISTANCE):
+        # Rays from (x, y); distances as cast_rays returns them, inf for no hit. Every ray
+        # is walked Bresenham-style from the origin cell to the end cell in one batch;
+        # cells off the map are dropped, which also ends misses at the screen edge.
+        angles = np.asarray(angles, dtype=float)
+        distances = np.asarray(distances, dtype=float)
+        hit = distances < max_distance
+        length = np.where(hit, distances, max_distance)
+
+        cell = self.cell
+        cols, rows = self.shape
+        cx0, cy0 = int(x // cell), int(y // cell)
+        dcx = np.floor((x + length * np.cos(angles)) / cell).astype(np.int64) - cx0
+        dcy = np.floor((y + length * np.sin(angles)) / cell).astype(np.int64) - cy0
+        n = np.maximum(np.abs(dcx), np.abs(dcy))
+
+        # Flattened (ray, k) for k = 0..n of each ray
+        counts = n + 1
+        ray = np.repeat(np.arange(len(n)), counts)
+        k = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        t = k / np.maximum(n, 1)[ray]
+        ix = np.floor(cx0 + dcx[ray] * t + 0.5).astype(np.int64)
+        iy = np.floor(cy0 + dcy[ray] * t + 0.5).astype(np.int64)
+        valid = (ix >= 0) & (ix < cols) & (iy >= 0) & (iy < rows)
+        flat = (ix * rows + iy)[valid]
+        end = ((k == n[ray]) & hit[ray])[valid]
+
+        # Assigning values computed from the old ones, a cell crossed by several rays still
+        # moves once; hit cells are read before the free pass so a hit wins over a crossing
+        hits, free = flat[end], flat[~end]
+        log_odds = self.log_odds.ravel()
+        hit_values = np.minimum(log_odds[hits] + L_HIT, L_MAX)
+        log_odds[free] = np.maximum(log_odds[free] + L_MISS, L_MIN)
+        log_odds[hits] = hit_values
+        return flat
+
+    def integrate_lines(self, x, y, radius, yellow_map):
+        # Yellow detections in the sensor disk around (x, y)
+        flat = self._disk(x, y, radius)
+        seen = self.line_counts(yellow_map).ravel()[flat] > 0
+        lines = self.lines.ravel()
+        lines[flat] = np.clip(lines[flat] + np.where(seen, L_HIT, L_MISS), L_MIN, L_MAX)
+        # Pixels within radius of the car's pixel; the spot test's smaller disk lies inside
+        r = int(math.ceil(radius))
+        cx, cy = int(x), int(y)
+        x0, y0 = max(0, cx - r), max(0, cy - r)
+        x1, y1 = min(self.size[0], cx + r + 1), min(self.size[1], cy + r + 1)
+        if x0 < x1 and y0 < y1:
+            stencil = pixel_disk(r)[x0 - (cx - r):x1 - (cx - r), y0 - (cy - r):y1 - (cy - r)]
+            self.seen_yellow[x0:x1, y0:y1] |= yellow_map.sensor_mask[x0:x1, y0:y1] & stencil
+        return flat
+
+    def _disk(self, x, y, radius):
+        # Flat indices of the cells within radius px of (x, y)'s cell
+        cols, rows = self.shape
+        dx, dy = disk_cells(radius / self.cell)
+        cx, cy = int(x // self.cell), int(y // self.cell)
+        r = dx.max()
+        if r <= cx < cols - r and r <= cy < rows - r:
+            return (cx * rows + cy) + (dx * rows + dy)
+        ix, iy = cx + dx, cy + dy
+        valid = (ix >= 0) & (ix < cols) & (iy >= 0) & (iy < rows)
+        return ix[valid] * rows + iy[valid]
+
+    def line_counts(self, yellow_map):
+        # Yellow sensor pixels per cell, summed once per map
+        if self._line_source is not yellow_map:
+            cell = self.cell
+            cols, rows = self.shape
+            mask = np.asarray(yellow_map.sensor_mask)
+            padded = np.zeros((cols * cell, rows * cell), dtype=np.int32)
+            w, h = min(mask.shape[0], cols * cell), min(mask.shape[1], rows * cell)
+            padded[:w, :h] = mask[:w, :h]
+            self._line_counts = padded.reshape(cols, cell, rows, cell).sum(axis=(1, 3))
+            self._line_source = yellow_map
+        return self._line_counts
+
+    # ---- queries ----
+
+    def probability(self):
+        return 1 - 1 / (1 + np.exp(self.log_odds))
+
+    def occupied(self, x, y):
+        return self.log_odds[self.cells(x, y)] > OCCUPIED
+
+    def free(self, x, y):
+        # Seen free, as opposed to not occupied: unknown cells are neither
+        return self.log_odds[self.cells(x, y)] < FREE
+
+    def occupied_mask(self, include_lines=False):
+        mask = self.log_odds > OCCUPIED
+        if include_lines:
+            mask |= self.lines > OCCUPIED
+        return mask
+
+    def box_clear(self, x, y, angle, half_extents=CAR_HALF_EXTENTS, unknown_free=True):
+        # No occupied cell under an oriented box, sampled every half cell; with
+        # unknown_free=False every sampled cell must also have been seen free
+        half_l, half_w = half_extents
+        step = self.cell / 2
+        u = np.linspace(-half_l, half_l, max(2, int(math.ceil(2 * half_l / step)) + 1))
+        v = np.linspace(-half_w, half_w, max(2, int(math.ceil(2 * half_w / step)) + 1))
+        u, v = np.meshgrid(u, v, indexing="ij")
+        c, s = math.cos(angle), math.sin(angle)
+        values = self.log_odds[self.cells(x + u * c - v * s, y + u * s + v * c)]
+        return bool((values <= OCCUPIED).all() if unknown_free else (values < FREE).all())
+
+    def yellow_in_disk(self, x, y, radius):
+        # Yellow pixels reported so far that cast_sensor_circle's disk around (x, y) covers
+        return len(disk_pixels(self.seen_yellow, x, y, radius)[0])
+
+    def spot_detected(self, x, y, radius=SPOT_RADIUS, min_pixels=SPOT_MIN_PIXELS):
+        # Mapped counterpart of Car.cast_sensor_circle: the same pixel test, over what the
+        # yellow sensor has seen instead of the current frame
+        return self.yellow_in_disk(x, y, radius) >= min_pixels
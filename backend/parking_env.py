@@ -0,0 +1,261 @@
+import math
+import random
+import time
+
+import numpy as np
+
+from raycast import MAX_SENSOR_DISTANCE, SENSOR_LABELS
+from scenarios import random_layout
+from sim import Simulation
+
+try:
+    import gymnasium as gym
+    from gymnasium import spaces
+except ImportError:  # plain object with the same reset/step API
+    gym = None
+
+WIDTH, HEIGHT = 800, 600
+
+# Observation layout (float32)
+SENSORS = slice(0, len(SENSOR_LABELS))      # 8 ray distances, MAX_SENSOR_DISTANCE if no hit
+X, Y, COS, SIN, SPEED, STEERING = range(8, 14)
+YELLOW_70, YELLOW_80, LINE_DISTANCE = range(14, 17)
+OBS_SIZE = 17
+REAR_CENTER, SIDE_LEFT, SIDE_RIGHT = (SENSOR_LABELS.index(label)
+                                      for label in ("Rear Center", "Side Left", "Side Right"))
+
+# Rewards
+STEP_PENALTY = -0.01
+COLLISION_PENALTY = -1.0
+PARKED_REWARD = 1.0
+
+# Parked when held inside a spot with the same clearances the rule-based controller uses
+REAR_CLEARANCE = 30
+SIDE_CLEARANCE = 40
+HOLD_STEPS = 40
+
+
+def observe(sim, out):
+    # Fill out (OBS_SIZE float32) from the simulation; shared with the policy hook in random_car
+    car = sim.car
+    yellow_map = sim.yellow_map
+    np.minimum(car.sensor_distances, MAX_SENSOR_DISTANCE, out=out[SENSORS])
+    out[X], out[Y] = car.x, car.y
+    out[COS], out[SIN] = math.cos(car.angle), math.sin(car.angle)
+    out[SPEED], out[STEERING] = car.speed, car.steering_angle
+    if yellow_map is not None:
+        out[YELLOW_70] = yellow_map.count_in_disk(car.x, car.y, 70)
+        out[YELLOW_80] = yellow_map.count_in_disk(car.x, car.y, 80)
+        out[LINE_DISTANCE] = min(yellow_map.distance_to_line(car.x, car.y), MAX_SENSOR_DISTANCE)
+    else:
+        out[YELLOW_70:] = 0
+    return out
+
+
+# ================================
+# ParkingEnv
+# ================================
+
+class ParkingEnv(gym.Env if gym else object):
+    # Rollout pools need OBS_SIZE / ACTION_SIZE before any env exists
+    OBS_SIZE = OBS_SIZE
+    ACTION_SIZE = 2
+    metadata = {"render_modes": ["human", "rgb_array"], "render_fps": 60}
+
+    def __init__(self, yellow_map=None, layout_fn=random_layout, max_steps=1000, render_mode=None,
+                 terminate_on_collision=True, copy_obs=False, scenarios=None, **sim_kwargs):
+        self.sim = Simulation(yellow_map=yellow_map, **sim_kwargs)
+        self.yellow_map = yellow_map
+        self.layout_fn = layout_fn    # rng -> list of obstacles; None keeps the current layout
+        self.scenarios = scenarios    # e.g. a ScenarioLibrary; replaces layout_fn and yellow_map
+        self.max_steps = max_steps
+        self.render_mode = render_mode
+        self.terminate_on_collision = terminate_on_collision
+
+        # Reused every step: the observation array and the info dict are updated in place.
+        # copy_obs=True returns fresh copies instead, as gymnasium's env checker expects.
+        self.copy_obs = copy_obs
+        self.obs = np.zeros(OBS_SIZE, dtype=np.float32)
+        self.info = {"collision": False, "parked": False, "hold": 0}
+        self.hold = 0
+        self.rng = random.Random()
+        self._viewer = None
+
+        if gym is not None:
+            car = self.sim.car
+            low = np.zeros(OBS_SIZE, dtype=np.float32)
+            high = np.zeros(OBS_SIZE, dtype=np.float32)
+            high[SENSORS] = MAX_SENSOR_DISTANCE
+            high[X], high[Y] = WIDTH, HEIGHT
+            low[COS], low[SIN], high[COS], high[SIN] = -1, -1, 1, 1
+            low[SPEED], high[SPEED] = -car.max_speed / 2, car.max_speed
+            low[STEERING], high[STEERING] = -car.max_steering, car.max_steering
+            high[YELLOW_70], high[YELLOW_80] = 4 * 70 * 70, 4 * 80 * 80
+            high[LINE_DISTANCE] = MAX_SENSOR_DISTANCE
+            self.action_space = spaces.Box(-1.0, 1.0, shape=(2,), dtype=np.float32)
+            self.observation_space = spaces.Box(low, high, dtype=np.float32)
+
+    # ---- gym API ----
+
+    def reset(self, seed=None, options=None):
+        if gym is not None:
+            super().reset(seed=seed)
+        if seed is not None:
+            self.rng = random.Random(seed)
+        rng = self.rng
+        sim = self.sim
+        start = (options or {}).get("start")
+        if self.scenarios is not None:
+            scenario = self.scenarios.sample(rng)
+            # Bulk-load the packed geometry unless the obstacles have to be drawn
+            scenario.apply(sim, objects=self.render_mode is not None)
+            self.yellow_map = sim.yellow_map
+            start = start or scenario.start
+        elif self.layout_fn is not None:
+            for obs in list(sim.obstacles):
+                sim.remove_obstacle(obs)
+            for obs in self.layout_fn(rng):
+                sim.add_obstacle(obs)
+
+        if start is not None:
+            sim.reset(*start)
+        else:
+            # Random start, retried a few times so the car does not begin inside an obstacle
+            for _ in range(20):
+                sim.reset(rng.uniform(50, 550), rng.uniform(50, 450), rng.uniform(-math.pi, math.pi))
+                if not sim.update_contacts():
+                    break
+        sim.sense()
+        self.hold = 0
+        return self._output(self.observe(), self._update_info(False, False))
+
+    def step(self, action):
+        # action: (throttle, steer) in [-1, 1]; None hands the step to the rule-based controller
+        sim = self.sim
+        sim.step(None if action is None else (float(action[0]), float(action[1])))
+
+        obs = self.observe()
+        collision = sim.collided
+        parked = self._parked()
+        reward = STEP_PENALTY
+        if collision:
+            reward += COLLISION_PENALTY
+        if parked:
+            reward += PARKED_REWARD
+
+        terminated = parked or (collision and self.terminate_on_collision)
+        truncated = not terminated and sim.steps >= self.max_steps
+        if self.render_mode == "human":
+            self.render()
+        obs, info = self._output(obs, self._update_info(collision, parked))
+        return obs, reward, terminated, truncated, info
+
+    def observe(self):
+        return observe(self.sim, self.obs)
+
+    def _parked(self):
+        car = self.sim.car
+        if car.auto_state == "parked":
+            return True
+        if self.yellow_map is None:
+            return False
+        # The observation this step returns, so parking and the policy see the same cast
+        obs = self.obs
+        holding = (abs(car.speed) < 0.05
+                   and obs[YELLOW_70] >= 20   # same test as cast_sensor_circle(radius=70)
+                   and obs[REAR_CENTER] < REAR_CLEARANCE
+                   and obs[SIDE_LEFT] > SIDE_CLEARANCE
+                   and obs[SIDE_RIGHT] > SIDE_CLEARANCE)
+        self.hold = self.hold + 1 if holding else 0
+        return self.hold >= HOLD_STEPS
+
+    def _update_info(self, collision, parked):
+        info = self.info
+        info["collision"] = collision
+        info["parked"] = parked
+        info["hold"] = self.hold
+        return info
+
+    def _output(self, obs, info):
+        if self.copy_obs:
+            return obs.copy(), dict(info)
+        return obs, info
+
+    def render(self):
+        if self.render_mode is None:
+            return None
+        if self._viewer is None:
+            self._viewer = _EnvViewer(self.render_mode)
+        return self._viewer.draw(self.sim)
+
+    def close(self):
+        if self._viewer is not None:
+            self._viewer.close()
+            self._viewer = None
+
+
+class _EnvViewer:
+    # Minimal pygame view of a Simulation; only imported when render_mode is set
+    def __init__(self, mode):
+        import pygame
+        self.pygame = pygame
+        self.mode = mode
+        pygame.init()
+        if mode == "human":
+            self.surface = pygame.display.set_mode((WIDTH, HEIGHT))
+            self.clock = pygame.time.Clock()
+        else:
+            self.surface = pygame.Surface((WIDTH, HEIGHT))
+        try:
+            from assets import load_image
+            self.background = load_image("background.png", (WIDTH, HEIGHT))
+        except (FileNotFoundError, pygame.error):
+            self.background = None
+
+    def draw(self, sim):
+        pygame = self.pygame
+        surface = self.surface
+        if self.background is not None:
+            surface.blit(self.background, (0, 0))
+        else:
+            surface.fill((60, 60, 60))
+        for obs in sim.obstacles:
+            obs.draw(surface)
+        sim.car.draw(surface)
+        sim.car.draw_sensors(surface)
+        if self.mode == "human":
+            pygame.event.pump()
+            pygame.display.flip()
+            self.clock.tick(ParkingEnv.metadata["render_fps"])
+            return None
+        return np.transpose(pygame.surfarray.array3d(surface), (1, 0, 2))
+
+    def close(self):
+        if self.mode == "human":
+            self.pygame.display.quit()
+
+
+# ================================
+# Baseline
+# ================================
+
+class RuleBasedPolicy:
+    # The hand-written Car.move_auto state machine as a policy; returns None so
+    # ParkingEnv.step lets the car drive itself
+    def __call__(self, obs):
+        return None
+
+
+def run_episode(env, policy, seed=None, max_steps=None):
+    # Returns (success, steps, total reward, wall seconds)
+    obs, info = env.reset(seed=seed)
+    total = 0.0
+    steps = 0
+    start = time.perf_counter()
+    while True:
+        obs, reward, terminated, truncated, info = env.step(policy(obs))
+        total += reward
+        steps += 1
+        if terminated or truncated or (max_steps and steps >= max_steps):
+            break
+    return bool(info["parked"]), steps, total, time.perf_counter() - start
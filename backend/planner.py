@@ -0,0 +1,481 @@
+import hashlib
+import heapq
+import math
+import os
+import time
+
+import numpy as np
+
+from collision import CAR_HALF_EXTENTS
+from physics import integrate
+from yellow import distance_transform
+
+WIDTH, HEIGHT = 800, 600
+
+# ================================
+# Motion primitives
+# ================================
+# Each primitive holds (speed, steering) for a number of frames, integrated with the
+# car's own bicycle model, dt, substeps and integrator. The model is rotation invariant,
+# so primitives are stored once in the car's local frame (start at the origin, heading 0)
+# and rotated onto a pose during search. The car footprint is checked at a set of local
+# points, each needing its own clearance: points every FOOTPRINT_SPACING px around the
+# outline, plus discs along the axis that fill the middle. Their local positions are
+# precomputed for every frame too, and so is a search heuristic table (cost_table()).
+
+FORWARD_SPEED = 2.0          # same speeds as the rule-based controller
+REVERSE_SPEED = -1.5
+STEERING_LEVELS = 5          # evenly spaced in [-max_steering, max_steering]
+DURATIONS = (12, 4)          # frames; the short ones refine the final approach
+FOOTPRINT_SPACING = 5.0
+
+# Search settings; the cost table below depends on them too
+HEADING_BINS = 36
+REVERSE_COST = 1.2
+GEAR_CHANGE_COST = 15.0
+STEERING_CHANGE_COST = 2.0
+POSITION_TOLERANCE = 8.0     # how close the path has to begin to the start pose
+HEADING_TOLERANCE = math.radians(10)
+MARGIN = 1.0                 # extra clearance around the footprint, px
+HEURISTIC_WEIGHT = 3.0       # > 1 trades path cost for far fewer expansions
+
+TABLE_CELL = 4.0             # cost table resolution, px
+TABLE_RADIUS = 40            # cells each way: the table covers +-160 px
+
+PRIMITIVE_VERSION = 3
+
+def default_cache_dir():
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), ".planner_cache")
+
+
+def footprint_points(half_extents=CAR_HALF_EXTENTS, spacing=FOOTPRINT_SPACING):
+    # (N, 2) local points and (N,) clearances that keep every obstacle off the box
+    half_l, half_w = half_extents
+    outline = []
+    for x0, y0, x1, y1 in ((-half_l, -half_w, half_l, -half_w), (half_l, -half_w, half_l, half_w),
+                           (half_l, half_w, -half_l, half_w), (-half_l, half_w, -half_l, -half_w)):
+        n = max(1, math.ceil(math.hypot(x1 - x0, y1 - y0) / spacing))
+        t = np.arange(n) / n
+        outline.append(np.stack([x0 + (x1 - x0) * t, y0 + (y1 - y0) * t], axis=1))
+    reach = max(half_l - half_w, 0.0)
+    axis = np.linspace(-reach, reach, max(2, math.ceil(2 * reach / half_w) + 1))
+    points = np.concatenate(outline + [np.stack([axis, np.zeros_like(axis)], axis=1)])
+    radii = np.concatenate([np.full(len(points) - len(axis), spacing / 2), np.full(len(axis), half_w)])
+    return points, radii
+
+
+def _angle_diff(a, b):
+    return (a - b + math.pi) % (2 * math.pi) - math.pi
+
+
+def cost_table(ends, costs):
+    # Obstacle-free cost of driving from each relative pose (x, y, heading bin) on a
+    # TABLE_CELL lattice to within the start tolerances of the origin facing angle 0.
+    # Value iteration with every primitive move rounded onto the lattice; poses that
+    # need to leave the window get the largest finite cost.
+    n = 2 * TABLE_RADIUS + 1
+    bin_size = 2 * math.pi / HEADING_BINS
+    offsets = (np.arange(n) - TABLE_RADIUS) * TABLE_CELL
+    near = np.hypot(offsets[:, None], offsets[None, :]) <= POSITION_TOLERANCE
+    aligned = np.abs(_angle_diff(np.arange(HEADING_BINS) * bin_size, 0.0)) <= HEADING_TOLERANCE
+    table = np.where(aligned[:, None, None] & near, 0.0, np.inf)
+
+    moves = []
+    for h in range(HEADING_BINS):
+        c, s = math.cos(h * bin_size), math.sin(h * bin_size)
+        for (ex, ey, ea), cost in zip(ends.tolist(), costs.tolist()):
+            moves.append((h, (h + round(ea / bin_size)) % HEADING_BINS,
+                          round((c * ex - s * ey) / TABLE_CELL), round((s * ex + c * ey) / TABLE_CELL), cost))
+    while True:
+        updated = table.copy()
+        for h, h2, dx, dy, cost in moves:
+            # updated[h, i, j] <- cost + table[h2, i + dx, j + dy]
+            dst = updated[h, max(-dx, 0):n - max(dx, 0), max(-dy, 0):n - max(dy, 0)]
+            np.minimum(dst, table[h2, max(dx, 0):n - max(-dx, 0), max(dy, 0):n - max(-dy, 0)] + cost, out=dst)
+        if np.array_equal(updated, table):
+            break
+        table = updated
+    table[np.isinf(table)] = table[np.isfinite(table)].max()
+    return table
+
+
+class PrimitiveSet:
+    def __init__(self, actions, frames, samples, points, radii, table):
+        self.actions = actions      # (P, 2) speed, steering
+        self.frames = frames        # (P,) frames per primitive
+        self.samples = samples      # (P, K, 3) local (x, y, angle) after each frame, padded by repetition
+        self.points = points        # (P, K, N, 2) local footprint points after each frame
+        self.radii = radii          # (N,) clearance each footprint point needs
+        self.table = table          # (HEADING_BINS, n, n) cost_table()
+        self.reverse = actions[:, 0] < 0
+        self.lengths = np.abs(actions[:, 0]) * frames
+        self.costs = self.lengths * np.where(self.reverse, REVERSE_COST, 1.0)
+        self.ends = samples[np.arange(len(actions)), frames - 1]
+
+    def __len__(self):
+        return len(self.actions)
+
+    @classmethod
+    def build(cls, length, max_steering, dt=1.0, substeps=1, integrator="euler"):
+        steerings = np.linspace(-max_steering, max_steering, STEERING_LEVELS)
+        actions, frames = [], []
+        for duration in DURATIONS:
+            for speed in (FORWARD_SPEED, REVERSE_SPEED):
+                for steering in steerings:
+                    actions.append((speed, steering))
+                    frames.append(duration)
+        k = max(DURATIONS)
+        footprint, radii = footprint_points()
+        samples = np.zeros((len(actions), k, 3))
+        for p, ((speed, steering), duration) in enumerate(zip(actions, frames)):
+            x = y = angle = 0.0
+            for i in range(k):
+                if i < duration:
+                    x, y, angle = integrate(x, y, angle, speed, steering, length, dt, substeps, integrator)
+                samples[p, i] = x, y, angle
+        cos_a, sin_a = np.cos(samples[..., 2])[..., None], np.sin(samples[..., 2])[..., None]
+        fx, fy = footprint[:, 0], footprint[:, 1]
+        points = np.stack([samples[..., None, 0] + cos_a * fx - sin_a * fy,
+                           samples[..., None, 1] + sin_a * fx + cos_a * fy], axis=-1)
+        primitives = cls(np.array(actions), np.array(frames), samples, points, radii, None)
+        primitives.table = cost_table(primitives.ends, primitives.costs)
+        return primitives
+
+    @classmethod
+    def for_car(cls, car, cache_dir=None):
+        # Built once per car model and cached as .npy files (the cost table takes a few seconds)
+        params = (PRIMITIVE_VERSION, car.length, car.max_steering, car.dt, car.substeps, car.integrator,
+                  FORWARD_SPEED, REVERSE_SPEED, STEERING_LEVELS, DURATIONS, CAR_HALF_EXTENTS, FOOTPRINT_SPACING,
+                  HEADING_BINS, REVERSE_COST, POSITION_TOLERANCE, HEADING_TOLERANCE, TABLE_CELL, TABLE_RADIUS)
+        key = hashlib.sha1(repr(params).encode()).hexdigest()[:16]
+        directory = cache_dir or default_cache_dir()
+        names = ("actions", "frames", "samples", "points", "radii", "table")
+        paths = [os.path.join(directory, f"primitives_{key}_{name}.npy") for name in names]
+        if all(os.path.exists(p) for p in paths):
+            return cls(*(np.load(p) for p in paths))
+
+        primitives = cls.build(car.length, car.max_steering, car.dt, car.substeps, car.integrator)
+        os.makedirs(directory, exist_ok=True)
+        for name, path in zip(names, paths):
+            tmp = path + ".tmp.npy"
+            np.save(tmp, getattr(primitives, name))
+            os.replace(tmp, path)
+        return primitives
+
+
+# ================================
+# Obstacle field
+# ================================
+# Obstacles rasterized onto CELL-px cells (any cell a shape touches is occupied) and an
+# exact distance transform of that grid. A point and an obstacle are each within half a
+# cell diagonal of their cell centers, so lookups subtract one cell diagonal. Parking
+# lines are where the slack is smallest (a few px either side of the car in a bay), so
+# they use the YellowMap's own per-pixel distance field instead.
+
+CELL = 4
+
+class ObstacleField:
+    def __init__(self, geometry, yellow_map=None, cell=CELL, size=(WIDTH, HEIGHT)):
+        self.cell = cell
+        cols, rows = -(-size[0] // cell), -(-size[1] // cell)
+        occupied = np.zeros((cols, rows), dtype=bool)
+        pad = cell * math.sqrt(0.5)       # cell half-diagonal: shapes touching a cell mark it
+
+        for cx, cy, r in geometry.circles.tolist():
+            self._paint(occupied, cx - r, cy - r, cx + r, cy + r,
+                        lambda px, py: np.hypot(px - cx, py - cy) <= r + pad)
+        for cx, cy, hw, hh, angle in geometry.boxes.tolist():
+            c, s = math.cos(angle), math.sin(angle)
+            ex, ey = abs(c) * hw + abs(s) * hh, abs(s) * hw + abs(c) * hh
+            self._paint(occupied, cx - ex, cy - ey, cx + ex, cy + ey,
+                        lambda px, py: (np.abs((px - cx) * c + (py - cy) * s) <= hw + pad)
+                        & (np.abs(-(px - cx) * s + (py - cy) * c) <= hh + pad))
+        for x1, y1, x2, y2 in geometry.segments.tolist():
+            self._paint(occupied, min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2),
+                        lambda px, py: _point_segment_distance(px, py, x1, y1, x2, y2) <= pad)
+
+        self._set_occupied(occupied, yellow_map, size)
+
+    @classmethod
+    def from_occupancy(cls, grid, include_lines=True):
+        # Field over what an occupancy.OccupancyGrid has mapped so far; unknown cells count
+        # as free, and lines come from its line layer at cell resolution
+        field = cls.__new__(cls)
+        field.cell = grid.cell
+        field._set_occupied(grid.occupied_mask(include_lines), None, grid.size)
+        return field
+
+    def _set_occupied(self, occupied, yellow_map, size):
+        cell = self.cell
+        self.occupied = occupied
+        self.distance = distance_transform(occupied) * cell - cell * math.sqrt(2)   # px, conservative
+        # Per-pixel clearance for lookups: the cell distances, and the distance to the
+        # nearest line pixel center less half a pixel diagonal (rounded up)
+        pixels = np.repeat(np.repeat(self.distance, cell, axis=0), cell, axis=1)[:size[0], :size[1]]
+        if yellow_map is not None:
+            pixels = np.minimum(pixels, np.asarray(yellow_map.distance) - 1.0)
+        self.pixels = pixels.astype(np.float32)
+
+    def _paint(self, occupied, x0, y0, x1, y1, inside):
+        cell = self.cell
+        c0, r0 = max(0, int(x0 // cell) - 1), max(0, int(y0 // cell) - 1)
+        c1 = min(occupied.shape[0] - 1, int(x1 // cell) + 1)
+        r1 = min(occupied.shape[1] - 1, int(y1 // cell) + 1)
+        if c0 > c1 or r0 > r1:
+            return
+        px, py = np.meshgrid((np.arange(c0, c1 + 1) + 0.5) * cell, (np.arange(r0, r1 + 1) + 0.5) * cell,
+                             indexing="ij")
+        occupied[c0:c1 + 1, r0:r1 + 1] |= inside(px, py)
+
+    def clearance(self, x, y):
+        # Distance (px) to the nearest obstacle or line; -1 off the map
+        width, height = self.pixels.shape
+        ix = np.floor(x).astype(np.int64)
+        iy = np.floor(y).astype(np.int64)
+        inside = (ix >= 0) & (ix < width) & (iy >= 0) & (iy < height)
+        return np.where(inside, self.pixels.ravel().take(ix * height + iy, mode="clip"), -1.0)
+
+    def goal_distance(self, goal, min_clearance):
+        # Grid distance (px) from every cell to the goal through cells with enough clearance,
+        # by an 8-connected wavefront; inf where unreachable. Used as the A* heuristic.
+        cell = self.cell
+        free = self.distance >= min_clearance
+        centers = self.pixels[cell // 2::cell, cell // 2::cell]
+        free[:centers.shape[0], :centers.shape[1]] &= centers >= min_clearance
+        dist = np.full(free.shape, np.inf)
+        gx = min(max(int(goal[0] // cell), 0), free.shape[0] - 1)
+        gy = min(max(int(goal[1] // cell), 0), free.shape[1] - 1)
+        frontier = np.zeros(free.shape, dtype=bool)
+        frontier[gx, gy] = True
+        free[gx, gy] = True
+        step = 0
+        while frontier.any():
+            dist[frontier] = step * cell
+            grown = frontier.copy()
+            grown[1:, :] |= frontier[:-1, :]
+            grown[:-1, :] |= frontier[1:, :]
+            grown[:, 1:] |= grown[:, :-1].copy()
+            grown[:, :-1] |= grown[:, 1:].copy()
+            frontier = grown & free & np.isinf(dist)
+            step += 1
+        return dist
+
+
+def _point_segment_distance(px, py, x1, y1, x2, y2):
+    dx, dy = x2 - x1, y2 - y1
+    length_sq = dx * dx + dy * dy
+    t = 0.0 if length_sq == 0 else np.clip(((px - x1) * dx + (py - y1) * dy) / length_sq, 0, 1)
+    return np.hypot(px - (x1 + t * dx), py - (y1 + t * dy))
+
+
+# ================================
+# Hybrid A*
+# ================================
+# The search runs backward from the goal: the tight part of a parking path is the bay,
+# so the tree grows out of it into the open lane and stops at a pose near the start.
+# Predecessors are exact, since a primitive ending at a pose is the local primitive
+# rotated and translated back from it. Nodes keep continuous poses; the closed set is a
+# (CELL px, HEADING_BINS) lattice. Cost is path length, with reversing, gear changes and
+# steering changes penalized. The heuristic is the larger of the obstacle-aware
+# wavefront distance to the start (ignores heading) and the primitives' obstacle-free
+# cost table (ignores obstacles).
+
+# Path tracking: the reference is the planned pose nearest the car a few frames around
+# the last one (never across a gear change), and steering is the planned steering plus
+# a correction that turns the heading toward the path (Stanley-style), so starting a
+# few px off the path is fine
+TRACK_WINDOW = 8             # frames
+LATERAL_GAIN = 0.1           # 1/px
+HEADING_GAIN = 0.1           # 1/frame
+
+
+class Plan:
+    def __init__(self, poses, actions, expansions, seconds):
+        self.poses = poses          # (F + 1, 3) planned (x, y, angle) before each frame and at the end
+        self.actions = actions      # (F, 2) planned (speed, steering) per frame
+        self.expansions = expansions
+        self.seconds = seconds
+        self.cursor = 0
+        # Frame range [start, end) of the gear segment each frame is in
+        gear = np.sign(actions[:, 0])
+        bounds = np.concatenate([[0], np.nonzero(gear[1:] != gear[:-1])[0] + 1, [len(actions)]])
+        segment = np.searchsorted(bounds, np.arange(len(actions)), side="right") - 1
+        self._segment_start, self._segment_end = bounds[segment], bounds[segment + 1]
+
+    def __len__(self):
+        # Frames to drive
+        return len(self.actions)
+
+    @property
+    def goal(self):
+        return tuple(self.poses[-1].tolist())
+
+    def next_action(self, car):
+        # (speed, steering) for the car's next frame, or None when the plan is done
+        i = self.cursor
+        if i >= len(self.actions):
+            return None
+        lo = max(i - 1, self._segment_start[i])
+        hi = min(i + TRACK_WINDOW, self._segment_end[i])
+        window = self.poses[lo:hi]
+        i = lo + int(np.argmin((window[:, 0] - car.x) ** 2 + (window[:, 1] - car.y) ** 2))
+        self.cursor = i + 1
+        speed, steering = self.actions[i].tolist()
+        px, py, pa = self.poses[i].tolist()
+        lateral = -(car.x - px) * math.sin(pa) + (car.y - py) * math.cos(pa)
+        target = pa - math.atan(LATERAL_GAIN * lateral / speed)
+        correction = car.length * HEADING_GAIN * _angle_diff(target, car.angle) / speed
+        steering = math.atan(math.tan(steering) + correction)
+        return speed, max(-car.max_steering, min(car.max_steering, steering))
+
+
+def plan(start, goal, field, primitives, max_expansions=20000, time_budget=0.5):
+    # start, goal: (x, y, angle). Returns a Plan, or None if no path was found within
+    # max_expansions node expansions or time_budget seconds.
+    t0 = time.perf_counter()
+    cell = field.cell
+    radii = primitives.radii + MARGIN
+    heuristic = field.goal_distance(start, CAR_HALF_EXTENTS[1])
+    cols, rows = heuristic.shape
+    bin_size = 2 * math.pi / HEADING_BINS
+    sx, sy, sa = start
+
+    ends, costs, reverse = primitives.ends, primitives.costs, primitives.reverse
+    points = primitives.points[:, 1::2]     # every other frame (ends included): <= 4 px apart
+    steerings = primitives.actions[:, 1]
+    table = primitives.table
+    reach = table.shape[1] // 2
+
+    def h(x, y, angle):
+        grid = heuristic[min(max(int(x // cell), 0), cols - 1), min(max(int(y // cell), 0), rows - 1)]
+        # Table lookup for the start pose relative to this one
+        c, s = math.cos(angle), math.sin(angle)
+        i = round((c * (sx - x) + s * (sy - y)) / TABLE_CELL) + reach
+        j = round((-s * (sx - x) + c * (sy - y)) / TABLE_CELL) + reach
+        free = table[round((sa - angle) / bin_size) % HEADING_BINS, i, j] if 0 <= i <= 2 * reach and 0 <= j <= 2 * reach else 0.0
+        return max(math.hypot(x - sx, y - sy), grid - cell, free)
+
+    def key(x, y, angle):
+        return int(x // cell), int(y // cell), int(round(angle / bin_size)) % HEADING_BINS
+
+    # node: (x, y, angle, g, parent index, primitive from this node to the parent)
+    nodes = [(goal[0], goal[1], goal[2], 0.0, -1, -1)]
+    open_heap = [(h(*goal), 0, 0)]
+    best_g = {key(*goal): 0.0}
+    closed = set()
+    counter = 1
+    expansions = 0
+
+    while open_heap:
+        if expansions >= max_expansions or (expansions % 256 == 0 and time.perf_counter() - t0 > time_budget):
+            return None
+        _, _, index = heapq.heappop(open_heap)
+        x, y, angle, g, _, prim = nodes[index]
+        node_key = key(x, y, angle)
+        if node_key in closed:
+            continue
+        closed.add(node_key)
+        expansions += 1
+
+        if math.hypot(x - sx, y - sy) <= POSITION_TOLERANCE and abs(_angle_diff(angle, sa)) <= HEADING_TOLERANCE:
+            return _build_plan(nodes, index, primitives, expansions, time.perf_counter() - t0)
+
+        # Every primitive that ends at this pose at once: its start poses, then its
+        # footprint points along the way
+        pa = angle - ends[:, 2]
+        c, s = np.cos(pa), np.sin(pa)
+        px = x - (c * ends[:, 0] - s * ends[:, 1])
+        py = y - (s * ends[:, 0] + c * ends[:, 1])
+        c, s = c[:, None, None], s[:, None, None]
+        wx = px[:, None, None] + c * points[..., 0] - s * points[..., 1]
+        wy = py[:, None, None] + s * points[..., 0] + c * points[..., 1]
+        ok = (field.clearance(wx, wy) >= radii).all(axis=(1, 2))
+        if not ok.any():
+            continue
+
+        child_g = g + costs
+        if prim >= 0:
+            child_g = child_g + GEAR_CHANGE_COST * (reverse != reverse[prim])
+            child_g = child_g + STEERING_CHANGE_COST * np.abs(steerings - steerings[prim])
+        for p in np.nonzero(ok)[0].tolist():
+            nx, ny, na = float(px[p]), float(py[p]), float(pa[p])
+            child_key = key(nx, ny, na)
+            cost = float(child_g[p])
+            if child_key in closed or cost >= best_g.get(child_key, math.inf):
+                continue
+            estimate = h(nx, ny, na)
+            if math.isinf(estimate):
+                continue
+            best_g[child_key] = cost
+            nodes.append((nx, ny, na, cost, index, p))
+            heapq.heappush(open_heap, (cost + HEURISTIC_WEIGHT * estimate, counter, len(nodes) - 1))
+            counter += 1
+    return None
+
+
+def _build_plan(nodes, index, primitives, expansions, seconds):
+    # Walk from the node near the start up to the goal, laying each primitive's frames
+    # out from the pose it starts at
+    x, y, angle, _, parent, prim = nodes[index]
+    poses, actions = [np.array([[x, y, angle]])], []
+    while parent >= 0:
+        frames = int(primitives.frames[prim])
+        local = primitives.samples[prim, :frames]
+        c, s = math.cos(angle), math.sin(angle)
+        poses.append(np.stack([x + c * local[:, 0] - s * local[:, 1],
+                               y + s * local[:, 0] + c * local[:, 1], angle + local[:, 2]], axis=1))
+        actions.append(np.repeat(primitives.actions[prim:prim + 1], frames, axis=0))
+        x, y, angle, _, parent, prim = nodes[parent]
+    return Plan(np.concatenate(poses), np.concatenate(actions) if actions else np.zeros((0, 2)),
+                expansions, seconds)
+
+
+if __name__ == "__main__":
+    # Compare with the rule-based controller on generated lots:
+    # python planner.py [COUNT] [MAX_STEPS]
+    import sys
+    from scenarios import Scenario, generate_valid
+    from sim import Simulation
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    max_steps = int(sys.argv[2]) if len(sys.argv) > 2 else 3000
+
+    def drive(sim):
+        collisions = 0
+        while sim.car.auto_state != "parked" and sim.steps < max_steps:
+            sim.step()
+            collisions += sim.collided
+        return sim.car.auto_state == "parked", sim.steps, collisions
+
+    totals = {"rules": [0, 0, 0], "planner": [0, 0, 0]}    # parked, steps when parked, collision steps
+    plan_times = []
+    for seed in range(count):
+        scenario = generate_valid(seed)
+        sim = scenario.apply(Simulation())
+        rules = drive(sim)
+
+        # Nearest free bay first; the first plan found is driven
+        sim.reset(*scenario.start)
+        scenario.yellow_map.distance        # precomputed in a ScenarioLibrary, so not timed
+        x, y, _ = scenario.start
+        result = None
+        t0 = time.perf_counter()
+        for bay in sorted(scenario.free_bays, key=lambda bay: math.hypot(bay["x"] - x, bay["y"] - y)):
+            result = sim.plan_parking(Scenario.bay_pose(bay))
+            if result is not None:
+                break
+        plan_times.append(time.perf_counter() - t0)
+        planned = drive(sim) if result is not None else (False, 0, 0)
+
+        for name, (parked, steps, collisions) in (("rules", rules), ("planner", planned)):
+            totals[name][0] += parked
+            totals[name][1] += steps if parked else 0
+            totals[name][2] += collisions
+        print(f"seed {seed:3d}  rules: {'parked' if rules[0] else 'failed'} {rules[1]:5d} steps"
+              f"  planner: {'parked' if planned[0] else 'failed'} {planned[1]:5d} steps,"
+              f" planned in {plan_times[-1] * 1000:.0f} ms")
+
+    for name, (parked, steps, collisions) in totals.items():
+        print(f"{name:8s} parked {parked}/{count}, {steps / max(parked, 1):.0f} steps on average when parked,"
+              f" {collisions} collision steps")
+    print(f"planning: {np.mean(plan_times) * 1000:.0f} ms mean, {np.max(plan_times) * 1000:.0f} ms max")
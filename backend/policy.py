@@ -0,0 +1,184 @@
+import os
+import time
+
+import numpy as np
+
+try:
+    import onnxruntime as ort
+except ImportError:  # OnnxPolicy raises when used; MLPPolicy needs only NumPy
+    ort = None
+
+# ================================
+# Batched policies
+# ================================
+# A policy maps a stacked (N, obs_size) float32 observation array to (N, action_size)
+# actions in [-1, 1], one call for every car. Inputs are copied into and results
+# written to buffers preallocated for the largest batch seen so far; the returned
+# array is a view into the output buffer, valid until the next call. A single car
+# calls policy(obs[None])[0].
+
+
+class MLPPolicy:
+    # Plain NumPy forward pass through dense layers: x @ W + b, hidden activation,
+    # then the output activation ("tanh" squashes, "clip" clips to [-1, 1])
+    ACTIVATIONS = ("tanh", "relu")
+    OUTPUTS = ("tanh", "clip")
+
+    def __init__(self, weights, biases, obs_mean=None, obs_std=None, activation="tanh", output="tanh",
+                 capacity=1):
+        if activation not in self.ACTIVATIONS or output not in self.OUTPUTS:
+            raise ValueError(f"Unknown activation {activation!r} / output {output!r}")
+        self.weights = [np.ascontiguousarray(w, dtype=np.float32) for w in weights]   # (in, out) each
+        self.biases = [np.ascontiguousarray(b, dtype=np.float32) for b in biases]
+        self.obs_size = self.weights[0].shape[0]
+        self.action_size = self.weights[-1].shape[1]
+        self.activation = activation
+        self.output = output
+        # Observation normalization folded to (obs - mean) * scale
+        self.obs_mean = None if obs_mean is None else np.asarray(obs_mean, dtype=np.float32)
+        self.obs_scale = None if obs_std is None else (1 / np.maximum(np.asarray(obs_std, dtype=np.float32), 1e-8))
+        self.capacity = 0
+        self._reserve(capacity)
+
+    def _reserve(self, n):
+        if n <= self.capacity:
+            return
+        self.capacity = max(n, 2 * self.capacity)
+        self._input = np.empty((self.capacity, self.obs_size), dtype=np.float32)
+        self._layers = [np.empty((self.capacity, w.shape[1]), dtype=np.float32) for w in self.weights]
+
+    def __call__(self, obs):
+        n = len(obs)
+        self._reserve(n)
+        x = self._input[:n]
+        if self.obs_mean is not None:
+            np.subtract(obs, self.obs_mean, out=x)
+        else:
+            x[...] = obs
+        if self.obs_scale is not None:
+            x *= self.obs_scale
+
+        last = len(self.weights) - 1
+        for i, (w, b, buffer) in enumerate(zip(self.weights, self.biases, self._layers)):
+            out = buffer[:n]
+            np.matmul(x, w, out=out)
+            out += b
+            if i < last:
+                if self.activation == "tanh":
+                    np.tanh(out, out=out)
+                else:
+                    np.maximum(out, 0, out=out)
+            x = out
+        if self.output == "tanh":
+            np.tanh(x, out=x)
+        else:
+            np.clip(x, -1, 1, out=x)
+        return x
+
+    @classmethod
+    def random(cls, sizes, seed=None, **kwargs):
+        # Untrained network with layer sizes e.g. (17, 64, 64, 2), for tests and benchmarks
+        rng = np.random.default_rng(seed)
+        weights = [rng.normal(0, 1 / np.sqrt(a), (a, b)) for a, b in zip(sizes[:-1], sizes[1:])]
+        return cls(weights, [np.zeros(b) for b in sizes[1:]], **kwargs)
+
+    # ---- files ----
+    # .npz with w0, b0, w1, b1, ... and optional obs_mean, obs_std, activation, output
+
+    def save(self, path):
+        arrays = {}
+        for i, (w, b) in enumerate(zip(self.weights, self.biases)):
+            arrays[f"w{i}"], arrays[f"b{i}"] = w, b
+        if self.obs_mean is not None:
+            arrays["obs_mean"] = self.obs_mean
+        if self.obs_scale is not None:
+            arrays["obs_std"] = 1 / self.obs_scale
+        np.savez(path, activation=self.activation, output=self.output, **arrays)
+
+    @classmethod
+    def load(cls, path, capacity=1):
+        with np.load(path) as data:
+            count = sum(1 for name in data.files if name.startswith("w"))
+            return cls([data[f"w{i}"] for i in range(count)], [data[f"b{i}"] for i in range(count)],
+                       data["obs_mean"] if "obs_mean" in data.files else None,
+                       data["obs_std"] if "obs_std" in data.files else None,
+                       str(data["activation"]) if "activation" in data.files else "tanh",
+                       str(data["output"]) if "output" in data.files else "tanh", capacity)
+
+
+class OnnxPolicy:
+    # ONNX Runtime on the CPU. The model takes one float32 (batch, obs_size) input and
+    # gives one float32 (batch, action_size) output with a dynamic batch dimension.
+    # Inputs and outputs are bound to the preallocated buffers, so a call allocates nothing.
+    def __init__(self, path, capacity=1, threads=None):
+        if ort is None:
+            raise ImportError("OnnxPolicy needs onnxruntime (pip install onnxruntime)")
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        model_input, model_output = self.session.get_inputs()[0], self.session.get_outputs()[0]
+        self.input_name, self.output_name = model_input.name, model_output.name
+        self.obs_size = model_input.shape[-1]
+        self.action_size = model_output.shape[-1]
+        self.binding = self.session.io_binding()
+        self.capacity = 0
+        self._reserve(capacity)
+
+    def _reserve(self, n):
+        if n <= self.capacity:
+            return
+        self.capacity = max(n, 2 * self.capacity)
+        self._input = np.empty((self.capacity, self.obs_size), dtype=np.float32)
+        self._output = np.empty((self.capacity, self.action_size), dtype=np.float32)
+
+    def __call__(self, obs):
+        n = len(obs)
+        self._reserve(n)
+        x, y = self._input[:n], self._output[:n]
+        x[...] = obs
+        binding = self.binding
+        binding.bind_cpu_input(self.input_name, x)
+        binding.bind_output(self.output_name, "cpu", 0, np.float32, y.shape, y.ctypes.data)
+        self.session.run_with_iobinding(binding)
+        return y
+
+
+def load_policy(path, capacity=1):
+    # By extension: .npz -> MLPPolicy, .onnx -> OnnxPolicy
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".npz":
+        return MLPPolicy.load(path, capacity)
+    if extension == ".onnx":
+        return OnnxPolicy(path, capacity)
+    raise ValueError(f"Unknown policy file type: {path}")
+
+
+# ================================
+# Batched evaluation
+# ================================
+
+def evaluate(envs, policy, episodes):
+    # Drive a batched env (rollout.RolloutPool or LocalPool) with one policy call per
+    # step until `episodes` episodes have finished; returns their returns and lengths
+    obs = envs.reset()
+    num_envs = len(obs)
+    running_return = np.zeros(num_envs)
+    running_length = np.zeros(num_envs, dtype=np.int64)
+    returns, lengths = [], []
+    steps = 0
+    t0 = time.perf_counter()
+    while len(returns) < episodes:
+        obs, rewards, dones = envs.step(policy(obs))
+        running_return += rewards
+        running_length += 1
+        steps += num_envs
+        if dones.any():
+            finished = np.flatnonzero(dones)
+            returns.extend(running_return[finished].tolist())
+            lengths.extend(running_length[finished].tolist())
+            running_return[finished] = 0
+            running_length[finished] = 0
+    elapsed = time.perf_counter() - t0
+    return {"returns": np.array(returns[:episodes]), "lengths": np.array(lengths[:episodes]),
+            "seconds": elapsed, "steps_per_s": steps / elapsed}
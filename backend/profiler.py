@@ -0,0 +1,150 @@
+import collections
+import json
+import os
+import time
+
+import numpy as np
+
+# ================================
+# Frame Profiler
+# ================================
+# Per-stage timings for the main loop, kept in a ring buffer of the last `capacity` frames.
+# Stage times are exclusive: a stage nested in another (sensing inside logic) is only
+# counted once, so the stages of a frame add up to the frame time.
+
+FRAME_BUDGET_MS = 1000 / 60
+
+
+class _Stage:
+    __slots__ = ("profiler", "name", "start", "child")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.child = 0
+        self.start = time.perf_counter_ns()
+        self.profiler._stack.append(self)
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter_ns()
+        profiler = self.profiler
+        profiler._stack.pop()
+        total = end - self.start
+        if profiler._stack:
+            profiler._stack[-1].child += total
+        profiler._current[self.name] = profiler._current.get(self.name, 0) + total - self.child
+        profiler._trace.append((self.name, self.start, total, len(profiler._stack)))
+        return False
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_STAGE = _NullStage()
+
+
+class FrameProfiler:
+    def __init__(self, capacity=600, enabled=True):
+        self.capacity = capacity
+        self.enabled = enabled
+        self.frame_ms = np.zeros(capacity)
+        self.stage_ms = {}             # stage name -> ring buffer of ms per frame
+        self.count = 0                 # frames recorded so far
+        self._stack = []
+        self._current = {}
+        self._frame_start = None
+        self._trace = collections.deque(maxlen=capacity * 32)
+
+    def stage(self, name):
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name)
+
+    def begin_frame(self):
+        if self.enabled:
+            self._current = {}
+            self._frame_start = time.perf_counter_ns()
+
+    def end_frame(self):
+        if not self.enabled or self._frame_start is None:
+            return
+        end = time.perf_counter_ns()
+        slot = self.count % self.capacity
+        self.frame_ms[slot] = (end - self._frame_start) / 1e6
+        for name in self._current.keys() - self.stage_ms.keys():
+            self.stage_ms[name] = np.zeros(self.capacity)
+        for name, buffer in self.stage_ms.items():
+            buffer[slot] = self._current.get(name, 0) / 1e6
+        self._trace.append(("frame", self._frame_start, end - self._frame_start, -1))
+        self.count += 1
+        self._frame_start = None
+
+    # ---- stats ----
+
+    def _recent(self, buffer):
+        return buffer[:min(self.count, self.capacity)]
+
+    def percentiles(self, qs=(50, 95, 99)):
+        frames = self._recent(self.frame_ms)
+        if len(frames) == 0:
+            return {f"p{q}": 0.0 for q in qs}
+        return {f"p{q}": float(v) for q, v in zip(qs, np.percentile(frames, qs))}
+
+    def stage_means(self):
+        return {name: float(self._recent(buffer).mean()) for name, buffer in self.stage_ms.items()
+                if self.count}
+
+    def over_budget(self, budget_ms=FRAME_BUDGET_MS):
+        # Fraction of recent frames slower than the budget
+        frames = self._recent(self.frame_ms)
+        return float((frames > budget_ms).mean()) if len(frames) else 0.0
+
+    def summary(self):
+        return {"frames": self.count, **self.percentiles(), "over_budget": self.over_budget(),
+                "stages_ms": self.stage_means()}
+
+    # ---- output ----
+
+    def draw_overlay(self, surface, pos=(600, 130)):
+        import pygame
+        font = _overlay_font()
+        p = self.percentiles()
+        lines = [f"frame p50 {p['p50']:.1f}  p95 {p['p95']:.1f}  p99 {p['p99']:.1f} ms"]
+        for name, ms in sorted(self.stage_means().items(), key=lambda item: -item[1]):
+            lines.append(f"{name:10s} {ms:6.2f} ms")
+
+        x, y = pos
+        panel = pygame.Surface((195, 16 * len(lines) + 8), pygame.SRCALPHA)
+        panel.fill((0, 0, 0, 160))
+        rect = surface.blit(panel, (x - 4, y - 4))
+        for i, text in enumerate(lines):
+            color = (255, 80, 80) if i == 0 and p["p95"] > FRAME_BUDGET_MS else (255, 255, 255)
+            rect.union_ip(surface.blit(font.render(text, True, color), (x, y + 16 * i)))
+        return rect
+
+    def dump_trace(self, path="frame_trace.json"):
+        # Chrome trace event format; opens in chrome://tracing, Perfetto and speedscope
+        pid = os.getpid()
+        events = []
+        for name, start_ns, dur_ns, depth in self._trace:
+            events.append({"name": name, "ph": "X", "pid": pid, "tid": 0,
+                           "ts": start_ns / 1000, "dur": dur_ns / 1000,
+                           "cat": "frame" if depth < 0 else "stage"})
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        return path
+
+
+# Shared disabled profiler so code can call .stage() without checking for None
+NULL_PROFILER = FrameProfiler(capacity=1, enabled=False)
+
+def _overlay_font():
+    from assets import get_font
+    return get_font(None, 18)
@@ -1,42 +1,51 @@
 import pygame
+import os
 import sys
 import math
 import random
+import time
 
+import numpy as np
+
+from assets import asset_path, get_font, load_image
 from car import Car
 from obstacle import *
-
-# Initialize Pygame
-pygame.init()
+from parking_env import OBS_SIZE, observe
+from physics import FixedTimestep
+from policy import load_policy
+from profiler import FrameProfiler
+from recording import NULL_RECORDER, EpisodeRecorder
+from render import IncrementalRenderer
+from scene import Scene
+from sim import Simulation
+from telemetry import ConsoleSink, Telemetry, level_from_name
+from yellow import YellowMap
 
 # Screen setup
 WIDTH, HEIGHT = 800, 600  # Wider screen
 GAME_WIDTH = 600           # Game area
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Car Movement Modes")
+
+# Display, background, font, renderer and clock are created by init_display(), so
+# importing this module opens no window and loads nothing
+screen = None
+background = None
+font = None
+renderer = None
+clock = None
 
 # Obstacles
 obstacles = []
-dynamic_yellow_obstacles = []
+dynamic_yellow_obstacles = []   # sim.yellow_segments, for drawing
 
-# Load and scale background
-background = pygame.image.load("background.png")
-background = pygame.transform.scale(background, (WIDTH, HEIGHT))
-
-# Colors and fonts
+# Colors
 WHITE = (255, 255, 255)
 BLACK = (0, 0, 0)
 GREEN = (0, 200, 0)
-font = pygame.font.SysFont(None, 36)
 
 # Buttons
 manual_button = pygame.Rect(600, 20, 150, 40)
 auto_button = pygame.Rect(600, 70, 150, 40)
 
-# Load car sprite
-car_image = pygame.image.load("car.png")
-car_image = pygame.transform.scale(car_image, (60, 30))
-
 # UI Obstacle Selector Buttons
 selector_buttons = {
     "car": pygame.Rect(20, 540, 80, 40),
@@ -47,9 +56,34 @@ selector_buttons = {
 selected_type = "car"
 dragging_obstacle = None
 offset_x, offset_y = 0, 0
-
-# Clock
-clock = pygame.time.Clock()
+sim = None  # Simulation driven by main()
+stepper = None  # FixedTimestep driving sim in main()
+profiler = FrameProfiler()
+show_profiler = False  # F3 toggles the timing overlay, F4 writes frame_trace.json
+record_dir = os.environ.get("PARKING_RECORD")  # auto-mode runs are recorded here when set
+scene_path = os.environ.get("PARKING_SCENE", "scene.json")  # Ctrl+S saves, Ctrl+L loads
+
+# Auto mode drives with this policy (.npz MLP or .onnx) instead of the built-in controller;
+# loaded by main() from PARKING_POLICY
+policy = None
+policy_obs = np.zeros((1, OBS_SIZE), dtype=np.float32)
+
+# Controller events on the console; PARKING_LOG=off|event|debug
+telemetry = Telemetry(ConsoleSink(), level=level_from_name(os.environ.get("PARKING_LOG")), batch_size=1)
+
+
+def init_display():
+    # Window, background and font; safe to call more than once
+    global screen, background, font, renderer, clock
+    if screen is not None:
+        return
+    pygame.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption("Car Movement Modes")
+    background = load_image("background.png", (WIDTH, HEIGHT))
+    font = get_font(None, 36)
+    renderer = IncrementalRenderer(screen)
+    clock = pygame.time.Clock()
 
 
 # ================================
@@ -66,85 +100,86 @@ def is_yellow(r, g, b, brightness_threshold=160, blue_threshold=120, rg_diff=80)
                 return True
     return False
 
-def extract_yellow_lines_near_car(surface, car_position, sensor_range):
-    yellow_threshold = 60
-    width, height = surface.get_size()
-    pixels = pygame.surfarray.pixels3d(surface)
-    cx, cy = car_position
+def keys_to_action(keys):
+    throttle = 1 if keys[pygame.K_UP] else -1 if keys[pygame.K_DOWN] else 0
+    steer = -1 if keys[pygame.K_LEFT] else 1 if keys[pygame.K_RIGHT] else 0
+    return throttle, steer
 
-    new_positions = set()
-
-    for x in range(max(0, cx - sensor_range), min(width, cx + sensor_range), 4):
-        for y in range(max(0, cy - sensor_range), min(height, cy + sensor_range), 4):
-            if math.hypot(x - cx, y - cy) > sensor_range:
-                continue
-            r, g, b = [int(c) for c in pixels[x][y]]
-            if is_yellow(r, g, b):
-                new_positions.add((x, y))
-
-    return new_positions
-
-
-def update_dynamic_yellow_obstacles(car_pos, sensor_range):
+def update_logic(sim, mode):
     global dynamic_yellow_obstacles
-    new_positions = extract_yellow_lines_near_car(background, car_pos, sensor_range)
-
-    current_positions = set((obs.start, obs.end) for obs in dynamic_yellow_obstacles)
-    dynamic_yellow_obstacles = [obs for obs in dynamic_yellow_obstacles if (obs.start, obs.end) in new_positions]
-
-    added_positions = set((obs.start, obs.end) for obs in dynamic_yellow_obstacles)
-    for x, y in new_positions:
-        # Line segment of small length centered at (x, y)
-        start = (x - 2, y)
-        end = (x + 2, y)
-        if (start, end) not in added_positions:
-            dynamic_yellow_obstacles.append(LineSegment(start, end))
-
-def update_logic(car, mode):
-    keys = pygame.key.get_pressed()
     if mode == 'manual':
-        car.move_manual(keys)
+        sim.step(keys_to_action(pygame.key.get_pressed()))
+    elif mode == 'auto' and policy is not None:
+        observe(sim, policy_obs[0])
+        sim.step(tuple(policy(policy_obs)[0].tolist()))
     elif mode == 'auto':
-        car.cast_sensor(obstacles, screen)
-        car.move_auto(screen)
+        sim.step()
+    dynamic_yellow_obstacles = sim.yellow_segments
 
 
-def draw_ui(mode):
-    screen.blit(background, (0, 0))
+def draw_ui(surface, mode):
+    # Static layer: only redrawn after renderer.invalidate()
+    text = renderer.text
+    surface.blit(background, (0, 0))
 
-    for obs in dynamic_yellow_obstacles:
-        obs.draw(screen)
-    
     # Choose colors based on current mode
     manual_color = (100, 255, 100) if mode == 'manual' else (200, 200, 200)
     auto_color = (100, 255, 100) if mode == 'auto' else (200, 200, 200)
 
     # Draw Manual button
-    pygame.draw.rect(screen, manual_color, manual_button)
-    manual_text = font.render("Manual", True, BLACK)
-    screen.blit(manual_text, (manual_button.x + 10, manual_button.y + 10))
+    pygame.draw.rect(surface, manual_color, manual_button)
+    surface.blit(text(font, "Manual", BLACK), (manual_button.x + 10, manual_button.y + 10))
 
     # Draw Auto button
-    pygame.draw.rect(screen, auto_color, auto_button)
-    auto_text = font.render("Auto", True, BLACK)
-    screen.blit(auto_text, (auto_button.x + 10, auto_button.y + 10))
+    pygame.draw.rect(surface, auto_color, auto_button)
+    surface.blit(text(font, "Auto", BLACK), (auto_button.x + 10, auto_button.y + 10))
 
     # Obstacle selector UI
     for key, rect in selector_buttons.items():
-        pygame.draw.rect(screen, (200, 200, 200) if key != selected_type else (0, 200, 0), rect)
-        screen.blit(font.render(key.capitalize(), True, BLACK), (rect.x + 5, rect.y + 5))
+        pygame.draw.rect(surface, (200, 200, 200) if key != selected_type else (0, 200, 0), rect)
+        surface.blit(text(font, key.capitalize(), BLACK), (rect.x + 5, rect.y + 5))
+    surface.blit(text(font, "Q/E: Rotate   DEL/BACKSPACE: Delete", BLACK), (20, 500))
 
-    # Draw all obstacles
+    # Draw all obstacles except the one being dragged, which moves every frame
     for obs in obstacles:
-        obs.draw(screen)
-        if obs == dragging_obstacle:
-            obs.draw_outline(screen)
+        if obs is not dragging_obstacle:
+            obs.draw(surface)
+
+def draw_scene(surface):
+    # Dynamic layer, redrawn every frame; returns the rects it touched
+    rects = []
+    yellow_rects = [obs.draw(surface) for obs in dynamic_yellow_obstacles]
+    if yellow_rects:
+        rects.append(yellow_rects[0].unionall(yellow_rects[1:]))
+
+    if dragging_obstacle is not None:
+        rects.append(dragging_obstacle.draw(surface))
+        rects.append(dragging_obstacle.draw_outline(surface))
+
+    car = sim.car
+    pose = sim.interpolated_pose(stepper.alpha) if stepper else None
+    rects.append(car.draw(surface, pose))
+    rects.extend(car.draw_sensors(surface, pose))
+    if show_profiler:
+        rects.append(profiler.draw_overlay(surface))
+    return rects
+
+def start_recording():
+    # One episode file per switch to auto mode; replay with recording.py
+    if record_dir:
+        os.makedirs(record_dir, exist_ok=True)
+        path = os.path.join(record_dir, time.strftime("episode_%Y%m%d_%H%M%S.ep"))
+        sim.recorder = EpisodeRecorder(path, sim, yellow_image=os.path.abspath(asset_path("background.png")))
+
+def stop_recording():
+    sim.recorder.close()
+    if getattr(sim.recorder, "stopped", None):
+        print(f"Recording {sim.recorder.path} stopped early: {sim.recorder.stopped}")
+    sim.recorder = NULL_RECORDER
 
 def handle_events():
-    global mode, running, selected_type, dragging_obstacle, offset_x, offset_y
-    instructions = font.render("Q/E: Rotate   DEL/BACKSPACE: Delete", True, BLACK)
-    screen.blit(instructions, (20, 500))   
-    
+    # Obstacle edits go through sim so its spatial index follows along
+    global mode, running, selected_type, dragging_obstacle, offset_x, offset_y, show_profiler
 
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
@@ -152,13 +187,17 @@ def handle_events():
 
         elif event.type == pygame.MOUSEBUTTONDOWN:
             mx, my = pygame.mouse.get_pos()
+            renderer.invalidate()  # mode, selection and obstacle set all live in the static layer
 
             # Check if mode buttons were clicked
             if manual_button.collidepoint((mx, my)):
                 print("Mode set to manual")
+                stop_recording()
                 mode = 'manual'
                 return
             elif auto_button.collidepoint((mx, my)):
+                if mode != 'auto':
+                    start_recording()
                 mode = 'auto'
                 print("Mode set to auto")
                 return
@@ -170,39 +209,57 @@ def handle_events():
                     return
 
             # Try to drag existing obstacle
-            for obs in reversed(obstacles):  # Top-down
-                if obs.is_clicked((mx, my)):
-                    dragging_obstacle = obs
-                    if hasattr(obs, 'x'):
-                        offset_x = mx - obs.x
-                        offset_y = my - obs.y
-                    return
+            obs = sim.obstacle_at((mx, my))  # Top-down
+            if obs is not None:
+                dragging_obstacle = obs
+                offset_x = mx - obs.x
+                offset_y = my - obs.y
+                return
 
             # Else, place new obstacle
             if selected_type == "car":
-                obstacles.append(CarObstacle(mx, my))
+                sim.add_obstacle(CarObstacle(mx, my))
             elif selected_type == "cart":
-                obstacles.append(CartObstacle(mx, my))
+                sim.add_obstacle(CartObstacle(mx, my))
             elif selected_type == "circle":
-                obstacles.append(CircleObstacle(mx, my))
+                sim.add_obstacle(CircleObstacle(mx, my))
 
 
         elif event.type == pygame.MOUSEBUTTONUP:
+            if dragging_obstacle is not None:
+                renderer.invalidate()
             dragging_obstacle = None
 
         elif event.type == pygame.MOUSEMOTION:
             if dragging_obstacle:
                 mx, my = pygame.mouse.get_pos()
-                dragging_obstacle.move_to(mx - offset_x, my - offset_y)
+                sim.move_obstacle(dragging_obstacle, mx - offset_x, my - offset_y)
+
+        elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+            show_profiler = not show_profiler
+
+        elif event.type == pygame.KEYDOWN and event.key == pygame.K_s and event.mod & pygame.KMOD_CTRL:
+            Scene.from_obstacles(obstacles).save(scene_path)
+            print(f"Scene saved to {scene_path}")
+
+        elif event.type == pygame.KEYDOWN and event.key == pygame.K_l and event.mod & pygame.KMOD_CTRL:
+            if os.path.exists(scene_path):
+                Scene.load(scene_path).apply(sim)
+                dragging_obstacle = None
+                renderer.invalidate()
+                print(f"Scene loaded from {scene_path}")
+
+        elif event.type == pygame.KEYDOWN and event.key == pygame.K_F4:
+            print(f"Frame trace written to {profiler.dump_trace()}")
 
         elif event.type == pygame.KEYDOWN and dragging_obstacle:
             if event.key == pygame.K_q:
-                dragging_obstacle.rotate(-10)
+                sim.rotate_obstacle(dragging_obstacle, -10)
             elif event.key == pygame.K_e:
-                dragging_obstacle.rotate(10)
+                sim.rotate_obstacle(dragging_obstacle, 10)
             elif event.key in (pygame.K_DELETE, pygame.K_BACKSPACE):
                 if dragging_obstacle in obstacles:
-                    obstacles.remove(dragging_obstacle)
+                    sim.remove_obstacle(dragging_obstacle)
                     dragging_obstacle = None
 
 # ================================
@@ -210,23 +267,37 @@ def handle_events():
 # ================================
 
 def main():
-    global mode, running
-    car = Car(400, 300)
+    global mode, running, sim, stepper, policy
+    init_display()
+    if os.environ.get("PARKING_POLICY"):
+        policy = load_policy(os.environ["PARKING_POLICY"])
+    # The simulation runs headless; this loop only feeds it input and draws its state
+    sim = Simulation(obstacles, YellowMap.from_image(asset_path("background.png")), start=(400, 300))
+    sim.profiler = profiler
+    sim.telemetry = sim.car.telemetry = telemetry
     mode = 'manual'
     running = True
 
-    while running:
-        draw_ui(mode)
-        handle_events()
-        update_logic(car, mode)
-        draw_ui(mode)
-        car.draw(screen)
-        sensor_range = 150
-        update_dynamic_yellow_obstacles((int(car.x), int(car.y)), sensor_range)
-        car.cast_sensor(obstacles + dynamic_yellow_obstacles, screen)
-        pygame.display.flip()
-        clock.tick(60)
+    # Physics runs at a fixed 60 Hz whatever the display manages; drawing interpolates
+    stepper = FixedTimestep()
+    elapsed = stepper.step_seconds
 
+    while running:
+        profiler.begin_frame()
+        with profiler.stage("events"):
+            handle_events()
+        with profiler.stage("logic"):
+            for _ in stepper.advance(elapsed):
+                update_logic(sim, mode)
+        with profiler.stage("render"):
+            renderer.draw(lambda surface: draw_ui(surface, mode), draw_scene)
+        with profiler.stage("flip"):
+            renderer.present()
+        profiler.end_frame()
+        elapsed = clock.tick(60) / 1000
+
+    stop_recording()
+    telemetry.close()
     pygame.quit()
     sys.exit()
 
@@ -0,0 +1,144 @@
+import math
+import numpy as np
+
+from obstacle import CarObstacle, CartObstacle, CircleObstacle, LineSegment
+
+WIDTH, HEIGHT = 800, 600
+MAX_SENSOR_DISTANCE = 150
+
+# (label, angle offset from heading, base color) for the 8 distance sensors
+SENSOR_CONFIGS = [
+    ("Front Left", -math.pi / 6, (0, 255, 0)),
+    ("Front Center", 0.0, (0, 255, 0)),
+    ("Front Right", math.pi / 6, (0, 255, 0)),
+    ("Rear Left", math.pi - math.pi / 6, (0, 200, 255)),
+    ("Rear Center", math.pi, (0, 200, 255)),
+    ("Rear Right", math.pi + math.pi / 6, (0, 200, 255)),
+    ("Side Left", -math.pi / 2, (255, 165, 0)),  # Orange
+    ("Side Right", math.pi / 2, (255, 165, 0))
+]
+SENSOR_LABELS = [label for label, _, _ in SENSOR_CONFIGS]
+SENSOR_OFFSETS = np.array([offset for _, offset, _ in SENSOR_CONFIGS])
+
+
+# ================================
+# Scene geometry
+# ================================
+
+class SceneGeometry:
+    # Obstacles flattened into arrays: circles (cx, cy, r), oriented boxes
+    # (cx, cy, half_w, half_h, angle) and segments (x1, y1, x2, y2)
+    def __init__(self, circles=None, boxes=None, segments=None):
+        self.circles = np.zeros((0, 3)) if circles is None else np.asarray(circles, dtype=float).reshape(-1, 3)
+        self.boxes = np.zeros((0, 5)) if boxes is None else np.asarray(boxes, dtype=float).reshape(-1, 5)
+        self.segments = np.zeros((0, 4)) if segments is None else np.asarray(segments, dtype=float).reshape(-1, 4)
+        self.sources = None   # {"circle": [...], "box": [...], "segment": [...]} when built from objects
+
+    @classmethod
+    def from_obstacles(cls, obstacles):
+        circles, boxes, segments = [], [], []
+        sources = {"circle": [], "box": [], "segment": []}
+        for obj in obstacles:
+            if isinstance(obj, CircleObstacle):
+                circles.append((obj.x, obj.y, obj.radius))
+                sources["circle"].append(obj)
+            elif isinstance(obj, (CarObstacle, CartObstacle)):
+                boxes.append((obj.x, obj.y, obj.width / 2, obj.height / 2, math.radians(obj.angle)))
+                sources["box"].append(obj)
+            elif isinstance(obj, LineSegment):
+                segments.append((*obj.start, *obj.end))
+                sources["segment"].append(obj)
+        geometry = cls(circles, boxes, segments)
+        geometry.sources = sources
+        return geometry
+
+
+# ================================
+# Closed-form ray intersections
+# ================================
+# Rays are origin (ox, oy) plus unit direction (dx, dy), shaped (...,); shapes are (M,).
+# Each returns distances shaped (..., M), inf where the ray misses. Origins inside
+# a shape report 0, like the sample at distance 0 of the old pixel march.
+
+def ray_circles(ox, oy, dx, dy, circles):
+    cx, cy, r = circles[:, 0], circles[:, 1], circles[:, 2]
+    fx = ox[..., None] - cx
+    fy = oy[..., None] - cy
+    b = fx * dx[..., None] + fy * dy[..., None]
+    c = fx * fx + fy * fy - r * r
+    disc = b * b - c
+    t = -b - np.sqrt(np.maximum(disc, 0.0))
+    t = np.where(c <= 0, 0.0, t)
+    return np.where((disc >= 0) & (t >= 0), t, np.inf)
+
+def _reciprocal(v):
+    # 1 / v with exact zeros nudged to a tiny positive value: a ray parallel to a slab
+    # then gets slab distances of opposite sign (inside, edges included) or the same
+    # sign (outside), without the inf * 0 cases a true division by zero would produce
+    return 1.0 / np.where(v == 0, 1e-300, v)
+
+def ray_boxes(ox, oy, dx, dy, boxes):
+    cx, cy, hw, hh, angle = (boxes[:, i] for i in range(5))
+    cos_a, sin_a = np.cos(angle), np.sin(angle)
+    # Move the ray into each box's local frame, then use the slab test
+    px = ox[..., None] - cx
+    py = oy[..., None] - cy
+    lx = px * cos_a + py * sin_a
+    ly = py * cos_a - px * sin_a
+    dx, dy = dx[..., None], dy[..., None]
+    inv_x = _reciprocal(dx * cos_a + dy * sin_a)
+    inv_y = _reciprocal(dy * cos_a - dx * sin_a)
+
+    t1x, t2x = (-hw - lx) * inv_x, (hw - lx) * inv_x
+    t1y, t2y = (-hh - ly) * inv_y, (hh - ly) * inv_y
+    t_near = np.maximum(np.minimum(t1x, t2x), np.minimum(t1y, t2y))
+    t_far = np.minimum(np.maximum(t1x, t2x), np.maximum(t1y, t2y))
+    hit = (t_near <= t_far) & (t_far >= 0)
+    return np.where(hit, np.maximum(t_near, 0.0), np.inf)
+
+def ray_segments(ox, oy, dx, dy, segments):
+    x1, y1, x2, y2 = (segments[:, i] for i in range(4))
+    ex, ey = x2 - x1, y2 - y1
+    dx, dy = dx[..., None], dy[..., None]
+    denom = dx * ey - dy * ex
+    parallel = denom == 0
+    inv = 1.0 / np.where(parallel, 1.0, denom)
+    wx = x1 - ox[..., None]
+    wy = y1 - oy[..., None]
+    t = (wx * ey - wy * ex) * inv
+    u = (wx * dy - wy * dx) * inv
+    hit = ~parallel & (t >= 0) & (u >= 0) & (u <= 1)
+    return np.where(hit, t, np.inf)
+
+def screen_exit(ox, oy, dx, dy, width=WIDTH, height=HEIGHT):
+    # Distance at which each ray leaves the screen; the old march stopped there without a hit.
+    # Of the two edges on an axis the ray runs towards the far one, at the larger distance.
+    inv_x, inv_y = _reciprocal(dx), _reciprocal(dy)
+    tx = np.where(dx == 0, np.inf, np.maximum((width - ox) * inv_x, -ox * inv_x))
+    ty = np.where(dy == 0, np.inf, np.maximum((height - oy) * inv_y, -oy * inv_y))
+    return np.minimum(tx, ty)
+
+
+# ================================
+# Sensor casting
+# ================================
+
+def cast_rays(ox, oy, angles, geometry, max_distance=MAX_SENSOR_DISTANCE):
+    # ox, oy: ray origins and angles: absolute ray angles, broadcast against each other
+    ox, oy, angles = np.asarray(ox, float), np.asarray(oy, float), np.asarray(angles, float)
+    dx, dy = np.cos(angles), np.sin(angles)
+
+    limit = np.minimum(screen_exit(ox, oy, dx, dy), max_distance)
+    dist = np.inf
+    if len(geometry.circles):
+        dist = np.minimum(dist, ray_circles(ox, oy, dx, dy, geometry.circles).min(axis=-1))
+    if len(geometry.boxes):
+        dist = np.minimum(dist, ray_boxes(ox, oy, dx, dy, geometry.boxes).min(axis=-1))
+    if len(geometry.segments):
+        dist = np.minimum(dist, ray_segments(ox, oy, dx, dy, geometry.segments).min(axis=-1))
+    return np.where(dist < limit, dist, np.inf)
+
+def cast_sensors(x, y, heading, geometry, max_distance=MAX_SENSOR_DISTANCE):
+    # All 8 sensors for one or many cars: x, y, heading shaped (N,) -> distances (N, 8)
+    x, y, heading = (np.asarray(v, float)[..., None] for v in (x, y, heading))
+    return cast_rays(x, y, heading + SENSOR_OFFSETS, geometry, max_distance)
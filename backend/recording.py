@@ -0,0 +1,332 @@
+import argparse
+import glob
+import json
+import math
+import os
+import struct
+import sys
+import time
+
+import numpy as np
+
+from obstacle import obstacle_from_dict, obstacle_to_dict
+from raycast import SENSOR_LABELS
+
+# ================================
+# Episode recording
+# ================================
+# One file per episode: an 8-byte magic, a uint32 header length, a JSON header
+# (layout, seed, sim settings, initial car state) padded to a 64-byte boundary,
+# then one fixed-size STEP_DTYPE record per step. Records are appended in batches
+# while recording and the step count is implied by the file size, so a crashed run
+# still leaves a readable file. Episode.load() memory-maps the records.
+#
+# Each record is the full controller state after the step, so replay can seek to
+# any step and re-simulate from there; float64 keeps re-simulation bit-exact.
+#
+# Only what the header and records hold can be replayed: the layout as it was when
+# recording started and the rule-based controller's state. A planned path (Car.plan),
+# an occupancy grid and obstacle edits are not recorded, so a recording cannot start
+# with them and stops at the first step they would change (see unrecordable()).
+
+MAGIC = b"PKEPISO1"
+ALIGN = 64
+AUTO_STATES = ("scanning", "parking", "parked", "following")
+
+STEP_DTYPE = np.dtype([
+    ("action", np.float64, 2),        # (throttle, steer); NaN for rule-based auto steps
+    ("x", np.float64),
+    ("y", np.float64),
+    ("angle", np.float64),
+    ("speed", np.float64),
+    ("steering", np.float64),
+    ("recovery_steering", np.float64),   # NaN until the first recovery
+    ("sensors", np.float64, len(SENSOR_LABELS)),  # sensor_data by SENSOR_LABELS, NaN = no reading
+    ("parked_timer", np.int16),
+    ("recovery_timer", np.int16),
+    ("state", np.uint8),              # index into AUTO_STATES
+    ("collided", np.bool_),
+])
+
+
+def car_state(car):
+    # Controller state that the next step depends on, as JSON types
+    return {
+        "x": car.x, "y": car.y, "angle": car.angle, "speed": car.speed,
+        "steering": car.steering_angle, "auto_state": car.auto_state,
+        "parked_timer": car.parked_timer, "recovery_timer": getattr(car, "recovery_timer", 0),
+        "recovery_steering": getattr(car, "recovery_steering_angle", None),
+        "sensor_data": dict(car.sensor_data),
+    }
+
+def _state_from_record(record):
+    sensors = record["sensors"].tolist()
+    recovery = float(record["recovery_steering"])
+    return {
+        "x": float(record["x"]), "y": float(record["y"]), "angle": float(record["angle"]),
+        "speed": float(record["speed"]), "steering": float(record["steering"]),
+        "auto_state": AUTO_STATES[record["state"]],
+        "parked_timer": int(record["parked_timer"]), "recovery_timer": int(record["recovery_timer"]),
+        "recovery_steering": None if math.isnan(recovery) else recovery,
+        "sensor_data": {label: v for label, v in zip(SENSOR_LABELS, sensors) if not math.isnan(v)},
+    }
+
+def restore_car(car, state):
+    car.x, car.y, car.angle = state["x"], state["y"], state["angle"]
+    car.speed, car.steering_angle = state["speed"], state["steering"]
+    car.auto_state = state["auto_state"]
+    car.parked_timer = state["parked_timer"]
+    car.recovery_timer = state["recovery_timer"]
+    if state["recovery_steering"] is not None:
+        car.recovery_steering_angle = state["recovery_steering"]
+    car.sensor_data = dict(state["sensor_data"])
+
+
+def unrecordable(sim, layout_version=None):
+    # Why sim's next step could not be replayed from a recording, or None
+    if sim.car.plan is not None or sim.car.auto_state == "following":
+        return "the car is following a planned path"
+    if sim.occupancy is not None:
+        return "mapping is enabled"
+    if layout_version is not None and sim.layout_version != layout_version:
+        return "the obstacles or parking lines were edited"
+    return None
+
+
+class EpisodeRecorder:
+    # Attach as sim.recorder after placing obstacles and resetting; Simulation.step()
+    # then calls record() once per step. Raises ValueError for a sim that can't be
+    # replayed; once one of those steps comes up, the file keeps the steps before it
+    # and `stopped` holds the reason.
+    def __init__(self, path, sim, seed=None, batch_size=256, **meta):
+        reason = unrecordable(sim)
+        if reason is not None:
+            raise ValueError(f"Cannot record this episode: {reason}")
+        header = {
+            "version": 1,
+            "seed": seed,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "settings": {"start": list(sim.start), "sensor_range": sim.sensor_range, "dt": sim.dt,
+                         "substeps": sim.substeps, "integrator": sim.integrator},
+            "obstacles": [obstacle_to_dict(obj) for obj in sim.obstacles],
+            "initial": car_state(sim.car),
+            "meta": meta,             # e.g. yellow_image="background.png"
+        }
+        body = json.dumps(header, separators=(",", ":")).encode()
+        offset = len(MAGIC) + 4 + len(body)
+        body += b" " * (-offset % ALIGN)
+
+        self.path = path
+        self.file = open(path, "wb")
+        self.file.write(MAGIC + struct.pack("<I", len(body)) + body)
+        self.batch_size = batch_size
+        self._buffer = np.zeros(batch_size, dtype=STEP_DTYPE)
+        self._count = 0
+        self.steps = 0
+        self.layout_version = sim.layout_version
+        self.stopped = None
+
+    def record(self, sim, action=None):
+        if self.stopped is not None:
+            return
+        reason = unrecordable(sim, self.layout_version)
+        if reason is not None:
+            self.stopped = reason
+            self.close()
+            return
+        car = sim.car
+        row = self._buffer[self._count]
+        row["action"] = (math.nan, math.nan) if action is None else action
+        row["x"], row["y"], row["angle"] = car.x, car.y, car.angle
+        row["speed"], row["steering"] = car.speed, car.steering_angle
+        row["recovery_steering"] = getattr(car, "recovery_steering_angle", math.nan)
+        data = car.sensor_data
+        row["sensors"] = [data.get(label, math.nan) for label in SENSOR_LABELS]
+        row["parked_timer"] = car.parked_timer
+        row["recovery_timer"] = getattr(car, "recovery_timer", 0)
+        row["state"] = AUTO_STATES.index(car.auto_state)
+        row["collided"] = sim.collided
+        self._count += 1
+        self.steps += 1
+        if self._count == self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self._count:
+            self.file.write(self._buffer[:self._count].tobytes())
+            self.file.flush()
+            self._count = 0
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+
+class NullRecorder:
+    def record(self, sim, action=None):
+        pass
+
+    def close(self):
+        pass
+
+
+# Shared no-op recorder so Simulation.step() can call record() without a None test
+NULL_RECORDER = NullRecorder()
+
+
+# ================================
+# Replay
+# ================================
+
+def read_header(path):
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not an episode recording")
+        (length,) = struct.unpack("<I", f.read(4))
+        header = json.loads(f.read(length))
+    return header, len(MAGIC) + 4 + length
+
+
+class Episode:
+    def __init__(self, header, steps, path=None):
+        self.header = header
+        self.steps = steps          # STEP_DTYPE records, usually memory-mapped
+        self.path = path
+
+    @classmethod
+    def load(cls, path):
+        header, offset = read_header(path)
+        count = (os.path.getsize(path) - offset) // STEP_DTYPE.itemsize
+        if count:
+            steps = np.memmap(path, dtype=STEP_DTYPE, mode="r", offset=offset, shape=(count,))
+        else:
+            steps = np.zeros(0, dtype=STEP_DTYPE)
+        return cls(header, steps, path)
+
+    def __len__(self):
+        return len(self.steps)
+
+    @property
+    def parked(self):
+        return bool(len(self.steps)) and AUTO_STATES[self.steps["state"][-1]] == "parked"
+
+    def state(self, index):
+        # Car state after step index; -1 is the state the recording started from
+        return self.header["initial"] if index < 0 else _state_from_record(self.steps[index])
+
+    def actions(self):
+        # One per step: (throttle, steer), or None for rule-based auto steps
+        actions = self.steps["action"]
+        auto = np.isnan(actions[:, 0])
+        return [None if a else (float(t), float(s)) for a, (t, s) in zip(auto.tolist(), actions.tolist())]
+
+    def simulation(self, yellow_map=None):
+        # Fresh headless Simulation with the recorded layout and settings
+        from sim import Simulation
+        if yellow_map is None and self.header["meta"].get("yellow_image"):
+            from yellow import YellowMap
+            yellow_map = YellowMap.from_image(self.header["meta"]["yellow_image"])
+        settings = self.header["settings"]
+        sim = Simulation([obstacle_from_dict(d) for d in self.header["obstacles"]], yellow_map,
+                         start=tuple(settings["start"]), sensor_range=settings["sensor_range"],
+                         dt=settings["dt"], substeps=settings["substeps"], integrator=settings["integrator"])
+        self.seek(sim, -1)
+        return sim
+
+    def seek(self, sim, index):
+        # Put sim in the state it had after step index, ready to step index + 1
+        state = self.state(index)
+        sim.reset(state["x"], state["y"], state["angle"])
+        restore_car(sim.car, state)
+        sim.steps = index + 1
+        sim.sense()
+        sim.update_contacts()
+        return sim
+
+    def resimulate(self, sim=None, start=0, stop=None):
+        # Re-run steps [start, stop) headlessly, yielding (index, sim) after each one
+        sim = sim if sim is not None else self.simulation()
+        self.seek(sim, start - 1)
+        actions = self.actions()
+        for index in range(start, len(actions) if stop is None else stop):
+            sim.step(actions[index])
+            yield index, sim
+
+    def verify(self, sim=None, start=0, tolerance=0.0):
+        # Index of the first re-simulated step whose pose differs from the recording, or None
+        steps = self.steps
+        for index, sim in self.resimulate(sim, start):
+            car = sim.car
+            expected = steps[index]
+            if (abs(car.x - expected["x"]) > tolerance or abs(car.y - expected["y"]) > tolerance
+                    or abs(car.angle - expected["angle"]) > tolerance
+                    or car.auto_state != AUTO_STATES[expected["state"]]):
+                return index
+        return None
+
+
+def summarize(paths):
+    # One row per recording, read from the last record only
+    rows = []
+    for path in paths:
+        episode = Episode.load(path)
+        steps = episode.steps
+        last = steps[-1] if len(steps) else None
+        rows.append({
+            "path": path,
+            "seed": episode.header["seed"],
+            "steps": len(steps),
+            "parked": episode.parked,
+            "collision_steps": int(steps["collided"].sum()),
+            "final_state": AUTO_STATES[last["state"]] if last is not None else episode.header["initial"]["auto_state"],
+            "final_pose": [round(float(last[k]), 1) for k in ("x", "y", "angle")] if last is not None else None,
+        })
+    return rows
+
+
+def _expand(paths):
+    found = []
+    for path in paths:
+        found.extend(sorted(glob.glob(os.path.join(path, "*.ep"))) if os.path.isdir(path) else [path])
+    return found
+
+
+if __name__ == "__main__":
+    # python recording.py summary DIR_OR_FILES... | show FILE [--step N] | verify FILE
+    parser = argparse.ArgumentParser(description="Inspect and re-simulate episode recordings")
+    commands = parser.add_subparsers(dest="command", required=True)
+    summary = commands.add_parser("summary", help="one line per recording")
+    summary.add_argument("paths", nargs="+")
+    summary.add_argument("--failed", action="store_true", help="only episodes that did not park")
+    show = commands.add_parser("show", help="car state at a step")
+    show.add_argument("path")
+    show.add_argument("--step", type=int, default=-1)
+    verify = commands.add_parser("verify", help="re-simulate and compare against the recording")
+    verify.add_argument("path")
+    verify.add_argument("--start", type=int, default=0)
+    verify.add_argument("--yellow-image", help="background image, if not named in the recording")
+    args = parser.parse_args()
+
+    if args.command == "summary":
+        for row in summarize(_expand(args.paths)):
+            if not (args.failed and row["parked"]):
+                print(json.dumps(row))
+    elif args.command == "show":
+        episode = Episode.load(args.path)
+        index = args.step if args.step >= 0 else len(episode) - 1
+        print(json.dumps({"step": index, **episode.state(index)}, indent=2))
+    elif args.command == "verify":
+        episode = Episode.load(args.path)
+        t0 = time.perf_counter()
+        yellow_map = None
+        if args.yellow_image:
+            from yellow import YellowMap
+            yellow_map = YellowMap.from_image(args.yellow_image)
+        diverged = episode.verify(episode.simulation(yellow_map), start=args.start)
+        elapsed = time.perf_counter() - t0
+        count = len(episode) - args.start
+        print(f"{count} steps re-simulated in {elapsed:.2f} s "
+              f"({count / max(elapsed, 1e-9):.0f} steps/s): "
+              + ("identical" if diverged is None else f"diverged at step {diverged}"))
+        sys.exit(0 if diverged is None else 1)
@@ -0,0 +1,54 @@
+import pygame
+
+# ================================
+# Incremental Renderer
+# ================================
+# The screen is split into a cached static layer (background, buttons, parked obstacles)
+# and a dynamic layer (car, sensors, dragged obstacle, overlays). Each frame only the
+# rects the dynamic layer touched last frame and this frame are restored and pushed with
+# pygame.display.update(rects). The static layer is redrawn only after invalidate().
+
+class IncrementalRenderer:
+    def __init__(self, screen):
+        self.screen = screen
+        self.base = pygame.Surface(screen.get_size())
+        self.base_valid = False
+        self.prev_rects = []
+        self.dirty = []
+        self.full_update = True
+        self._text = {}
+
+    def invalidate(self):
+        # Call when something in the static layer changed
+        self.base_valid = False
+
+    def text(self, font, text, color):
+        # Pre-rendered label surfaces, rendered once per (font, text, color)
+        key = (id(font), text, color)
+        surface = self._text.get(key)
+        if surface is None:
+            surface = self._text[key] = font.render(text, True, color)
+        return surface
+
+    def draw(self, draw_static, draw_dynamic):
+        # draw_static(surface) paints the static layer; draw_dynamic(surface) returns dirty rects
+        screen = self.screen
+        if not self.base_valid:
+            draw_static(self.base)
+            self.base_valid = True
+            screen.blit(self.base, (0, 0))
+            self.full_update = True
+        else:
+            for rect in self.prev_rects:
+                screen.blit(self.base, rect, rect)
+
+        rects = [pygame.Rect(r) for r in draw_dynamic(screen) if r]
+        self.dirty = self.prev_rects + rects
+        self.prev_rects = rects
+
+    def present(self):
+        if self.full_update:
+            pygame.display.flip()
+            self.full_update = False
+        else:
+            pygame.display.update(self.dirty)
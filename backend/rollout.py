@@ -0,0 +1,300 @@
+import multiprocessing as mp
+from multiprocessing import shared_memory
+from functools import partial
+
+import numpy as np
+
+from parking_env import ParkingEnv
+from raycast import MAX_SENSOR_DISTANCE, SENSOR_LABELS
+from scenarios import random_layout
+
+# ================================
+# Headless rollout env
+# ================================
+
+class SimEnv:
+    # ParkingEnv (seeded random layout, rewards, parked/hold check) with a flat float32
+    # observation: 8 sensor distances (MAX_SENSOR_DISTANCE if no hit), then x, y, angle,
+    # speed, steering. Collisions are penalised but do not end the episode.
+    OBS_SIZE = len(SENSOR_LABELS) + 5
+    ACTION_SIZE = 2
+
+    def __init__(self, yellow_image=None, n_obstacles=5, max_steps=1000, yellow_map=None):
+        if yellow_image and yellow_map is None:
+            from yellow import YellowMap
+            yellow_map = YellowMap.from_image(yellow_image)
+        self.env = ParkingEnv(yellow_map, layout_fn=partial(random_layout, n_obstacles=n_obstacles),
+                              max_steps=max_steps, terminate_on_collision=False)
+        self.sim = self.env.sim
+        self.obs = np.zeros(self.OBS_SIZE, dtype=np.float32)
+
+    def reset(self, seed=None):
+        self.env.reset(seed=seed)
+        return self.observe()
+
+    def observe(self):
+        car = self.sim.car
+        obs = self.obs
+        n = len(SENSOR_LABELS)
+        np.minimum(car.sensor_distances, MAX_SENSOR_DISTANCE, out=obs[:n])
+        obs[n:] = car.x, car.y, car.angle, car.speed, car.steering_angle
+        return obs
+
+    def step(self, action):
+        _, reward, terminated, truncated, _ = self.env.step(action)
+        return self.observe(), reward, terminated or truncated
+
+
+# ================================
+# Shared-memory worker pool
+# ================================
+# Every array lives in one SharedMemory block per field. The parent writes actions and a
+# command per worker, then flips an Event; workers write observations, rewards and dones
+# in place. Nothing is pickled per step.
+
+CMD_STEP, CMD_RESET, CMD_CLOSE = range(3)
+
+def _attach(spec):
+    blocks, arrays = [], {}
+    for name, (shm_name, shape, dtype) in spec.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        blocks.append(shm)
+        arrays[name] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    return blocks, arrays
+
+def _attach_local(blocks, spec):
+    # Parent side: views over blocks it created itself
+    arrays = {}
+    for shm, (name, (_, shape, dtype)) in zip(blocks, spec.items()):
+        arrays[name] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    return blocks, arrays
+
+def episode_seed(base_seed, env_index, episode):
+    # Independent, reproducible stream per (env, episode)
+    return int(np.random.SeedSequence([base_seed, env_index, episode]).generate_state(1)[0])
+
+def _reset(env, seed):
+    # SimEnv.reset returns obs; gym-style envs return (obs, info)
+    result = env.reset(seed=seed)
+    return result[0] if isinstance(result, tuple) else result
+
+def _step(env, action):
+    # -> (obs, reward, done) for both SimEnv and gym-style (obs, reward, terminated, truncated, info)
+    result = env.step(action)
+    if len(result) == 5:
+        o, r, terminated, truncated, _ = result
+        return o, r, terminated or truncated
+    return result
+
+def _worker(worker_id, envs_per_worker, env_fn, env_kwargs, spec, base_seed, go, ready):
+    blocks, arrays = _attach(spec)
+    first = worker_id * envs_per_worker
+    envs = [env_fn(**env_kwargs) for _ in range(envs_per_worker)]
+    obs, actions = arrays["obs"], arrays["actions"]
+    rewards, dones, episodes = arrays["rewards"], arrays["dones"], arrays["episodes"]
+    commands = arrays["commands"]
+
+    try:
+        while True:
+            go.wait()
+            go.clear()
+            command = commands[worker_id]
+            if command == CMD_CLOSE:
+                break
+            for k, env in enumerate(envs):
+                i = first + k
+                if command == CMD_RESET:
+                    obs[i] = _reset(env, episode_seed(base_seed, i, episodes[i]))
+                    rewards[i] = 0
+                    dones[i] = False
+                    continue
+                o, r, d = _step(env, actions[i])
+                rewards[i] = r
+                dones[i] = d
+                if d:
+                    # Auto-reset; the final observation of the episode is dropped like gym vector envs
+                    episodes[i] += 1
+                    o = _reset(env, episode_seed(base_seed, i, episodes[i]))
+                obs[i] = o
+            ready.set()
+    finally:
+        for shm in blocks:
+            shm.close()
+
+
+class RolloutPool:
+    def __init__(self, num_workers, envs_per_worker, env_fn=SimEnv, env_kwargs=None, seed=0,
+                 obs_size=None, action_size=None, timeout=30.0):
+        self.num_workers = num_workers
+        self.envs_per_worker = envs_per_worker
+        self.num_envs = num_workers * envs_per_worker
+        self.env_fn = env_fn
+        self.env_kwargs = env_kwargs or {}
+        self.seed = seed
+        self.timeout = timeout
+        self.restarts = 0
+
+        obs_size = obs_size or env_fn.OBS_SIZE
+        action_size = action_size or env_fn.ACTION_SIZE
+        n = self.num_envs
+        fields = {
+            "obs": ((n, obs_size), np.float32),
+            "actions": ((n, action_size), np.float32),
+            "rewards": ((n,), np.float32),
+            "dones": ((n,), np.bool_),
+            "episodes": ((n,), np.int64),
+            "commands": ((num_workers,), np.int32),
+        }
+        self._blocks = []
+        self.spec = {}
+        for name, (shape, dtype) in fields.items():
+            size = max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize)
+            shm = shared_memory.SharedMemory(create=True, size=size)
+            self._blocks.append(shm)
+            self.spec[name] = (shm.name, shape, dtype)
+        _, arrays = _attach_local(self._blocks, self.spec)
+        self.obs = arrays["obs"]
+        self.actions = arrays["actions"]
+        self.rewards = arrays["rewards"]
+        self.dones = arrays["dones"]
+        self.episodes = arrays["episodes"]
+        self.commands = arrays["commands"]
+        self.episodes[:] = 0
+
+        self._ctx = mp.get_context()
+        self._go = [self._ctx.Event() for _ in range(num_workers)]
+        self._ready = [self._ctx.Event() for _ in range(num_workers)]
+        self._procs = [self._spawn(w) for w in range(num_workers)]
+
+    def _spawn(self, worker_id):
+        proc = self._ctx.Process(
+            target=_worker,
+            args=(worker_id, self.envs_per_worker, self.env_fn, self.env_kwargs, self.spec,
+                  self.seed, self._go[worker_id], self._ready[worker_id]),
+            daemon=True)
+        proc.start()
+        return proc
+
+    def _env_slice(self, worker_id):
+        return slice(worker_id * self.envs_per_worker, (worker_id + 1) * self.envs_per_worker)
+
+    def _run(self, command, workers):
+        for w in workers:
+            self._ready[w].clear()
+            self.commands[w] = command
+            self._go[w].set()
+        failed = []
+        for w in workers:
+            if not self._wait(w):
+                failed.append(w)
+        return failed
+
+    def _wait(self, worker_id):
+        # Poll so a dead worker is noticed quickly instead of after the full timeout
+        waited = 0.0
+        while not self._ready[worker_id].wait(0.1):
+            waited += 0.1
+            if not self._procs[worker_id].is_alive() or waited >= self.timeout:
+                return False
+        return True
+
+    def _recover(self, failed):
+        # Replace crashed or hung workers; their envs restart on the next episode seed
+        for w in failed:
+            proc = self._procs[w]
+            if proc.is_alive():
+                proc.kill()
+            proc.join()
+            self.restarts += 1
+            self.episodes[self._env_slice(w)] += 1
+            self._go[w].clear()
+            self._procs[w] = self._spawn(w)
+        still_failed = self._run(CMD_RESET, failed)
+        if still_failed:
+            raise RuntimeError(f"rollout workers {still_failed} failed again after restart")
+        for w in failed:
+            self.dones[self._env_slice(w)] = True
+
+    def reset(self):
+        failed = self._run(CMD_RESET, range(self.num_workers))
+        if failed:
+            self._recover(failed)
+        return self.obs
+
+    def step(self, actions=None):
+        # Returns views into shared memory; copy them if they must outlive the next step
+        if actions is not None:
+            self.actions[:] = actions
+        failed = self._run(CMD_STEP, range(self.num_workers))
+        if failed:
+            self._recover(failed)
+        return self.obs, self.rewards, self.dones
+
+    def close(self):
+        for w, proc in enumerate(self._procs):
+            if proc.is_alive():
+                self.commands[w] = CMD_CLOSE
+                self._go[w].set()
+        for proc in self._procs:
+            proc.join(timeout=5)
+            if proc.is_alive():
+                proc.kill()
+        for shm in self._blocks:
+            shm.close()
+            shm.unlink()
+        self._blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ================================
+# In-process pool
+# ================================
+
+class LocalPool:
+    # RolloutPool's interface and arrays with every env stepped in this process; for
+    # small batches and policy evaluation, where a worker round trip costs more than the envs
+    def __init__(self, num_envs, env_fn=SimEnv, env_kwargs=None, seed=0, obs_size=None, action_size=None):
+        self.num_envs = num_envs
+        self.seed = seed
+        self.envs = [env_fn(**(env_kwargs or {})) for _ in range(num_envs)]
+        self.obs = np.zeros((num_envs, obs_size or env_fn.OBS_SIZE), dtype=np.float32)
+        self.actions = np.zeros((num_envs, action_size or env_fn.ACTION_SIZE), dtype=np.float32)
+        self.rewards = np.zeros(num_envs, dtype=np.float32)
+        self.dones = np.zeros(num_envs, dtype=np.bool_)
+        self.episodes = np.zeros(num_envs, dtype=np.int64)
+
+    def reset(self):
+        for i, env in enumerate(self.envs):
+            self.obs[i] = _reset(env, episode_seed(self.seed, i, self.episodes[i]))
+        self.rewards[:] = 0
+        self.dones[:] = False
+        return self.obs
+
+    def step(self, actions=None):
+        if actions is not None:
+            self.actions[:] = actions
+        for i, env in enumerate(self.envs):
+            o, r, d = _step(env, self.actions[i])
+            self.rewards[i] = r
+            self.dones[i] = d
+            if d:
+                self.episodes[i] += 1
+                o = _reset(env, episode_seed(self.seed, i, self.episodes[i]))
+            self.obs[i] = o
+        return self.obs, self.rewards, self.dones
+
+    def close(self):
+        for env in self.envs:
+            if hasattr(env, "close"):
+                env.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,296 @@
+import collections
+import json
+import math
+import os
+import random
+import sys
+
+import numpy as np
+
+from collision import CAR_HALF_EXTENTS, box_aabbs, car_boxes, circle_aabbs, collide, segment_aabbs
+from obstacle import CarObstacle, CartObstacle, CircleObstacle, LineSegment, obstacle_from_dict, obstacle_to_dict
+from raycast import SceneGeometry
+from yellow import YellowCache, YellowMap
+
+# ================================
+# Procedural parking lots
+# ================================
+# A scenario is one or two rows of parking bays drawn as yellow LineSegment geometry,
+# parked cars in some bays, carts and bollards in the driving lane and a start pose.
+# Everything is derived from the seed, so generate_scenario(seed) is reproducible.
+# The lot fills the game area left of the UI panel.
+
+LOT = (0, 0, 600, 500)       # x0, y0, x1, y1
+MARGIN = 6                   # min gap between placed obstacles, px
+START_CLEARANCE = 25         # min gap between the start footprint and anything else
+MAX_TRIES = 50
+
+
+class InvalidScenario(Exception):
+    pass
+
+
+class Scenario:
+    def __init__(self, seed, lines, obstacles, bays, start, yellow_map=None, geometry=None):
+        self.seed = seed
+        self.lines = lines            # [(x1, y1, x2, y2)] parking lines
+        self.obstacles = obstacles    # [obstacle_to_dict(...)]; obstacle_objects() builds fresh objects
+        self.bays = bays              # [{"x", "y", "angle", "heading", "width", "depth", "free"}] bay centers, degrees
+        self.start = start            # (x, y, angle) with angle in radians
+        self._yellow_map = yellow_map
+        self._geometry = geometry     # SceneGeometry of the obstacles, packed once
+        self._grid_cells = {}         # (cell_size, cols, rows) -> grid cells of the geometry rows
+
+    @property
+    def yellow_map(self):
+        if self._yellow_map is None:
+            segments = [LineSegment((x1, y1), (x2, y2)) for x1, y1, x2, y2 in self.lines]
+            self._yellow_map = YellowMap.from_segments(segments)
+        return self._yellow_map
+
+    @property
+    def free_bays(self):
+        return [bay for bay in self.bays if bay["free"]]
+
+    @property
+    def geometry(self):
+        if self._geometry is None:
+            objects = SceneGeometry.from_obstacles(self.obstacle_objects())
+            self._geometry = SceneGeometry(objects.circles, objects.boxes, objects.segments)
+        return self._geometry
+
+    def grid_cells(self, grid):
+        # The geometry rows' cells in a SpatialGrid, in Simulation.load_geometry() order
+        key = (grid.cell_size, grid.cols, grid.rows)
+        if key not in self._grid_cells:
+            g = self.geometry
+            bounds = np.concatenate([box_aabbs(g.boxes), circle_aabbs(g.circles), segment_aabbs(g.segments)])
+            self._grid_cells[key] = grid.cells_for_many(bounds)
+        return self._grid_cells[key]
+
+    def obstacle_objects(self):
+        return [obstacle_from_dict(d) for d in self.obstacles]
+
+    @staticmethod
+    def bay_pose(bay):
+        # Parked car pose (x, y, angle radians) in a bay: reversed in, nose toward the opening
+        return bay["x"], bay["y"], math.radians(bay["heading"])
+
+    def apply(self, sim, objects=True):
+        # Load this scenario into a Simulation and reset the car at the start pose.
+        # objects=False bulk-loads the packed geometry instead of building Obstacle objects
+        # (nothing to draw or edit, but sensing and collisions are the same), e.g. for
+        # training resets.
+        if objects:
+            sim.clear_obstacles()
+            for obs in self.obstacle_objects():
+                sim.add_obstacle(obs)
+        else:
+            sim.load_geometry(self.geometry, self.grid_cells(sim.grid))
+        sim.set_yellow_map(self.yellow_map)
+        sim.start = self.start[:2]
+        sim.reset(*self.start)
+        return sim
+
+    def to_dict(self):
+        return {"seed": self.seed, "lines": self.lines, "obstacles": self.obstacles,
+                "bays": self.bays, "start": list(self.start)}
+
+    @classmethod
+    def from_dict(cls, data, yellow_map=None, geometry=None):
+        return cls(data["seed"], [tuple(line) for line in data["lines"]], data["obstacles"],
+                   data["bays"], tuple(data["start"]), yellow_map, geometry)
+
+
+# ---- generation ----
+
+def _footprint(obj, margin=0.0):
+    # Oriented box row (cx, cy, half_w, half_h, angle) around an obstacle
+    if isinstance(obj, CircleObstacle):
+        return (obj.x, obj.y, obj.radius + margin, obj.radius + margin, 0.0)
+    return (obj.x, obj.y, obj.width / 2 + margin, obj.height / 2 + margin, math.radians(obj.angle))
+
+def _fits(box, geometry, lot=LOT):
+    x0, y0, x1, y1 = lot
+    reach = math.hypot(box[2], box[3])
+    if not (x0 + reach <= box[0] <= x1 - reach and y0 + reach <= box[1] <= y1 - reach):
+        return False
+    return not len(collide(np.array([box], dtype=float), geometry)[0])
+
+def _bay_row(back_y, opening, bay_w, depth, x_start, count):
+    # Lines of one row: the back line plus count + 1 dividers; opening is +1 (down) or -1 (up).
+    # heading is the direction a car parked nose-out faces.
+    x_end = x_start + count * bay_w
+    lines = [(x_start, back_y, x_end, back_y)]
+    for i in range(count + 1):
+        x = x_start + i * bay_w
+        lines.append((x, back_y, x, back_y + opening * depth))
+    bays = [{"x": x_start + (i + 0.5) * bay_w, "y": back_y + opening * depth / 2, "angle": 90,
+             "heading": 90 * opening, "width": bay_w, "depth": depth, "free": True}
+            for i in range(count)]
+    return lines, bays
+
+def generate_scenario(seed, occupancy=None, n_clutter=None):
+    rng = random.Random(seed)
+    x0, y0, x1, y1 = LOT
+    bay_w = round(rng.uniform(55, 70))
+    depth = round(rng.uniform(90, 120))
+
+    lines, bays = [], []
+    rows = [(y0 + round(rng.uniform(15, 40)), 1)]
+    if rng.random() < 0.6:
+        rows.append((y1 - round(rng.uniform(15, 40)), -1))
+    for back_y, opening in rows:
+        count = rng.randint(4, (x1 - x0 - 40) // bay_w)
+        x_start = round(rng.uniform(x0 + 20, x1 - 20 - count * bay_w))
+        row_lines, row_bays = _bay_row(back_y, opening, bay_w, depth, x_start, count)
+        lines.extend(row_lines)
+        bays.extend(row_bays)
+
+    # Parked cars, keeping at least one bay free
+    occupancy = rng.uniform(0.2, 0.7) if occupancy is None else occupancy
+    obstacles = []
+    for bay in bays:
+        if rng.random() < occupancy:
+            car = CarObstacle(bay["x"] + rng.uniform(-3, 3), bay["y"] + rng.uniform(-3, 3))
+            car.angle = 90 + rng.choice((-2, 0, 2))
+            obstacles.append(car)
+            bay["free"] = False
+    if all(not bay["free"] for bay in bays):
+        index = rng.randrange(len(bays))
+        bays[index]["free"] = True
+        obstacles = [o for o in obstacles if math.hypot(o.x - bays[index]["x"], o.y - bays[index]["y"]) > 5]
+
+    def geometry():
+        return SceneGeometry(boxes=[_footprint(o) for o in obstacles], segments=lines)
+
+    # Lane clutter: carts and bollards with a margin around everything placed so far
+    n_clutter = rng.randint(0, 4) if n_clutter is None else n_clutter
+    for _ in range(n_clutter):
+        for _ in range(MAX_TRIES):
+            kind = rng.choice((CartObstacle, CircleObstacle))
+            obj = kind(rng.uniform(x0, x1), rng.uniform(y0, y1))
+            if kind is CartObstacle:
+                obj.rotate(rng.choice(range(0, 360, 15)))
+            if _fits(_footprint(obj, MARGIN), geometry()):
+                obstacles.append(obj)
+                break
+
+    # Start in the lane, clear of obstacles and lines
+    half_w, half_h = CAR_HALF_EXTENTS
+    for _ in range(MAX_TRIES):
+        angle = rng.choice((0.0, math.pi)) + rng.uniform(-0.3, 0.3)
+        x, y = rng.uniform(x0, x1), rng.uniform(y0, y1)
+        box = car_boxes(x, y, angle, (half_w + START_CLEARANCE, half_h + START_CLEARANCE))[0]
+        if _fits(tuple(box), geometry()):
+            break
+    else:
+        raise InvalidScenario(f"seed {seed}: no collision-free start pose")
+
+    return Scenario(seed, lines, [obstacle_to_dict(o) for o in obstacles], bays, (x, y, angle))
+
+def generate_valid(seed, **kwargs):
+    # generate_scenario, moving to the next sub-seed when a layout has no valid start
+    for attempt in range(MAX_TRIES):
+        try:
+            scenario = generate_scenario(seed * 1000 + attempt if attempt else seed, **kwargs)
+        except InvalidScenario:
+            continue
+        scenario.seed = seed
+        return scenario
+    raise InvalidScenario(f"seed {seed}: no valid layout")
+
+def random_layout(rng, n_obstacles=5, area=LOT):
+    # Unstructured scene: n cars, carts and bollards anywhere in area (x0, y0, x1, y1),
+    # possibly overlapping, with no parking lines. rng: a random.Random.
+    x0, y0, x1, y1 = area
+    obstacles = []
+    for _ in range(n_obstacles):
+        kind = rng.choice((CarObstacle, CartObstacle, CircleObstacle))
+        obj = kind(rng.uniform(x0, x1), rng.uniform(y0, y1))
+        if kind is not CircleObstacle:
+            obj.rotate(rng.choice(range(0, 360, 10)))
+        obstacles.append(obj)
+    return obstacles
+
+
+# ================================
+# Scenario library
+# ================================
+# Generated scenarios on disk: <key>.json for the layout, <key>_geometry.npz with the
+# obstacles packed as SceneGeometry arrays, plus the yellow map arrays (masks, distance
+# field, summed-area table, merged line segments) as YellowCache .npy files, loaded
+# memory-mapped. index.json lists the seeds with a short summary. Recently used
+# scenarios stay in memory with their grid cells, so a reset that reuses one is a dict
+# lookup and a bulk load.
+
+class ScenarioLibrary:
+    def __init__(self, directory, cache_size=64):
+        self.directory = directory
+        self.cache_size = cache_size
+        self._cache = collections.OrderedDict()
+        self._yellow = YellowCache(directory)
+        path = os.path.join(directory, "index.json")
+        self.index = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.index = {int(seed): info for seed, info in json.load(f).items()}
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def seeds(self):
+        return sorted(self.index)
+
+    @staticmethod
+    def key(seed):
+        return f"scenario_{seed:06d}"
+
+    def build(self, seeds, generator=generate_valid, overwrite=False):
+        # Generate and precompute scenarios; the distance field dominates the cost
+        os.makedirs(self.directory, exist_ok=True)
+        for seed in seeds:
+            if seed in self.index and not overwrite:
+                continue
+            scenario = generator(seed)
+            key = self.key(seed)
+            self._yellow.save(key, scenario.yellow_map)
+            with open(os.path.join(self.directory, key + ".json"), "w") as f:
+                json.dump(scenario.to_dict(), f)
+            g = scenario.geometry
+            np.savez(os.path.join(self.directory, key + "_geometry.npz"),
+                     circles=g.circles, boxes=g.boxes, segments=g.segments)
+            self.index[seed] = {"bays": len(scenario.bays), "free_bays": len(scenario.free_bays),
+                                "obstacles": len(scenario.obstacles)}
+        with open(os.path.join(self.directory, "index.json"), "w") as f:
+            json.dump({str(seed): info for seed, info in sorted(self.index.items())}, f, indent=1)
+        return self
+
+    def load(self, seed):
+        scenario = self._cache.get(seed)
+        if scenario is not None:
+            self._cache.move_to_end(seed)
+            return scenario
+        key = self.key(seed)
+        with open(os.path.join(self.directory, key + ".json")) as f:
+            data = json.load(f)
+        with np.load(os.path.join(self.directory, key + "_geometry.npz")) as arrays:
+            geometry = SceneGeometry(arrays["circles"], arrays["boxes"], arrays["segments"])
+        scenario = Scenario.from_dict(data, self._yellow.load(key), geometry)
+        self._cache[seed] = scenario
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return scenario
+
+    def sample(self, rng):
+        return self.load(rng.choice(self.seeds))
+
+
+if __name__ == "__main__":
+    # Build a library: python scenarios.py [DIRECTORY] [COUNT] [FIRST_SEED]
+    directory = sys.argv[1] if len(sys.argv) > 1 else "scenario_library"
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    first = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+    library = ScenarioLibrary(directory).build(range(first, first + count))
+    print(f"{directory}: {len(library)} scenarios")
@@ -0,0 +1,230 @@
+import json
+import math
+import os
+import struct
+
+import numpy as np
+
+from obstacle import CarObstacle, CartObstacle, CircleObstacle, LineSegment, obstacle_from_dict, obstacle_to_dict
+from raycast import SceneGeometry
+
+# ================================
+# Scene files
+# ================================
+# A scene is an obstacle layout, optional yellow parking lines and an optional start
+# pose. Obstacles are kept as SceneGeometry arrays so a loaded scene can go straight
+# into ObstacleStore / the ray caster without building Obstacle objects.
+#
+# .json: versioned, one scene, obstacles as obstacle_to_dict() records (for people).
+# .scenes: binary pack of many scenes, appended one record at a time and read through
+# a memory map, so large sets stream lazily and arrays are views into the file.
+
+FORMAT = "parking-scene"
+VERSION = 1
+BOX_TYPES = (CarObstacle, CartObstacle)    # box_types codes
+PACK_MAGIC = b"PKSCENE1"
+
+
+def _rows(values, columns):
+    return np.zeros((0, columns)) if values is None else np.asarray(values, dtype=float).reshape(-1, columns)
+
+
+class Scene:
+    def __init__(self, boxes=None, box_types=None, circles=None, segments=None, lines=None,
+                 start=None, meta=None):
+        self.boxes = _rows(boxes, 5)          # (cx, cy, half_w, half_h, angle radians)
+        self.box_types = (np.zeros(len(self.boxes), dtype=np.uint8) if box_types is None
+                          else np.asarray(box_types, dtype=np.uint8))
+        self.circles = _rows(circles, 3)      # (cx, cy, r)
+        self.segments = _rows(segments, 4)    # LineSegment obstacles (x1, y1, x2, y2)
+        self.lines = _rows(lines, 4)          # yellow parking lines, sensed but not collided with
+        self.start = None if start is None else tuple(float(v) for v in start)   # (x, y, angle radians)
+        self.meta = meta or {}
+
+    def __len__(self):
+        return len(self.boxes) + len(self.circles) + len(self.segments)
+
+    def geometry(self):
+        # Views, no copy
+        return SceneGeometry(circles=self.circles, boxes=self.boxes, segments=self.segments)
+
+    # ---- objects ----
+
+    @classmethod
+    def from_obstacles(cls, obstacles, lines=None, start=None, **meta):
+        boxes, box_types, circles, segments = [], [], [], []
+        for obj in obstacles:
+            if isinstance(obj, BOX_TYPES):
+                boxes.append((obj.x, obj.y, obj.width / 2, obj.height / 2, math.radians(obj.angle)))
+                box_types.append(BOX_TYPES.index(type(obj)))
+            elif isinstance(obj, CircleObstacle):
+                circles.append((obj.x, obj.y, obj.radius))
+            elif isinstance(obj, LineSegment):
+                segments.append((*obj.start, *obj.end))
+        return cls(boxes, box_types, circles, segments, lines, start, meta)
+
+    @classmethod
+    def from_scenario(cls, scenario):
+        return cls.from_obstacles(scenario.obstacle_objects(), scenario.lines, scenario.start, seed=scenario.seed)
+
+    def obstacle_objects(self):
+        objects = []
+        for (x, y, _, _, angle), code in zip(self.boxes.tolist(), self.box_types.tolist()):
+            obj = BOX_TYPES[code](x, y)
+            obj.angle = round(math.degrees(angle), 9) % 360
+            objects.append(obj)
+        for x, y, radius in self.circles.tolist():
+            obj = CircleObstacle(x, y)
+            obj.radius = radius
+            objects.append(obj)
+        for x1, y1, x2, y2 in self.segments.tolist():
+            objects.append(LineSegment((x1, y1), (x2, y2)))
+        return objects
+
+    def yellow_map(self):
+        if not len(self.lines):
+            return None
+        from yellow import YellowMap
+        return YellowMap.from_segments([LineSegment((x1, y1), (x2, y2)) for x1, y1, x2, y2 in self.lines.tolist()])
+
+    def apply(self, sim, objects=True):
+        # Load into a Simulation. objects=False skips Obstacle objects and bulk-loads the
+        # arrays (nothing to draw, but sensing and collisions are the same).
+        if objects:
+            sim.clear_obstacles()
+            for obj in self.obstacle_objects():
+                sim.add_obstacle(obj)
+        else:
+            sim.load_geometry(self.geometry())
+        if len(self.lines):
+            sim.set_yellow_map(self.yellow_map())
+        if self.start is not None:
+            sim.start = self.start[:2]
+            sim.reset(*self.start)
+        return sim
+
+    # ---- JSON ----
+
+    def to_dict(self):
+        return {
+            "format": FORMAT,
+            "version": VERSION,
+            "obstacles": [obstacle_to_dict(obj) for obj in self.obstacle_objects()],
+            "lines": self.lines.tolist(),
+            "start": None if self.start is None else list(self.start),
+            "meta": self.meta,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get("format") != FORMAT:
+            raise ValueError("Not a parking scene")
+        if data.get("version", 0) > VERSION:
+            raise ValueError(f"Scene version {data['version']} is newer than supported ({VERSION})")
+        obstacles = [obstacle_from_dict(d) for d in data.get("obstacles", [])]
+        return cls.from_obstacles(obstacles, data.get("lines") or None, data.get("start"), **data.get("meta", {}))
+
+    def save(self, path):
+        if path.endswith(".scenes"):
+            write_pack(path, [self])
+            return
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=1)
+
+    @classmethod
+    def load(cls, path):
+        if path.endswith(".scenes"):
+            return ScenePack(path)[0]
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+# ================================
+# Binary scene packs
+# ================================
+# PACK_MAGIC, then one record per scene: uint32 header length, a JSON header
+# (version, row counts, start, meta) padded to 8 bytes, then the arrays boxes (f8),
+# box_types (u1, padded to 8), circles, segments and lines (f8), little-endian.
+
+_PACK_ARRAYS = (("boxes", "<f8", 5), ("box_types", "u1", 0), ("circles", "<f8", 3),
+                ("segments", "<f8", 4), ("lines", "<f8", 4))
+
+def _pad(n):
+    return -n % 8
+
+def _record(scene):
+    counts = [len(getattr(scene, name)) for name, _, _ in _PACK_ARRAYS]
+    header = json.dumps({"version": VERSION, "counts": counts, "start": scene.start and list(scene.start),
+                         "meta": scene.meta}, separators=(",", ":")).encode()
+    header += b" " * _pad(4 + len(header))
+    parts = [struct.pack("<I", len(header)), header]
+    for name, dtype, _ in _PACK_ARRAYS:
+        data = np.ascontiguousarray(getattr(scene, name), dtype=dtype).tobytes()
+        parts += [data, b"\0" * _pad(len(data))]
+    return b"".join(parts)
+
+def write_pack(path, scenes, append=False):
+    # Streams scenes (any iterable) to a .scenes pack; returns how many were written
+    count = 0
+    exists = append and os.path.exists(path) and os.path.getsize(path) > 0
+    with open(path, "ab" if exists else "wb") as f:
+        if not exists:
+            f.write(PACK_MAGIC)
+        for scene in scenes:
+            f.write(_record(scene))
+            count += 1
+    return count
+
+
+class ScenePack:
+    # Lazy reader: iterating parses one record at a time from a memory map, and the
+    # returned scenes' arrays are read-only views into the file
+    def __init__(self, path):
+        self.path = path
+        self.data = np.memmap(path, dtype=np.uint8, mode="r")
+        if bytes(self.data[:len(PACK_MAGIC)]) != PACK_MAGIC:
+            raise ValueError(f"{path} is not a scene pack")
+        self._offsets = None
+
+    def _read(self, offset):
+        # Scene at offset -> (scene, offset of the next record)
+        data = self.data
+        (length,) = struct.unpack_from("<I", data, offset)
+        offset += 4
+        header = json.loads(bytes(data[offset:offset + length]))
+        if header["version"] > VERSION:
+            raise ValueError(f"Scene version {header['version']} is newer than supported ({VERSION})")
+        offset += length
+        arrays = {}
+        for (name, dtype, columns), count in zip(_PACK_ARRAYS, header["counts"]):
+            dtype = np.dtype(dtype)
+            size = count * max(columns, 1)
+            array = np.frombuffer(data, dtype=dtype, count=size, offset=offset)
+            arrays[name] = array.reshape(count, columns) if columns else array
+            offset += size * dtype.itemsize + _pad(size * dtype.itemsize)
+        scene = Scene(start=header["start"], meta=header["meta"])
+        for name, array in arrays.items():
+            setattr(scene, name, array)
+        return scene, offset
+
+    def __iter__(self):
+        offset, end = len(PACK_MAGIC), len(self.data)
+        while offset < end:
+            scene, offset = self._read(offset)
+            yield scene
+
+    def offsets(self):
+        # Record offsets, found by hopping over headers once
+        if self._offsets is None:
+            offsets, offset, end = [], len(PACK_MAGIC), len(self.data)
+            while offset < end:
+                offsets.append(offset)
+                offset = self._read(offset)[1]
+            self._offsets = offsets
+        return self._offsets
+
+    def __len__(self):
+        return len(self.offsets())
+
+    def __getitem__(self, index):
+        return self._read(self.offsets()[index])[0]
@@ -0,0 +1,293 @@
+import numpy as np
+
+from car import Car
+from collision import CAR_HALF_EXTENTS, car_contacts
+from physics import lerp_pose
+from obstacle import LineSegment
+from occupancy import CELL, OccupancyGrid
+from planner import ObstacleField, PrimitiveSet, plan
+from profiler import NULL_PROFILER
+from recording import NULL_RECORDER
+from telemetry import NULL_TELEMETRY, EVENT
+from raycast import SENSOR_OFFSETS, MAX_SENSOR_DISTANCE
+from spatial import SpatialGrid
+from store import ObstacleStore
+from yellow import LineTracker
+
+# ================================
+# Headless Simulation
+# ================================
+# Runs the same per-frame sequence as random_car.main() without a window, image
+# loading or frame cap. The pygame UI is just a viewer drawing sim.car and sim.obstacles.
+
+# Up to this many stored rows the sensors cast against all of them: the closed-form
+# ray tests over a few dozen rows cost less than walking 8 rays through the grid cells
+DIRECT_CAST_ROWS = 64
+
+class Simulation:
+    def __init__(self, obstacles=None, yellow_map=None, start=(400, 300), sensor_range=150,
+                 dt=1.0, substeps=1, integrator="euler"):
+        # The list is shared, not copied; edit it through add/move/rotate/remove_obstacle
+        # so the obstacle store and spatial index stay in sync
+        self.obstacles = obstacles if obstacles is not None else []
+        self.yellow_map = yellow_map
+        self.start = start
+        self.sensor_range = sensor_range
+        # Fixed physics step (in 60 FPS frames): large dt for throughput, substeps for precision
+        self.dt = dt
+        self.substeps = substeps
+        self.integrator = integrator
+        self.profiler = NULL_PROFILER     # set a FrameProfiler to time sensing / yellow stages
+        self.telemetry = NULL_TELEMETRY   # handed to every Car this sim creates
+        self.recorder = NULL_RECORDER     # set an EpisodeRecorder to log every step
+        self.occupancy = None             # OccupancyGrid built as the car senses; see enable_mapping()
+        self.map_spot_test = False        # the car's spot test reads self.occupancy
+        self.sensed_pose = None           # pose of the car's latest cast while the layout is unchanged
+        self.layout_version = 0           # bumped by every obstacle or yellow map change
+        # Sensors and collision run on the store's arrays; both grids index store handles
+        self.store = ObstacleStore()
+        self.handles = {}                   # Obstacle object -> store handle
+        self.bulk_handles = []              # rows added by load_geometry(), without objects
+        self.grid = SpatialGrid()           # placed obstacles
+        self.yellow_grid = SpatialGrid()    # dynamic yellow segments around the car
+        self._yellow = {}                   # LineTracker segment index -> store handle
+        self.line_tracker = LineTracker(yellow_map, sensor_range) if yellow_map is not None else None
+        for obs in self.obstacles:
+            self._register(obs)
+        self.reset()
+
+    def reset(self, x=None, y=None, angle=0):
+        x = self.start[0] if x is None else x
+        y = self.start[1] if y is None else y
+        self.car = Car(x, y)
+        self.car.angle = angle
+        self.car.yellow_map = self.yellow_map
+        self.car.telemetry = self.telemetry
+        self.car.dt, self.car.substeps, self.car.integrator = self.dt, self.substeps, self.integrator
+        if self.occupancy is not None:
+            self.occupancy.reset()
+            if self.map_spot_test:
+                self.car.spot_map = self.occupancy
+        self.prev_pose = (x, y, angle)
+        self.sensed_pose = None
+        self._clear_yellow()
+        self.contacts = []    # collision.Contact list from the last step
+        self.steps = 0
+        return self.car.sensor_data
+
+    # ---- obstacle editing ----
+
+    def _layout_changed(self):
+        self.layout_version += 1
+        self.sensed_pose = None
+
+    def _register(self, obj):
+        handle = self.store.add(obj)
+        self.handles[obj] = handle
+        self.grid.insert(handle, self.store.bounds(handle))
+        self._layout_changed()
+
+    def _sync(self, obj):
+        handle = self.handles[obj]
+        self.store.sync(handle, obj)
+        self.grid.update(handle, self.store.bounds(handle))
+        self._layout_changed()
+
+    def add_obstacle(self, obj):
+        self.obstacles.append(obj)
+        self._register(obj)
+
+    def remove_obstacle(self, obj):
+        if obj in self.obstacles:
+            self.obstacles.remove(obj)
+        handle = self.handles.pop(obj, None)
+        if handle is not None:
+            self.grid.remove(handle)
+            self.store.remove(handle)
+            self._layout_changed()
+
+    def move_obstacle(self, obj, x, y):
+        obj.move_to(x, y)
+        self._sync(obj)
+
+    def rotate_obstacle(self, obj, amount):
+        obj.rotate(amount)
+        self._sync(obj)
+
+    def clear_obstacles(self):
+        for obj in list(self.obstacles):
+            self.remove_obstacle(obj)
+        for handle in self.bulk_handles:
+            self.grid.remove(handle)
+            self.store.remove(handle)
+        self.bulk_handles = []
+        self._layout_changed()
+
+    def load_geometry(self, geometry, cells=None):
+        # Replace the placed obstacles with SceneGeometry rows (e.g. a loaded scene) in bulk,
+        # without building Obstacle objects: they block sensors and collide but are not drawn.
+        # cells: the rows' grid cells from grid.cells_for_many() (boxes, circles, then
+        # segments), when the caller keeps them from an earlier load.
+        self.clear_obstacles()
+        store = self.store
+        handles = [store.add_many(kind, rows) for kind, rows in
+                   (("box", geometry.boxes), ("circle", geometry.circles), ("segment", geometry.segments))
+                   if len(rows)]
+        handles = np.concatenate(handles).tolist() if handles else []
+        if cells is None:
+            cells = self.grid.cells_for_many(store.bounds_many(handles))
+        self.grid.insert_many(handles, cells)
+        self.bulk_handles = handles
+        self._layout_changed()
+
+    def obstacle_at(self, pos):
+        # Topmost placed obstacle under pos, or None
+        handle = self.store.hit_test(*pos)
+        return None if handle is None else self.store.source(handle)
+
+    def set_yellow_map(self, yellow_map):
+        # Swap the parking-line map, e.g. when loading another scenario
+        if yellow_map is self.yellow_map:
+            return
+        self._clear_yellow()
+        self._layout_changed()
+        self.yellow_map = self.car.yellow_map = yellow_map
+        self.line_tracker = LineTracker(yellow_map, self.sensor_range) if yellow_map is not None else None
+
+    # ---- perception ----
+
+    def enable_mapping(self, cell=CELL, spot_test=False):
+        # Accumulate an occupancy grid from every step's sensing from now on, cleared on
+        # reset(). With spot_test the car's parking-spot test counts the yellow pixels in
+        # the map instead of the current frame; otherwise the map is only recorded.
+        self.occupancy = OccupancyGrid(cell)
+        self.map_spot_test = spot_test
+        self.car.spot_map = self.occupancy if spot_test else None
+        return self.occupancy
+
+    def _clear_yellow(self):
+        for handle in self._yellow.values():
+            self.store.remove(handle)
+        self.yellow_grid.clear()
+        self._yellow = {}
+        if self.line_tracker is not None:
+            self.line_tracker.reset()
+
+    @property
+    def yellow_segments(self):
+        store = self.store
+        return [store.source(handle) for handle in self._yellow.values()]
+
+    def update_yellow_segments(self):
+        # Merged line segments near the car as obstacles; only segments entering or
+        # leaving the sensor disk (see LineTracker) touch the store and index
+        tracker = self.line_tracker
+        if tracker is None:
+            return
+        added, removed = tracker.update(self.car.x, self.car.y)
+        yellow, store, grid = self._yellow, self.store, self.yellow_grid
+        for index in removed.tolist():
+            handle = yellow.pop(index)
+            grid.remove(handle)
+            store.remove(handle)
+        for index, (x1, y1, x2, y2) in zip(added.tolist(), tracker.segments[added].tolist()):
+            handle = store.add_segment(x1, y1, x2, y2, LineSegment((x1, y1), (x2, y2)))
+            yellow[index] = handle
+            grid.insert(handle, (min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2)))
+
+    def sensor_candidates(self, include_yellow=True):
+        # Store handles in the grid cells crossed by the 8 sensor rays
+        car = self.car
+        angles = (car.angle + SENSOR_OFFSETS).tolist()
+        found = self.grid.query_rays(car.x, car.y, angles, MAX_SENSOR_DISTANCE)
+        if include_yellow:
+            found |= self.yellow_grid.query_rays(car.x, car.y, angles, MAX_SENSOR_DISTANCE)
+        return list(found)
+
+    def sense(self):
+        # Track the parking lines near the car, then cast all 8 sensors against obstacles
+        # and lines (and add the readings to the map); step() reuses this cast for the
+        # next auto decision
+        with self.profiler.stage("yellow"):
+            self.update_yellow_segments()
+        with self.profiler.stage("sensing"):
+            self.car.cast_sensor(self.sensor_geometry())
+        if self.occupancy is not None:
+            with self.profiler.stage("mapping"):
+                self.occupancy.update(self.car, self.yellow_map)
+        self.sensed_pose = self.pose()
+
+    def sensor_geometry(self, include_yellow=True):
+        store = self.store
+        if len(store) <= DIRECT_CAST_ROWS and (include_yellow or not self._yellow):
+            return store.geometry()
+        return store.geometry(self.sensor_candidates(include_yellow))
+
+    def update_contacts(self):
+        # Broad phase through the grid, then exact SAT tests on what is left
+        car = self.car
+        reach = CAR_HALF_EXTENTS[0] + CAR_HALF_EXTENTS[1]
+        nearby = self.grid.query_rect(car.x - reach, car.y - reach, car.x + reach, car.y + reach)
+        was_colliding = bool(self.contacts)
+        self.contacts = car_contacts(car, self.store.geometry(nearby)) if nearby else []
+        if self.contacts and not was_colliding and self.telemetry.level >= EVENT:
+            self.telemetry.emit("collision", x=round(car.x, 1), y=round(car.y, 1),
+                                kinds=sorted({c.kind for c in self.contacts}),
+                                depth=round(max(c.depth for c in self.contacts), 2))
+        return self.contacts
+
+    @property
+    def collided(self):
+        return bool(self.contacts)
+
+    # ---- planning ----
+
+    def plan_parking(self, goal, include_lines=True, max_expansions=20000, time_budget=0.5, use_map=False):
+        # Search a lattice path from the car's pose to goal (x, y, angle) around the placed
+        # obstacles (and the parking lines, which the rule-based controller also keeps off).
+        # use_map plans around what the occupancy grid has seen instead of the true layout.
+        # On success the car switches to the "following" auto state and tracks the path
+        # from the next step; returns the Plan, or None.
+        car = self.car
+        if use_map and self.occupancy is not None:
+            field = ObstacleField.from_occupancy(self.occupancy, include_lines)
+        else:
+            field = ObstacleField(self.store.geometry(list(self.grid.entries)),
+                                  self.yellow_map if include_lines else None)
+        result = plan(self.pose(), goal, field, PrimitiveSet.for_car(car), max_expansions, time_budget)
+        if result is not None:
+            car.plan = result
+            car.set_auto_state("following")
+        if self.telemetry.level >= EVENT:
+            self.telemetry.emit("plan", found=result is not None, goal=[round(v, 2) for v in goal],
+                                frames=len(result) if result else 0,
+                                expansions=result.expansions if result else None)
+        return result
+
+    def pose(self):
+        return self.car.x, self.car.y, self.car.angle
+
+    def interpolated_pose(self, alpha):
+        # Pose between the last two steps, for rendering at display rate
+        return lerp_pose(self.prev_pose, self.pose(), alpha)
+
+    def step(self, action=None):
+        # action: (throttle, steer) in [-1, 1], or None to let the rule-based auto mode drive
+        car = self.car
+        self.prev_pose = self.pose()
+        profiler = self.profiler
+        if action is None:
+            # One cast per step: the auto controller reads the one made at the end of the
+            # last step, unless the car or the layout changed since
+            if self.sensed_pose != self.prev_pose:
+                self.sense()
+            car.move_auto()
+        else:
+            car.apply_action(*action)
+
+        self.sense()
+        with profiler.stage("collision"):
+            self.update_contacts()
+        self.steps += 1
+        self.recorder.record(self, action)
+        return car.sensor_data
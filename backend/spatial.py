@@ -0,0 +1,155 @@
+import math
+
+import numpy as np
+
+from obstacle import CarObstacle, CartObstacle, CircleObstacle, LineSegment
+
+WIDTH, HEIGHT = 800, 600
+
+# ================================
+# Uniform grid over obstacles
+# ================================
+# Every obstacle is registered in the cells its bounding box overlaps. Editor actions
+# (add, move_to, rotate, delete) update only that obstacle's cells, and sensor queries
+# walk just the cells each ray passes through.
+
+def obstacle_bounds(obj):
+    if isinstance(obj, CircleObstacle):
+        return obj.x - obj.radius, obj.y - obj.radius, obj.x + obj.radius, obj.y + obj.radius
+    if isinstance(obj, (CarObstacle, CartObstacle)):
+        a = math.radians(obj.angle)
+        ex = abs(math.cos(a)) * obj.width / 2 + abs(math.sin(a)) * obj.height / 2
+        ey = abs(math.sin(a)) * obj.width / 2 + abs(math.cos(a)) * obj.height / 2
+        return obj.x - ex, obj.y - ey, obj.x + ex, obj.y + ey
+    if isinstance(obj, LineSegment):
+        (x1, y1), (x2, y2) = obj.start, obj.end
+        return min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2)
+    return None
+
+
+class SpatialGrid:
+    def __init__(self, cell_size=50, width=WIDTH, height=HEIGHT):
+        self.cell_size = cell_size
+        self.cols = int(math.ceil(width / cell_size))
+        self.rows = int(math.ceil(height / cell_size))
+        self.cells = {}       # (col, row) -> set of obstacles
+        self.entries = {}     # obstacle -> tuple of cells it occupies
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, obj):
+        return obj in self.entries
+
+    def _cells_for(self, obj, bounds=None):
+        if bounds is None:
+            bounds = obstacle_bounds(obj)
+        if bounds is None:
+            return ()
+        x0, y0, x1, y1 = bounds
+        c0 = max(0, int(x0 // self.cell_size))
+        r0 = max(0, int(y0 // self.cell_size))
+        c1 = min(self.cols - 1, int(x1 // self.cell_size))
+        r1 = min(self.rows - 1, int(y1 // self.cell_size))
+        return tuple((c, r) for c in range(c0, c1 + 1) for r in range(r0, r1 + 1))
+
+    def insert(self, obj, bounds=None):
+        # obj is an Obstacle, or any hashable key (e.g. an ObstacleStore handle) given its bounds
+        if obj in self.entries:
+            self.remove(obj)
+        cells = self._cells_for(obj, bounds)
+        for cell in cells:
+            self.cells.setdefault(cell, set()).add(obj)
+        self.entries[obj] = cells
+
+    def cells_for_many(self, bounds):
+        # Cells of many (x0, y0, x1, y1) bounds at once, each a tuple as insert() stores it
+        bounds = np.asarray(bounds, dtype=float).reshape(-1, 4)
+        size = self.cell_size
+        c0 = np.maximum(0, bounds[:, 0] // size).astype(np.int64).tolist()
+        r0 = np.maximum(0, bounds[:, 1] // size).astype(np.int64).tolist()
+        c1 = np.minimum(self.cols - 1, bounds[:, 2] // size).astype(np.int64).tolist()
+        r1 = np.minimum(self.rows - 1, bounds[:, 3] // size).astype(np.int64).tolist()
+        return [tuple((c, r) for c in range(a, b + 1) for r in range(d, e + 1))
+                for a, d, b, e in zip(c0, r0, c1, r1)]
+
+    def insert_many(self, keys, cells):
+        # Register keys with their cells from cells_for_many(), e.g. cached with a scenario
+        entries, grid = self.entries, self.cells
+        for key, key_cells in zip(keys, cells):
+            if key in entries:
+                self.remove(key)
+            for cell in key_cells:
+                grid.setdefault(cell, set()).add(key)
+            entries[key] = key_cells
+
+    def remove(self, obj):
+        for cell in self.entries.pop(obj, ()):
+            bucket = self.cells[cell]
+            bucket.discard(obj)
+            if not bucket:
+                del self.cells[cell]
+
+    def update(self, obj, bounds=None):
+        # Call after move_to / rotate; a no-op when the obstacle stays in the same cells
+        cells = self._cells_for(obj, bounds)
+        if self.entries.get(obj) != cells:
+            self.insert(obj, bounds)
+
+    def clear(self):
+        self.cells.clear()
+        self.entries.clear()
+
+    def query_rect(self, x0, y0, x1, y1):
+        # Obstacles registered in any cell overlapping the rectangle
+        size = self.cell_size
+        c0, r0 = max(0, int(x0 // size)), max(0, int(y0 // size))
+        c1, r1 = min(self.cols - 1, int(x1 // size)), min(self.rows - 1, int(y1 // size))
+        found = set()
+        cells = self.cells
+        for c in range(c0, c1 + 1):
+            for r in range(r0, r1 + 1):
+                bucket = cells.get((c, r))
+                if bucket:
+                    found |= bucket
+        return found
+
+    def ray_cells(self, x, y, angle, max_distance):
+        # Amanatides & Woo grid traversal from (x, y) along angle for max_distance
+        size = self.cell_size
+        dx, dy = math.cos(angle), math.sin(angle)
+        col, row = int(x // size), int(y // size)
+        step_c = 1 if dx > 0 else -1
+        step_r = 1 if dy > 0 else -1
+        t_max_c = ((col + (dx > 0)) * size - x) / dx if dx else math.inf
+        t_max_r = ((row + (dy > 0)) * size - y) / dy if dy else math.inf
+        t_delta_c = size / abs(dx) if dx else math.inf
+        t_delta_r = size / abs(dy) if dy else math.inf
+
+        t = 0.0
+        while t <= max_distance:
+            if 0 <= col < self.cols and 0 <= row < self.rows:
+                yield col, row
+            if t_max_c < t_max_r:
+                t = t_max_c
+                t_max_c += t_delta_c
+                col += step_c
+            else:
+                t = t_max_r
+                t_max_r += t_delta_r
+                row += step_r
+
+    def query_ray(self, x, y, angle, max_distance, out=None):
+        found = set() if out is None else out
+        cells = self.cells
+        for cell in self.ray_cells(x, y, angle, max_distance):
+            bucket = cells.get(cell)
+            if bucket:
+                found |= bucket
+        return found
+
+    def query_rays(self, x, y, angles, max_distance):
+        found = set()
+        for angle in angles:
+            self.query_ray(x, y, angle, max_distance, found)
+        return found
@@ -0,0 +1,277 @@
+import math
+
+import numpy as np
+
+from collision import BOX, CIRCLE, SEGMENT, KIND_NAMES, box_aabbs, circle_aabbs, segment_aabbs
+from obstacle import CarObstacle, CartObstacle, CircleObstacle, LineSegment
+from raycast import SceneGeometry
+
+# ================================
+# Array-backed obstacle storage
+# ================================
+# Obstacles live as rows of typed arrays laid out like SceneGeometry: boxes
+# (cx, cy, half_w, half_h, angle), circles (cx, cy, r) and segments (x1, y1, x2, y2).
+# Each obstacle gets an integer handle that stays valid until it is removed, so the
+# editor can drag / rotate / delete while rows are compacted underneath (a removed
+# row is filled with the last one). Removed handles go on a free list and are handed
+# out again by later adds, so the handle table stays as large as the most obstacles
+# stored at once however many come and go. The type dispatch happens once, in add().
+
+_COLUMNS = (5, 3, 4)
+
+
+class ObstacleStore:
+    def __init__(self, capacity=64):
+        self.arrays = [np.zeros((capacity, cols)) for cols in _COLUMNS]
+        self.counts = [0, 0, 0]
+        self.row_handles = [np.full(capacity, -1, dtype=np.int64) for _ in _COLUMNS]
+        self.row_sources = [np.empty(capacity, dtype=object) for _ in _COLUMNS]
+        # handle -> (kind, row); row is -1 once the handle is removed
+        self.handle_kind = np.full(capacity, -1, dtype=np.int8)
+        self.handle_row = np.full(capacity, -1, dtype=np.int64)
+        self.handle_order = np.full(capacity, -1, dtype=np.int64)   # add sequence, for hit_test
+        self.next_handle = 0     # handles below this have been handed out at some point
+        self.free = []           # removed handles, reused before next_handle grows
+        self.added = 0
+
+    def __len__(self):
+        return sum(self.counts)
+
+    def __contains__(self, handle):
+        return 0 <= handle < self.next_handle and self.handle_row[handle] >= 0
+
+    @property
+    def boxes(self):
+        return self.arrays[BOX][:self.counts[BOX]]
+
+    @property
+    def circles(self):
+        return self.arrays[CIRCLE][:self.counts[CIRCLE]]
+
+    @property
+    def segments(self):
+        return self.arrays[SEGMENT][:self.counts[SEGMENT]]
+
+    @property
+    def nbytes(self):
+        arrays = self.arrays + self.row_handles + [self.handle_kind, self.handle_row, self.handle_order]
+        return sum(a.nbytes for a in arrays) + sum(s.nbytes for s in self.row_sources)
+
+    def handles(self):
+        return np.nonzero(self.handle_row[:self.next_handle] >= 0)[0]
+
+    # ---- storage ----
+
+    @staticmethod
+    def _grow(array, size):
+        # Double the capacity so that at least size rows fit
+        if len(array) >= size:
+            return array
+        grown = np.empty((max(size, 2 * len(array)),) + array.shape[1:], dtype=array.dtype)
+        grown[:len(array)] = array
+        if array.dtype != object:
+            grown[len(array):] = -1 if array.dtype.kind == "i" else 0
+        return grown
+
+    def _new_handles(self, n):
+        # n handles, reusing freed ones first
+        reused = [self.free.pop() for _ in range(min(n, len(self.free)))]
+        fresh = np.arange(self.next_handle, self.next_handle + n - len(reused))
+        self.next_handle += len(fresh)
+        for name in ("handle_kind", "handle_row", "handle_order"):
+            setattr(self, name, self._grow(getattr(self, name), self.next_handle))
+        handles = np.concatenate([np.array(reused, dtype=np.int64), fresh])
+        self.handle_order[handles] = np.arange(self.added, self.added + n)
+        self.added += n
+        return handles
+
+    def _add(self, kind, row_values, source):
+        handle = int(self._new_handles(1)[0])
+
+        row = self.counts[kind]
+        for arrays in (self.arrays, self.row_handles, self.row_sources):
+            arrays[kind] = self._grow(arrays[kind], row + 1)
+        self.arrays[kind][row] = row_values
+        self.row_handles[kind][row] = handle
+        self.row_sources[kind][row] = source
+        self.counts[kind] = row + 1
+        self.handle_kind[handle] = kind
+        self.handle_row[handle] = row
+        return handle
+
+    def add_box(self, x, y, half_w, half_h, angle=0.0, source=None):
+        # angle in radians
+        return self._add(BOX, (x, y, half_w, half_h, angle), source)
+
+    def add_circle(self, x, y, radius, source=None):
+        return self._add(CIRCLE, (x, y, radius), source)
+
+    def add_segment(self, x1, y1, x2, y2, source=None):
+        return self._add(SEGMENT, (x1, y1, x2, y2), source)
+
+    def add_many(self, kind, rows, sources=None):
+        # Bulk add rows of one kind ("box", "circle" or "segment") -> array of new handles
+        kind = KIND_NAMES.index(kind)
+        rows = np.asarray(rows, dtype=float).reshape(-1, _COLUMNS[kind])
+        n = len(rows)
+        handles = self._new_handles(n)
+
+        first = self.counts[kind]
+        for arrays in (self.arrays, self.row_handles, self.row_sources):
+            arrays[kind] = self._grow(arrays[kind], first + n)
+        self.arrays[kind][first:first + n] = rows
+        self.row_handles[kind][first:first + n] = handles
+        self.row_sources[kind][first:first + n] = None if sources is None else sources
+        self.counts[kind] = first + n
+        self.handle_kind[handles] = kind
+        self.handle_row[handles] = np.arange(first, first + n)
+        return handles
+
+    def add(self, obj):
+        # Store an Obstacle object; it is kept as the row's source for contacts and drawing
+        if isinstance(obj, CircleObstacle):
+            return self.add_circle(obj.x, obj.y, obj.radius, obj)
+        if isinstance(obj, (CarObstacle, CartObstacle)):
+            return self.add_box(obj.x, obj.y, obj.width / 2, obj.height / 2, math.radians(obj.angle), obj)
+        if isinstance(obj, LineSegment):
+            return self.add_segment(*obj.start, *obj.end, obj)
+        raise TypeError(f"Cannot store obstacle of type {type(obj).__name__}")
+
+    def remove(self, handle):
+        kind, row = self._locate(handle)
+        last = self.counts[kind] - 1
+        if row != last:
+            # Move the last row into the hole so the live rows stay contiguous
+            moved = self.row_handles[kind][last]
+            self.arrays[kind][row] = self.arrays[kind][last]
+            self.row_handles[kind][row] = moved
+            self.row_sources[kind][row] = self.row_sources[kind][last]
+            self.handle_row[moved] = row
+        self.row_handles[kind][last] = -1
+        self.row_sources[kind][last] = None
+        self.counts[kind] = last
+        self.handle_row[handle] = -1
+        self.free.append(handle)
+
+    def clear(self):
+        for kind in range(len(_COLUMNS)):
+            self.row_handles[kind][:self.counts[kind]] = -1
+            self.row_sources[kind][:self.counts[kind]] = None
+        self.counts = [0, 0, 0]
+        self.handle_row[:self.next_handle] = -1
+        self.next_handle = 0
+        self.free = []
+        self.added = 0
+
+    def _locate(self, handle):
+        if handle not in self:
+            raise KeyError(f"Unknown obstacle handle {handle}")
+        return int(self.handle_kind[handle]), int(self.handle_row[handle])
+
+    # ---- editing ----
+
+    def kind(self, handle):
+        return KIND_NAMES[self._locate(handle)[0]]
+
+    def row(self, handle):
+        kind, row = self._locate(handle)
+        return self.arrays[kind][row]
+
+    def source(self, handle):
+        kind, row = self._locate(handle)
+        return self.row_sources[kind][row]
+
+    def position(self, handle):
+        kind, row = self._locate(handle)
+        values = self.arrays[kind][row]
+        if kind == SEGMENT:
+            return (values[0] + values[2]) / 2, (values[1] + values[3]) / 2
+        return values[0], values[1]
+
+    def move_to(self, handle, x, y):
+        # Segments move by their midpoint
+        kind, row = self._locate(handle)
+        values = self.arrays[kind][row]
+        if kind == SEGMENT:
+            cx, cy = self.position(handle)
+            values[[0, 2]] += x - cx
+            values[[1, 3]] += y - cy
+        else:
+            values[0], values[1] = x, y
+
+    def rotate(self, handle, amount):
+        # amount in degrees, like Obstacle.rotate(); only boxes have an orientation
+        kind, row = self._locate(handle)
+        if kind == BOX:
+            values = self.arrays[kind][row]
+            values[4] = math.radians((math.degrees(values[4]) + amount) % 360)
+
+    def sync(self, handle, obj):
+        # Copy an edited Obstacle object's pose back into its row
+        kind, row = self._locate(handle)
+        values = self.arrays[kind][row]
+        if kind == SEGMENT:
+            values[:] = (*obj.start, *obj.end)
+        else:
+            values[0], values[1] = obj.x, obj.y
+            if kind == BOX:
+                values[4] = math.radians(obj.angle)
+
+    # ---- queries ----
+
+    def bounds_many(self, handles):
+        # (len(handles), 4) AABBs, for bulk grid insertion
+        handles = np.asarray(handles, dtype=np.int64)
+        out = np.empty((len(handles), 4))
+        kinds = self.handle_kind[handles]
+        for kind, aabbs in enumerate((box_aabbs, circle_aabbs, segment_aabbs)):
+            pick = kinds == kind
+            if pick.any():
+                out[pick] = aabbs(self.arrays[kind][self.handle_row[handles[pick]]])
+        return out
+
+    def bounds(self, handle):
+        kind, row = self._locate(handle)
+        rows = self.arrays[kind][row:row + 1]
+        aabb = (box_aabbs, circle_aabbs, segment_aabbs)[kind](rows)[0]
+        return tuple(aabb.tolist())
+
+    def hit_test(self, x, y):
+        # Handle of the topmost (most recently added) box or circle under (x, y), or None.
+        # Boxes use their unrotated footprint, like Obstacle.is_clicked(). Only rows with
+        # a source object can be picked; bulk rows from add_many() have nothing to edit.
+        best, best_order = None, -1
+        boxes, circles = self.boxes, self.circles
+        tests = ((BOX, len(boxes), lambda: (np.abs(boxes[:, 0] - x) <= boxes[:, 2])
+                  & (np.abs(boxes[:, 1] - y) <= boxes[:, 3])),
+                 (CIRCLE, len(circles), lambda: np.hypot(circles[:, 0] - x, circles[:, 1] - y) <= circles[:, 2]))
+        for kind, count, inside in tests:
+            if not count:
+                continue
+            hit = inside() & np.not_equal(self.row_sources[kind][:count], None)
+            if hit.any():
+                handles = self.row_handles[kind][:count][hit]
+                order = self.handle_order[handles]
+                if order.max() > best_order:
+                    best, best_order = int(handles[order.argmax()]), int(order.max())
+        return best
+
+    def geometry(self, handles=None):
+        # SceneGeometry over all rows (views, no copy) or over a subset of handles.
+        # The views follow later edits; copy them if the store changes while they are in use.
+        if handles is None:
+            rows = [slice(0, count) for count in self.counts]
+        else:
+            handles = np.fromiter(handles, dtype=np.int64) if not isinstance(handles, np.ndarray) else handles
+            kinds = self.handle_kind[handles]
+            rows = [self.handle_row[handles[kinds == kind]] for kind in range(len(_COLUMNS))]
+        geometry = SceneGeometry(circles=self.arrays[CIRCLE][rows[CIRCLE]], boxes=self.arrays[BOX][rows[BOX]],
+                                 segments=self.arrays[SEGMENT][rows[SEGMENT]])
+        geometry.sources = {name: self.row_sources[kind][rows[kind]] for kind, name in enumerate(KIND_NAMES)}
+        return geometry
+
+    @classmethod
+    def from_obstacles(cls, obstacles):
+        store = cls(capacity=max(1, len(obstacles)))
+        handles = [store.add(obj) for obj in obstacles]
+        return store, handles
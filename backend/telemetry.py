@@ -0,0 +1,87 @@
+import json
+import sys
+import time
+
+# ================================
+# Telemetry
+# ================================
+# Typed events from the auto controller, buffered and written in batches.
+# Levels: OFF pays nothing, EVENT logs state transitions and recoveries,
+# DEBUG also logs controller decisions, but only when the decision changes.
+
+OFF, EVENT, DEBUG = 0, 1, 2
+LEVELS = {"off": OFF, "event": EVENT, "debug": DEBUG}
+
+
+class JsonlSink:
+    def __init__(self, path):
+        self.file = open(path, "a")
+
+    def write(self, records):
+        self.file.write("".join(json.dumps(r, separators=(",", ":")) + "\n" for r in records))
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class ConsoleSink:
+    # Human-readable lines, for the interactive viewer
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+
+    def write(self, records):
+        lines = []
+        for r in records:
+            fields = " ".join(f"{k}={v}" for k, v in r.items() if k not in ("t", "event"))
+            lines.append(f"[{r['event']}] {fields}\n")
+        self.stream.write("".join(lines))
+        self.stream.flush()
+
+    def close(self):
+        pass
+
+
+class MemorySink:
+    def __init__(self):
+        self.records = []
+
+    def write(self, records):
+        self.records.extend(records)
+
+    def close(self):
+        pass
+
+
+class Telemetry:
+    def __init__(self, sink=None, level=EVENT, batch_size=256, **context):
+        self.sink = sink
+        self.level = level if sink is not None else OFF
+        self.batch_size = batch_size
+        self.context = context        # merged into every record, e.g. env=3
+        self._buffer = []
+
+    def emit(self, event, **fields):
+        # Callers check self.level first so disabled logging costs one comparison
+        record = {"t": time.monotonic(), "event": event, **self.context, **fields}
+        self._buffer.append(record)
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self._buffer and self.sink is not None:
+            self.sink.write(self._buffer)
+        self._buffer = []
+
+    def close(self):
+        self.flush()
+        if self.sink is not None:
+            self.sink.close()
+
+
+def level_from_name(name, default=EVENT):
+    return LEVELS.get((name or "").lower(), default)
+
+
+# Shared disabled channel so code can check .level without a None test
+NULL_TELEMETRY = Telemetry(sink=None, level=OFF)
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The modules import each other flat (from car import Car), as when run from backend/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
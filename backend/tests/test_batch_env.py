@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from batch_env import BatchCarEnv
+from car import Car
+from raycast import MAX_SENSOR_DISTANCE, SceneGeometry
+
+
+def random_actions(rng, steps, n):
+    # Continuous throttle / steer with some released (0) entries, so every branch runs
+    actions = rng.uniform(-1, 1, size=(steps, n, 2))
+    actions[rng.random(size=(steps, n, 2)) < 0.2] = 0
+    return actions
+
+
+@pytest.mark.parametrize("integrator, dt, substeps", [("euler", 1.0, 1), ("rk4", 2.0, 3)])
+def test_step_matches_scalar_car(integrator, dt, substeps):
+    rng = np.random.default_rng(0)
+    env = BatchCarEnv(8, start_noise=200, max_steps=10_000, seed=0, dt=dt, substeps=substeps,
+                      integrator=integrator)
+    env.reset()
+    cars = []
+    for x, y in zip(env.x.tolist(), env.y.tolist()):
+        car = Car(x, y)
+        car.dt, car.substeps, car.integrator = dt, substeps, integrator
+        cars.append(car)
+
+    # Long enough for cars to reach max speed, reverse and hit the screen clamp
+    for actions in random_actions(rng, 400, len(cars)):
+        env.step(actions)
+        for car, (throttle, steer) in zip(cars, actions.tolist()):
+            car.apply_action(throttle, steer)
+
+    for field, attribute in (("x", "x"), ("y", "y"), ("angle", "angle"), ("speed", "speed"),
+                             ("steering_angle", "steering_angle")):
+        expected = [getattr(car, attribute) for car in cars]
+        np.testing.assert_allclose(getattr(env, field), expected, rtol=0, atol=1e-9, err_msg=field)
+
+
+def test_collision_terminates_and_resets():
+    # A circle straight ahead of the start: every car drives into it
+    geometry = SceneGeometry(circles=[(470, 300, 10)])
+    env = BatchCarEnv(4, geometry=geometry, max_steps=1000)
+    env.reset()
+    for _ in range(100):
+        obs, rewards, terminated, truncated, infos = env.step(np.tile([1.0, 0.0], (4, 1)))
+        if terminated.any():
+            break
+    assert terminated.all() and not truncated.any()
+    assert infos["collision"].all()
+    assert (infos["final_observation"][:, 0] > 400).all()
+    np.testing.assert_array_equal(obs[:, 0], 400)   # auto-reset to the start
+    assert not rewards.any()
+
+
+def test_truncation_without_collision_termination():
+    env = BatchCarEnv(3, geometry=SceneGeometry(circles=[(470, 300, 10)]), max_steps=20,
+                      terminate_on_collision=False)
+    env.reset()
+    for step in range(1, 21):
+        _, _, terminated, truncated, infos = env.step(np.tile([1.0, 0.0], (3, 1)))
+        assert not terminated.any()
+        assert truncated.all() == (step == 20)
+    np.testing.assert_array_equal(infos["final_index"], [0, 1, 2])
+
+
+def test_batched_sensors_match_car_cast():
+    geometry = SceneGeometry(circles=[(470, 300, 10), (300, 420, 25)],
+                             boxes=[(350, 200, 30, 15, 0.3)], segments=[(250, 250, 250, 380)])
+    rng = np.random.default_rng(4)
+    env = BatchCarEnv(16, geometry=geometry, start=(350, 300), start_noise=60, seed=4,
+                      terminate_on_collision=False, sensors=True)
+    env.reset()
+    for actions in random_actions(rng, 30, 16):
+        env.step(actions)
+    for i in range(16):
+        car = Car(env.x[i], env.y[i])
+        car.angle = env.angle[i]
+        car.cast_sensor(geometry)
+        expected = np.minimum(car.sensor_distances, MAX_SENSOR_DISTANCE)
+        np.testing.assert_allclose(env.sensor_distances[i], expected, rtol=0, atol=1e-9)
+    assert (env.sensor_distances < MAX_SENSOR_DISTANCE).any()
@@ -0,0 +1,161 @@
+import math
+
+import numpy as np
+import pytest
+
+from car import Car
+from collision import (BOX, CIRCLE, SEGMENT, box_clearance, box_edges, car_boxes, car_contacts, collide,
+                       obb_vs_circle, obb_vs_obb, obb_vs_segment)
+from obstacle import CarObstacle, CircleObstacle, LineSegment
+from raycast import SceneGeometry
+
+MARGIN = 0.5   # pairs closer than this to touching are left to the exact-depth tests
+
+
+def box_points(box, step=0.25):
+    # Dense samples over an oriented box (cx, cy, half_w, half_h, angle), edges included
+    cx, cy, hw, hh, angle = box
+    u, v = np.meshgrid(np.linspace(-hw, hw, int(2 * hw / step) + 1),
+                       np.linspace(-hh, hh, int(2 * hh / step) + 1), indexing="ij")
+    c, s = math.cos(angle), math.sin(angle)
+    return (cx + u * c - v * s).ravel(), (cy + u * s + v * c).ravel()
+
+
+def in_box(box, px, py):
+    cx, cy, hw, hh, angle = box
+    c, s = math.cos(angle), math.sin(angle)
+    lx, ly = (px - cx) * c + (py - cy) * s, -(px - cx) * s + (py - cy) * c
+    return (np.abs(lx) <= hw) & (np.abs(ly) <= hh)
+
+
+def random_boxes(rng, n, around=(0, 0), spread=60):
+    return np.column_stack([around[0] + rng.uniform(-spread, spread, n), around[1] + rng.uniform(-spread, spread, n),
+                            rng.uniform(3, 35, n), rng.uniform(3, 20, n), rng.uniform(-math.pi, math.pi, n)])
+
+
+def test_obb_vs_obb_matches_sampling():
+    rng = np.random.default_rng(13)
+    a, b = random_boxes(rng, 300), random_boxes(rng, 300)
+    hit, depth = obb_vs_obb(a, b)
+    checked = 0
+    for i in range(len(a)):
+        if abs(depth[i]) < MARGIN:
+            continue
+        px, py = box_points(a[i])
+        assert hit[i] == in_box(b[i], px, py).any()
+        checked += 1
+    assert checked > 200 and 0 < hit.sum() < len(a)
+
+
+def test_obb_vs_circle_matches_sampling():
+    rng = np.random.default_rng(14)
+    boxes = random_boxes(rng, 300)
+    circles = np.column_stack([rng.uniform(-60, 60, 300), rng.uniform(-60, 60, 300), rng.uniform(2, 30, 300)])
+    hit, depth = obb_vs_circle(boxes, circles)
+    for i in range(len(boxes)):
+        if abs(depth[i]) < MARGIN:
+            continue
+        px, py = box_points(boxes[i])
+        inside = np.hypot(px - circles[i, 0], py - circles[i, 1]) <= circles[i, 2]
+        assert hit[i] == inside.any()
+    assert 0 < hit.sum() < len(boxes)
+
+
+def test_obb_vs_segment_matches_sampling():
+    rng = np.random.default_rng(15)
+    boxes = random_boxes(rng, 300)
+    segments = rng.uniform(-80, 80, (300, 4))
+    hit, depth = obb_vs_segment(boxes, segments)
+    t = np.linspace(0, 1, 4001)
+    for i in range(len(boxes)):
+        if abs(depth[i]) < MARGIN:
+            continue
+        x1, y1, x2, y2 = segments[i]
+        assert hit[i] == in_box(boxes[i], x1 + t * (x2 - x1), y1 + t * (y2 - y1)).any()
+    assert 0 < hit.sum() < len(boxes)
+
+
+def test_depths_of_simple_overlaps():
+    car = car_boxes(0, 0, 0)   # 60 x 30
+    hit, depth = obb_vs_obb(car, car_boxes(55, 0, 0))
+    assert hit[0] and math.isclose(depth[0], 5)
+    hit, depth = obb_vs_circle(car, np.array([[0.0, 20.0, 8.0]]))
+    assert hit[0] and math.isclose(depth[0], 3)
+    hit, depth = obb_vs_segment(car, np.array([[-100.0, 12.0, 100.0, 12.0]]))
+    assert hit[0] and math.isclose(depth[0], 3)
+
+
+def test_touching_is_not_a_contact():
+    # Shared edges have depth 0; every shape kind treats that the same way
+    car = car_boxes(0, 0, 0)
+    assert not obb_vs_obb(car, car_boxes(60, 0, 0))[0][0]
+    assert not obb_vs_circle(car, np.array([[40.0, 0.0, 10.0]]))[0][0]
+    assert not obb_vs_segment(car, np.array([[30.0, -50.0, 30.0, 50.0]]))[0][0]
+
+
+def test_collide_matches_all_pairs():
+    # The AABB broad phase must not drop any pair the narrow phase would report
+    rng = np.random.default_rng(16)
+    cars = car_boxes(rng.uniform(0, 400, 40), rng.uniform(0, 300, 40), rng.uniform(-math.pi, math.pi, 40))
+    geometry = SceneGeometry(circles=np.column_stack([rng.uniform(0, 400, 30), rng.uniform(0, 300, 30),
+                                                      rng.uniform(5, 25, 30)]),
+                             boxes=random_boxes(rng, 30, around=(200, 150), spread=200),
+                             segments=rng.uniform(0, 400, (30, 4)))
+    car_index, kind, index, depth = collide(cars, geometry)
+    found = set(zip(car_index.tolist(), kind.tolist(), index.tolist()))
+
+    expected = set()
+    for code, shapes, narrow in ((BOX, geometry.boxes, obb_vs_obb), (CIRCLE, geometry.circles, obb_vs_circle),
+                                 (SEGMENT, geometry.segments, obb_vs_segment)):
+        ci, si = np.meshgrid(np.arange(len(cars)), np.arange(len(shapes)), indexing="ij")
+        hit, _ = narrow(cars[ci.ravel()], shapes[si.ravel()])
+        expected |= {(c, code, s) for c, s in zip(ci.ravel()[hit].tolist(), si.ravel()[hit].tolist())}
+    assert found == expected and expected
+
+
+def test_car_contacts_name_their_obstacles():
+    car = Car(100, 100)
+    circle, parked, line = CircleObstacle(130, 100), CarObstacle(100, 120), LineSegment((80, 50), (80, 150))
+    contacts = car_contacts(car, [circle, parked, line, CircleObstacle(400, 400)])
+    assert {(c.kind, c.obstacle) for c in contacts} == {("circle", circle), ("box", parked), ("segment", line)}
+    assert all(c.depth > 0 for c in contacts)
+
+
+def outline_points(segments, step=0.1):
+    # Dense samples along segments (M, 4)
+    points = [np.linspace((x1, y1), (x2, y2), int(math.hypot(x2 - x1, y2 - y1) / step) + 2)
+              for x1, y1, x2, y2 in segments.tolist()]
+    return np.concatenate(points)
+
+
+def test_box_clearance_matches_sampled_outlines():
+    rng = np.random.default_rng(21)
+    separated = 0
+    for _ in range(40):
+        box = random_boxes(rng, 1)[0]
+        geometry = SceneGeometry(circles=[(*rng.uniform(-100, 100, 2), rng.uniform(2, 15))],
+                                 boxes=random_boxes(rng, 1, spread=100),
+                                 segments=rng.uniform(-100, 100, (1, 4)))
+        clearance = box_clearance(box, geometry)
+        if len(collide(box[None], geometry)[0]):
+            assert clearance < 0
+            continue
+        # Outside one another, the gap is the closest pair of outline points
+        separated += 1
+        ours = outline_points(box_edges(box[None]))
+        theirs = outline_points(np.concatenate([box_edges(geometry.boxes), geometry.segments]))
+        gaps = [np.hypot(ours[:, None, 0] - theirs[None, :, 0], ours[:, None, 1] - theirs[None, :, 1]).min()]
+        for cx, cy, r in geometry.circles.tolist():
+            gaps.append(np.hypot(ours[:, 0] - cx, ours[:, 1] - cy).min() - r)
+        assert clearance == pytest.approx(min(gaps), abs=0.1)
+        assert clearance >= 0
+    assert separated > 15
+
+
+def test_box_clearance_of_simple_layouts():
+    box = (0, 0, 30, 15, 0.0)
+    assert box_clearance(box, SceneGeometry(circles=[(0, 40, 10)])) == pytest.approx(15)
+    assert box_clearance(box, SceneGeometry(boxes=[(80, 0, 10, 10, 0.0)])) == pytest.approx(40)
+    assert box_clearance(box, SceneGeometry(segments=[(40, -50, 40, 50)])) == pytest.approx(10)
+    assert box_clearance(box, SceneGeometry(circles=[(0, 20, 10)])) == pytest.approx(-5)
+    assert box_clearance(box, SceneGeometry()) == math.inf
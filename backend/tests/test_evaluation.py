@@ -0,0 +1,38 @@
+import math
+
+import pytest
+
+from car import Car
+from evaluation import bay_rects, get_controller, in_bay, run_episode
+from scenarios import Scenario, generate_valid
+
+
+def ram(sim, scenario):
+    # Full throttle, slightly steered: hits something before the episode ends
+    return lambda: sim.step((1.0, 0.2))
+
+
+@pytest.mark.parametrize("controller, seed", [(get_controller("rules"), 2), (get_controller("planner"), 0)])
+def test_clearance_is_negative_only_with_collisions(controller, seed):
+    result = run_episode(generate_valid(seed), controller, max_steps=400)
+    assert math.isfinite(result["min_clearance"])
+    assert (result["min_clearance"] < 0) == (result["collision_steps"] > 0)
+
+
+def test_ramming_reports_a_collision():
+    result = run_episode(generate_valid(1), ram, max_steps=400)
+    assert result["collision_steps"] > 0 and result["min_clearance"] < 0
+
+
+def test_in_bay_uses_the_bay_size():
+    scenario = generate_valid(3)
+    bays = bay_rects(scenario)
+    assert len(bays) == len(scenario.free_bays)
+    bay = scenario.free_bays[0]
+    x, y, angle = Scenario.bay_pose(bay)
+    car = Car(x, y)
+    car.angle = angle
+    assert in_bay(car, bays)
+    # Shifted sideways by more than the room left between the lines
+    car.x += (bay["width"] - 30) / 2 + 1
+    assert not in_bay(car, bays[:1])
@@ -0,0 +1,74 @@
+import math
+
+import numpy as np
+import pytest
+
+from occupancy import L_HIT, L_MAX, L_MIN, L_MISS, SPOT_MIN_PIXELS, SPOT_RADIUS, OccupancyGrid
+from scenarios import generate_valid
+from sim import Simulation
+
+
+def test_ray_update_marks_free_cells_and_the_hit():
+    grid = OccupancyGrid(cell=4)
+    # One ray along +x from the middle of cell (10, 10), hitting 40 px away
+    grid.integrate_rays(42, 42, [0.0], [40.0])
+    np.testing.assert_allclose(grid.log_odds[10:20, 10], L_MISS, rtol=1e-6)
+    assert grid.log_odds[20, 10] == pytest.approx(L_HIT)
+    assert np.count_nonzero(grid.log_odds) == 11
+
+    # Repeated evidence is clamped, so a later contradiction can still flip a cell
+    for _ in range(20):
+        grid.integrate_rays(42, 42, [0.0], [40.0])
+    assert grid.log_odds[12, 10] == L_MIN and grid.log_odds[20, 10] == pytest.approx(L_MAX)
+
+
+def test_ray_update_misses_and_crossings():
+    grid = OccupancyGrid(cell=4)
+    # A miss frees cells up to the sensor range only; nothing is marked occupied
+    grid.integrate_rays(402, 302, [math.pi / 2], [math.inf], max_distance=100)
+    assert (grid.log_odds <= 0).all()
+    assert np.count_nonzero(grid.log_odds) == 26
+
+    # In one update a cell that one ray ends in and another crosses counts as a hit, once
+    grid = OccupancyGrid(cell=4)
+    grid.integrate_rays(42, 42, [0.0, 0.0], [20.0, 60.0])
+    assert grid.log_odds[15, 10] == pytest.approx(L_HIT)
+    assert grid.log_odds[12, 10] == pytest.approx(L_MISS)
+
+
+@pytest.fixture(scope="module")
+def scenario():
+    return generate_valid(3)
+
+
+def test_spot_detection_matches_pixel_test(scenario):
+    yellow_map = scenario.yellow_map
+    grid = OccupancyGrid()
+    rng = np.random.default_rng(2)
+    xs, ys = rng.uniform(0, 800, 300), rng.uniform(0, 600, 300)
+    # Nothing reported yet, nothing detected
+    assert not any(grid.spot_detected(x, y) for x, y in zip(xs, ys))
+
+    detected = 0
+    for x, y in zip(xs, ys):
+        grid.integrate_lines(x, y, 80, yellow_map)
+        expected = yellow_map.count_in_disk(x, y, SPOT_RADIUS) >= SPOT_MIN_PIXELS
+        assert grid.spot_detected(x, y) == expected
+        detected += expected
+    assert 0 < detected < len(xs)
+
+
+def test_mapped_spot_test_is_opt_in(scenario):
+    # Recording the map does not change the car's decisions; spot_test=True drives from it
+    # and, with the map built from the same sensing, makes the same decisions
+    trajectories = []
+    for mapping in (None, False, True):
+        sim = Simulation()
+        scenario.apply(sim)
+        if mapping is not None:
+            sim.enable_mapping(spot_test=mapping)
+            assert (sim.car.spot_map is not None) == mapping
+        for _ in range(400):
+            sim.step()
+        trajectories.append(sim.pose())
+    assert trajectories[0] == trajectories[1] == trajectories[2]
@@ -0,0 +1,167 @@
+import math
+import os
+
+import numpy as np
+import pytest
+
+from car import Car
+from collision import CAR_HALF_EXTENTS, box_clearance, car_boxes, point_segment_distance
+from obstacle import LineSegment
+from occupancy import L_MAX, OccupancyGrid
+from physics import integrate
+from planner import (CELL, HEADING_TOLERANCE, POSITION_TOLERANCE, ObstacleField, PrimitiveSet,
+                     footprint_points, plan)
+from raycast import SceneGeometry
+from yellow import YellowMap
+
+GEOMETRY = SceneGeometry(circles=[(300, 200, 15), (520, 410, 25)],
+                         boxes=[(420, 300, 30, 15, 0.6), (150, 450, 40, 20, -0.3)],
+                         segments=[(600, 100, 700, 180)])
+
+
+def true_clearance(geometry, x, y):
+    # Exact distance from points to the nearest shape, negative inside circles
+    c = geometry.circles
+    gaps = [np.hypot(x[:, None] - c[:, 0], y[:, None] - c[:, 1]) - c[:, 2]]
+    b = geometry.boxes
+    dx, dy = x[:, None] - b[:, 0], y[:, None] - b[:, 1]
+    cos_a, sin_a = np.cos(b[:, 4]), np.sin(b[:, 4])
+    lx, ly = np.abs(dx * cos_a + dy * sin_a) - b[:, 2], np.abs(-dx * sin_a + dy * cos_a) - b[:, 3]
+    gaps.append(np.hypot(np.maximum(lx, 0), np.maximum(ly, 0)) + np.minimum(np.maximum(lx, ly), 0))
+    gaps.append(point_segment_distance(x, y, geometry.segments))
+    return np.concatenate(gaps, axis=1).min(axis=1)
+
+
+@pytest.fixture(scope="module")
+def primitives(tmp_path_factory):
+    return PrimitiveSet.for_car(Car(0, 0), cache_dir=str(tmp_path_factory.mktemp("primitives")))
+
+
+# ---- footprint and primitives ----
+
+def test_footprint_discs_cover_outline_and_axis():
+    # Obstacles have to cross the car's outline (or sit on its axis) to reach it, so
+    # points clear of every disc there are clear of the box
+    points, radii = footprint_points()
+    half_l, half_w = CAR_HALF_EXTENTS
+    t = np.linspace(-1, 1, 401)
+    px = np.concatenate([t * half_l, t * half_l, np.full_like(t, half_l), np.full_like(t, -half_l), t * half_l])
+    py = np.concatenate([np.full_like(t, half_w), np.full_like(t, -half_w), t * half_w, t * half_w, 0 * t])
+    gap = np.hypot(px[:, None] - points[:, 0], py[:, None] - points[:, 1]) - radii
+    assert (gap.min(axis=1) <= 1e-9).all()
+    # The outline points lie on the box edge, the rest on the axis
+    outline = radii < half_w
+    on_edge = np.isclose(np.abs(points[:, 0]), half_l) | np.isclose(np.abs(points[:, 1]), half_w)
+    assert on_edge[outline].all() and (points[~outline, 1] == 0).all()
+
+
+def test_primitives_follow_the_car_model(primitives):
+    car = Car(0, 0)
+    for p in range(len(primitives)):
+        speed, steering = primitives.actions[p].tolist()
+        x = y = angle = 0.0
+        for i in range(int(primitives.frames[p])):
+            x, y, angle = integrate(x, y, angle, speed, steering, car.length, car.dt, car.substeps,
+                                    car.integrator)
+            np.testing.assert_allclose(primitives.samples[p, i], (x, y, angle), atol=1e-12)
+        np.testing.assert_allclose(primitives.ends[p], (x, y, angle), atol=1e-12)
+    # Opposite steering mirrors a primitive across the heading
+    for p, q in ((0, 4), (1, 3), (5, 9)):
+        np.testing.assert_allclose(primitives.samples[q], primitives.samples[p] * (1, -1, -1), atol=1e-9)
+
+
+def test_for_car_reloads_the_cache(primitives, tmp_path):
+    car = Car(0, 0)
+    built = PrimitiveSet.for_car(car, cache_dir=str(tmp_path))
+    files = sorted(os.listdir(tmp_path))
+    assert len(files) == 6 and not any(name.endswith(".tmp.npy") for name in files)
+    loaded = PrimitiveSet.for_car(car, cache_dir=str(tmp_path))
+    for name in ("actions", "frames", "samples", "points", "radii", "table", "costs", "ends"):
+        np.testing.assert_array_equal(getattr(loaded, name), getattr(built, name), err_msg=name)
+        np.testing.assert_array_equal(getattr(loaded, name), getattr(primitives, name), err_msg=name)
+    # Another car model gets its own files
+    car.substeps = 2
+    PrimitiveSet.for_car(car, cache_dir=str(tmp_path))
+    assert len(os.listdir(tmp_path)) == 12
+
+
+# ---- obstacle field ----
+
+def test_field_clearance_is_conservative():
+    field = ObstacleField(GEOMETRY)
+    rng = np.random.default_rng(1)
+    x, y = rng.uniform(0, 800, 20000), rng.uniform(0, 600, 20000)
+    clearance, exact = field.clearance(x, y), true_clearance(GEOMETRY, x, y)
+    assert (clearance <= np.maximum(exact, 0) + 1e-4).all()
+    # ... but only by the cell rounding
+    assert (clearance >= exact - 3 * CELL).all()
+    assert (field.clearance(np.array([-1.0, 800.0, 10.0]), np.array([10.0, 10.0, 600.0])) == -1).all()
+
+
+def test_field_line_clearance_is_conservative():
+    # Lines use the per-pixel YellowMap distance field
+    lines = [LineSegment((200, 150), (200, 260)), LineSegment((200, 150), (330, 150))]
+    yellow_map = YellowMap.from_segments(lines)
+    field = ObstacleField(SceneGeometry(), yellow_map)
+    rng = np.random.default_rng(2)
+    x, y = rng.uniform(150, 380, 2000), rng.uniform(100, 310, 2000)
+    lx, ly = np.nonzero(yellow_map.line_mask)
+    # Distance to the nearest line pixel center
+    nearest = np.sqrt(((x[:, None] - lx - 0.5) ** 2 + (y[:, None] - ly - 0.5) ** 2).min(axis=1))
+    clearance = field.clearance(x, y)
+    assert (clearance <= nearest + 1e-4).all()
+    assert (clearance >= nearest - 1 - math.sqrt(0.5)).all()
+
+
+def test_field_from_occupancy():
+    grid = OccupancyGrid()
+    grid.integrate_rays(402, 302, [0.0], [100.0])   # one hit around (502, 302)
+    grid.lines[50, 20] = L_MAX
+    field = ObstacleField.from_occupancy(grid)
+    np.testing.assert_array_equal(field.occupied, grid.occupied_mask(include_lines=True))
+    assert field.occupied[125, 75] and field.occupied[50, 20] and np.count_nonzero(field.occupied) == 2
+    assert field.clearance(np.array([502.0, 202.0]), np.array([302.0, 82.0])).max() <= 0
+    # Unknown cells are free: the field only knows the two mapped cells
+    assert field.clearance(np.array([300.0]), np.array([450.0]))[0] > 100
+    assert not ObstacleField.from_occupancy(grid, include_lines=False).occupied[50, 20]
+
+
+# ---- search ----
+
+def test_plan_is_drivable_and_collision_free(primitives):
+    start, goal = (150.0, 300.0, 0.0), (560.0, 300.0, 0.0)
+    field = ObstacleField(GEOMETRY)
+    result = plan(start, goal, field, primitives, time_budget=5.0)
+    assert result is not None and len(result) > 0 and result.expansions > 0
+    poses, actions = result.poses, result.actions
+    assert len(poses) == len(actions) + 1
+    np.testing.assert_allclose(result.goal, goal, atol=1e-6)
+    x, y, angle = poses[0]
+    assert math.hypot(x - start[0], y - start[1]) <= POSITION_TOLERANCE
+    assert abs(angle - start[2]) <= HEADING_TOLERANCE + 1e-9
+
+    # Each frame is one step of the car model with the planned action
+    car = Car(0, 0)
+    for pose, (speed, steering), after in zip(poses[:-1], actions, poses[1:]):
+        np.testing.assert_allclose(integrate(*pose, speed, steering, car.length, car.dt, car.substeps,
+                                             car.integrator), after, atol=1e-6)
+    # The obstacles sit across the straight line, so the path has to go around them
+    boxes = car_boxes(poses[:, 0], poses[:, 1], poses[:, 2])
+    assert min(box_clearance(box, GEOMETRY) for box in boxes) > 0
+
+
+def test_plan_fails_into_an_obstacle(primitives):
+    field = ObstacleField(GEOMETRY)
+    assert plan((150.0, 300.0, 0.0), (420.0, 300.0, 0.6), field, primitives) is None
+
+
+def test_plan_tracking_reaches_the_goal(primitives):
+    # Starting a few px off the planned start, next_action still brings the car to the goal
+    start, goal = (150.0, 300.0, 0.0), (560.0, 300.0, 0.0)
+    result = plan(start, goal, ObstacleField(GEOMETRY), primitives, time_budget=5.0)
+    car = Car(start[0] + 3, start[1] - 3)
+    while (action := result.next_action(car)) is not None:
+        car.speed, car.steering_angle = action
+        car.update_position()
+    assert math.hypot(car.x - goal[0], car.y - goal[1]) < 5
+    assert abs(car.angle - goal[2]) < math.radians(5)
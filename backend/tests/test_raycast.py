@@ -0,0 +1,106 @@
+import math
+
+import numpy as np
+
+from car import Car
+from obstacle import CarObstacle, CircleObstacle, LineSegment, segments_intersect
+from raycast import MAX_SENSOR_DISTANCE, SENSOR_OFFSETS, SceneGeometry, cast_rays, cast_sensors
+
+WIDTH, HEIGHT = 800, 600
+STEP = 0.02   # reference march resolution, px
+
+
+def random_geometry(rng, n=12):
+    circles = np.column_stack([rng.uniform(0, WIDTH, n), rng.uniform(0, HEIGHT, n), rng.uniform(5, 30, n)])
+    boxes = np.column_stack([rng.uniform(0, WIDTH, n), rng.uniform(0, HEIGHT, n), rng.uniform(5, 40, n),
+                             rng.uniform(5, 20, n), rng.uniform(-math.pi, math.pi, n)])
+    return SceneGeometry(circles, boxes)
+
+
+def inside(geometry, px, py):
+    # Point-in-shape for sample points (K,) against every circle and box -> (K,) bool
+    c = geometry.circles
+    hit = ((px[:, None] - c[:, 0]) ** 2 + (py[:, None] - c[:, 1]) ** 2 <= c[:, 2] ** 2).any(axis=1)
+    b = geometry.boxes
+    dx, dy = px[:, None] - b[:, 0], py[:, None] - b[:, 1]
+    cos_a, sin_a = np.cos(b[:, 4]), np.sin(b[:, 4])
+    lx, ly = dx * cos_a + dy * sin_a, -dx * sin_a + dy * cos_a
+    return hit | ((np.abs(lx) <= b[:, 2]) & (np.abs(ly) <= b[:, 3])).any(axis=1)
+
+
+def march(geometry, x, y, angle):
+    # The old sensor loop at a fine step: first sample inside a shape, stopping at the
+    # screen edge or MAX_SENSOR_DISTANCE; inf for no hit
+    t = np.arange(0, MAX_SENSOR_DISTANCE, STEP)
+    px, py = x + t * math.cos(angle), y + t * math.sin(angle)
+    off_screen = (px < 0) | (px >= WIDTH) | (py < 0) | (py >= HEIGHT)
+    if off_screen.any():
+        stop = np.argmax(off_screen)
+        t, px, py = t[:stop], px[:stop], py[:stop]
+    hit = inside(geometry, px, py)
+    return float(t[np.argmax(hit)]) if hit.any() else math.inf
+
+
+def test_analytic_matches_march():
+    rng = np.random.default_rng(3)
+    geometry = random_geometry(rng)
+    hits = 0
+    for _ in range(40):
+        x, y, heading = rng.uniform(0, WIDTH), rng.uniform(0, HEIGHT), rng.uniform(-math.pi, math.pi)
+        distances = cast_sensors(x, y, heading, geometry)
+        for offset, distance in zip(SENSOR_OFFSETS.tolist(), distances.tolist()):
+            expected = march(geometry, x, y, heading + offset)
+            if math.isinf(expected):
+                assert math.isinf(distance) or distance > MAX_SENSOR_DISTANCE - STEP
+            else:
+                hits += 1
+                assert expected - STEP <= distance <= expected + 1e-9
+    assert hits > 20   # the scene is dense enough to test hits, not only misses
+
+
+def test_origin_inside_shape_reports_zero():
+    geometry = SceneGeometry(circles=[(100, 100, 20)], boxes=[(300, 300, 30, 15, 0.4)])
+    distances = cast_rays([100, 300], [100, 300], [0.3, 2.0], geometry)
+    np.testing.assert_array_equal(distances, [0, 0])
+
+
+def test_segments_match_crossing_test():
+    # Segments have no area to march into; the old loop tested the ray so far against them
+    rng = np.random.default_rng(5)
+    for _ in range(200):
+        x1, y1, x2, y2 = rng.uniform(200, 400, 4)
+        angle = rng.uniform(-math.pi, math.pi)
+        distance = float(cast_rays(300, 300, angle, SceneGeometry(segments=[(x1, y1, x2, y2)]))[()])
+        end = (300 + MAX_SENSOR_DISTANCE * math.cos(angle), 300 + MAX_SENSOR_DISTANCE * math.sin(angle))
+        assert math.isfinite(distance) == segments_intersect((300, 300), end, (x1, y1), (x2, y2))
+        if math.isfinite(distance):
+            px, py = 300 + distance * math.cos(angle), 300 + distance * math.sin(angle)
+            # The hit point lies on the segment
+            cross = (x2 - x1) * (py - y1) - (y2 - y1) * (px - x1)
+            assert abs(cross) / math.hypot(x2 - x1, y2 - y1) < 1e-6
+
+
+def test_car_cast_sensor_uses_obstacle_shapes():
+    car = Car(200, 300)
+    obstacles = [CircleObstacle(300, 300), CarObstacle(200, 200), LineSegment((150, 250), (150, 350))]
+    car.cast_sensor(obstacles)
+    geometry = SceneGeometry.from_obstacles(obstacles)
+    np.testing.assert_array_equal(car.sensor_distances, cast_sensors(200, 300, 0, geometry).tolist())
+    front = car.sensor_distances[1]
+    assert front == 300 - obstacles[0].radius - 200
+
+
+def test_direct_cast_matches_grid_candidates(monkeypatch):
+    # Small scenes skip the grid traversal; the readings must not depend on that
+    import sim as sim_module
+    rng = np.random.default_rng(8)
+    obstacles = [CircleObstacle(*rng.uniform(100, 700, 2)) for _ in range(8)]
+    obstacles += [CarObstacle(*rng.uniform(100, 500, 2)) for _ in range(8)]
+    simulation = sim_module.Simulation(obstacles, start=(400, 300))
+    for _ in range(60):
+        simulation.step(tuple(rng.uniform(-1, 1, 2)))
+        direct = cast_sensors(*simulation.pose(), simulation.sensor_geometry())
+        monkeypatch.setattr(sim_module, "DIRECT_CAST_ROWS", 0)
+        through_grid = cast_sensors(*simulation.pose(), simulation.sensor_geometry())
+        monkeypatch.undo()
+        np.testing.assert_array_equal(direct, through_grid)
@@ -0,0 +1,90 @@
+import os
+
+import numpy as np
+import pytest
+
+from obstacle import CircleObstacle
+from recording import STEP_DTYPE, Episode, EpisodeRecorder
+from scenarios import Scenario, generate_valid
+from sim import Simulation
+
+
+@pytest.fixture(scope="module")
+def scenario():
+    return generate_valid(2)
+
+
+def record(path, scenario, steps=700, manual=range(300, 380)):
+    # Rule-based auto mode with a stretch of manual driving in the middle
+    sim = Simulation(yellow_map=scenario.yellow_map)
+    scenario.apply(sim)
+    sim.recorder = recorder = EpisodeRecorder(str(path), sim, seed=scenario.seed, batch_size=64)
+    poses = []
+    for i in range(steps):
+        sim.step((1.0, 0.4) if i in manual else None)
+        poses.append(sim.pose())
+    recorder.close()
+    return recorder, poses
+
+
+@pytest.fixture(scope="module")
+def recorded(tmp_path_factory, scenario):
+    path = tmp_path_factory.mktemp("recording") / "episode.ep"
+    recorder, poses = record(path, scenario)
+    return str(path), recorder, poses
+
+
+def test_records_match_the_run(recorded, scenario):
+    path, recorder, poses = recorded
+    episode = Episode.load(path)
+    assert len(episode) == recorder.steps == len(poses)
+    np.testing.assert_array_equal(np.column_stack([episode.steps[k] for k in ("x", "y", "angle")]), poses)
+    actions = episode.actions()
+    assert actions[0] is None and actions[300] == (1.0, 0.4)
+    assert episode.state(-1)["x"] == scenario.start[0]
+
+
+@pytest.mark.parametrize("start", [0, 1, 299, 350, 650])
+def test_replay_is_exact(recorded, scenario, start):
+    episode = Episode.load(recorded[0])
+    assert episode.verify(episode.simulation(scenario.yellow_map), start=start) is None
+
+
+def test_verify_reports_first_divergence(recorded, scenario):
+    loaded = Episode.load(recorded[0])
+    steps = np.array(loaded.steps)
+    steps["x"][420] += 1e-9
+    episode = Episode(loaded.header, steps)
+    assert episode.verify(episode.simulation(scenario.yellow_map)) == 420
+
+
+def test_partial_record_is_ignored(tmp_path, scenario):
+    # A crash mid-write leaves a truncated last record; the complete ones still load
+    path = tmp_path / "episode.ep"
+    record(path, scenario, steps=100)
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) - STEP_DTYPE.itemsize // 2)
+    episode = Episode.load(str(path))
+    assert len(episode) == 99
+    assert episode.verify(episode.simulation(scenario.yellow_map)) is None
+
+
+def test_unreplayable_runs_are_refused(tmp_path, scenario):
+    sim = Simulation(yellow_map=scenario.yellow_map)
+    scenario.apply(sim)
+    assert sim.plan_parking(Scenario.bay_pose(scenario.free_bays[0])) is not None
+    with pytest.raises(ValueError):
+        EpisodeRecorder(str(tmp_path / "planned.ep"), sim)
+
+    # An edit mid-recording ends the file before the first step it affects
+    scenario.apply(sim)
+    sim.recorder = recorder = EpisodeRecorder(str(tmp_path / "edited.ep"), sim)
+    for i in range(60):
+        if i == 40:
+            sim.add_obstacle(CircleObstacle(50, 50))
+        sim.step()
+    recorder.close()
+    assert recorder.stopped is not None and recorder.steps == 40
+    episode = Episode.load(str(tmp_path / "edited.ep"))
+    assert len(episode) == 40
+    assert episode.verify(episode.simulation(scenario.yellow_map)) is None
@@ -0,0 +1,38 @@
+import numpy as np
+
+from obstacle import LineSegment
+from parking_env import HOLD_STEPS, PARKED_REWARD, STEP_PENALTY
+from rollout import LocalPool, RolloutPool, SimEnv
+from yellow import YellowMap
+
+
+def test_pool_matches_local_pool():
+    # Same seeds, same actions: the workers must reproduce the in-process envs, auto-resets included
+    kwargs = {"max_steps": 30}
+    rng = np.random.default_rng(2)
+    actions = rng.uniform(-1, 1, size=(40, 4, 2)).astype(np.float32)
+    local = LocalPool(4, env_kwargs=kwargs, seed=5)
+    with RolloutPool(2, 2, env_kwargs=kwargs, seed=5) as pool:
+        np.testing.assert_array_equal(pool.reset(), local.reset())
+        for step, a in enumerate(actions, 1):
+            obs, rewards, dones = pool.step(a)
+            expected_obs, expected_rewards, expected_dones = local.step(a)
+            np.testing.assert_array_equal(obs, expected_obs)
+            np.testing.assert_array_equal(rewards, expected_rewards)
+            np.testing.assert_array_equal(dones, expected_dones)
+            assert dones.all() == (step == 30)
+            assert (rewards <= STEP_PENALTY + 1e-6).all()
+        np.testing.assert_array_equal(pool.episodes, [1, 1, 1, 1])
+
+
+def test_holding_in_spot_parks():
+    # A line just behind the car and nothing beside it: stopped there, the ParkingEnv
+    # hold check parks it after HOLD_STEPS steps even though actions drive the car
+    yellow_map = YellowMap.from_segments([LineSegment((375, 270), (375, 330))])
+    env = SimEnv(n_obstacles=0, yellow_map=yellow_map)
+    env.reset(seed=0)
+    env.sim.reset(400, 300, 0)
+    for step in range(1, HOLD_STEPS + 1):
+        _, reward, done = env.step((0.0, 0.0))
+        assert done == (step == HOLD_STEPS)
+    assert reward == STEP_PENALTY + PARKED_REWARD
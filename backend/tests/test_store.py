@@ -0,0 +1,55 @@
+import numpy as np
+
+from obstacle import CarObstacle, CircleObstacle
+from store import ObstacleStore
+
+
+def test_add_remove_cycles_keep_handle_table_bounded():
+    # Yellow segments come and go every step; freed handles must be handed out again
+    store = ObstacleStore(capacity=4)
+    rng = np.random.default_rng(0)
+    live = []
+    for _ in range(2000):
+        if live and (len(live) >= 10 or rng.random() < 0.5):
+            store.remove(live.pop(rng.integers(len(live))))
+        else:
+            live.append(store.add_segment(*rng.uniform(0, 800, 4)))
+    assert store.next_handle <= 10
+    assert len(store.handle_row) <= 16
+    assert sorted(store.handles().tolist()) == sorted(live)
+
+    # Bulk adds draw from the free list as well
+    for handle in live[:5]:
+        store.remove(handle)
+    handles = store.add_many("circle", [[100, 100, 5]] * 8)
+    assert len(set(handles.tolist())) == 8
+    assert store.next_handle <= 13
+
+    store.clear()
+    assert store.next_handle == 0 and len(store.handles()) == 0
+    assert store.add_circle(0, 0, 1) == 0
+
+
+def test_hit_test_picks_topmost_placed_obstacle():
+    store = ObstacleStore()
+    below = CircleObstacle(200, 200)
+    above = CarObstacle(210, 200)
+    h_below, h_above = store.add(below), store.add(above)
+    assert store.hit_test(205, 200) == h_above
+    # A handle reused by a later add is on top, even though it is the smaller number
+    store.remove(h_below)
+    again = store.add(CircleObstacle(200, 200))
+    assert again == h_below < h_above
+    assert store.hit_test(205, 200) == again
+
+
+def test_hit_test_skips_bulk_rows():
+    store = ObstacleStore()
+    placed = CircleObstacle(300, 300)
+    handle = store.add(placed)
+    # Bulk rows added later cover the placed obstacle but have nothing to edit
+    store.add_many("box", [[300, 300, 50, 50, 0.0]])
+    store.add_many("circle", [[500, 300, 40]])
+    assert store.hit_test(300, 300) == handle
+    assert store.hit_test(500, 300) is None
+    assert store.hit_test(340, 340) is None
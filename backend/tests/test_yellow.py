@@ -0,0 +1,140 @@
+import numpy as np
+import pytest
+
+from car import Car
+from yellow import WIDTH, HEIGHT, YellowMap
+
+RADII = (70, 80, 150)
+
+
+def loop_points(mask, x, y, radius):
+    # The original cast_sensor_circle loop, reading the mask instead of surface.get_at
+    points = []
+    for dx in range(-radius, radius):
+        for dy in range(-radius, radius):
+            if dx ** 2 + dy ** 2 <= radius ** 2:
+                sx = int(x + dx)
+                sy = int(y + dy)
+                if 0 <= sx < WIDTH and 0 <= sy < HEIGHT and mask[sx, sy]:
+                    points.append((sx, sy))
+    return points
+
+
+@pytest.fixture(scope="module")
+def yellow_map():
+    rng = np.random.default_rng(6)
+    mask = rng.random((WIDTH, HEIGHT)) < 0.05
+    mask[:, 295:302] = True   # a full-width line
+    mask[0, :] = mask[:, 0] = True   # and the screen edges, for the folding at -1
+    return YellowMap(mask)
+
+
+# Integer and fractional positions, inside and off the screen edges
+POSITIONS = [(400, 300), (123.4, 456.7), (0.5, 0.25), (0, 0), (-20.5, 310.2), (799.9, 599.5),
+             (810.0, -5.5), (60.75, 299.0)]
+
+
+@pytest.mark.parametrize("radius", RADII)
+def test_count_in_disks_matches_loop(yellow_map, radius):
+    xs, ys = zip(*POSITIONS)
+    counts = yellow_map.count_in_disks(xs, ys, radius)
+    expected = [len(loop_points(yellow_map.sensor_mask, x, y, radius)) for x, y in POSITIONS]
+    np.testing.assert_array_equal(counts, expected)
+
+
+def test_points_in_disk_match_loop(yellow_map):
+    for x, y in POSITIONS[:3]:
+        assert sorted(yellow_map.points_in_disk(x, y, 80)) == sorted(loop_points(yellow_map.sensor_mask, x, y, 80))
+
+
+
+def test_distance_to_line_clamps_to_map(yellow_map):
+    # The car is clamped to [0, WIDTH] x [0, HEIGHT], so the far edges are reachable
+    distance = yellow_map.distance
+    assert yellow_map.distance_to_line(WIDTH, HEIGHT) == distance[WIDTH - 1, HEIGHT - 1]
+    assert yellow_map.distance_to_line(WIDTH + 10.5, 120.3) == distance[WIDTH - 1, 120]
+    assert yellow_map.distance_to_line(-1.5, -3) == distance[0, 0]
+    assert yellow_map.distance_to_line(640.7, 350.2) == distance[640, 350]
+
+def test_surface_path_matches_map():
+    # Only the line, so positions near it detect a spot and the rest do not
+    import pygame
+    mask = np.zeros((WIDTH, HEIGHT), dtype=bool)
+    mask[:, 295:302] = True
+    yellow_map = YellowMap(mask)
+    pixels = np.zeros((WIDTH, HEIGHT, 3), dtype=np.uint8)
+    pixels[mask] = (255, 230, 0)
+    surface = pygame.surfarray.make_surface(pixels)
+    detected = []
+    for x, y in POSITIONS:
+        car = Car(x, y)
+        car.yellow_map = yellow_map
+        from_map = car.cast_sensor_circle(None, 70, visualize=False)
+        car.yellow_map = None
+        assert car.cast_sensor_circle(surface, 70, visualize=False) == from_map
+        detected.append(from_map)
+    assert any(detected) and not all(detected)
+
+
+# ---- incremental line tracking ----
+
+@pytest.fixture(scope="module")
+def lot_map():
+    from obstacle import LineSegment
+    lines = [LineSegment((x, 100), (x, 190)) for x in range(100, 701, 60)]
+    lines += [LineSegment((x, 410), (x, 500)) for x in range(100, 701, 60)]
+    lines += [LineSegment((100, 100), (700, 100)), LineSegment((100, 500), (700, 500))]
+    return YellowMap.from_segments(lines)
+
+
+def drive(rng, steps=300):
+    # Small moves with the odd jump, so segments enter and leave the disk both ways
+    x, y = 400.0, 300.0
+    for _ in range(steps):
+        if rng.random() < 0.05:
+            x, y = rng.uniform(0, WIDTH), rng.uniform(0, HEIGHT)
+        else:
+            x = float(np.clip(x + rng.uniform(-8, 8), 0, WIDTH - 1))
+            y = float(np.clip(y + rng.uniform(-8, 8), 0, HEIGHT - 1))
+        yield x, y
+
+
+def test_line_tracker_matches_full_extract(lot_map):
+    from yellow import LineTracker, segment_distances
+    tracker = LineTracker(lot_map, 150)
+    segments = tracker.segments
+    active, largest = set(), 0
+    for x, y in drive(np.random.default_rng(17)):
+        added, removed = tracker.update(x, y)
+        assert not active & set(added.tolist()) and set(removed.tolist()) <= active
+        active = (active | set(added.tolist())) - set(removed.tolist())
+        expected = set(np.flatnonzero(segment_distances(segments, x, y) <= 150).tolist())
+        assert active == expected == set(tracker.active_indices().tolist())
+        largest = max(largest, len(active))
+    assert largest > 5
+
+
+def test_simulation_yellow_segments_follow_the_car(lot_map):
+    from sim import Simulation
+    from yellow import segment_distances
+    sim = Simulation(yellow_map=lot_map)
+    segments = sim.line_tracker.segments
+    for x, y in drive(np.random.default_rng(18), 100):
+        sim.car.x, sim.car.y = x, y
+        sim.update_yellow_segments()
+        found = {(*s.start, *s.end) for s in sim.yellow_segments}
+        near = segments[segment_distances(segments, x, y) <= sim.sensor_range]
+        assert found == {tuple(s) for s in near.tolist()}
+        assert len(sim.yellow_grid) == len(found)
+
+
+def test_line_samples_match_loop(lot_map):
+    # The old extract_yellow_lines_near_car sampling loop, on the line mask
+    import math
+    for cx, cy in ((400, 300), (130, 120), (5, 590)):
+        expected = set()
+        for x in range(max(0, cx - 150), min(WIDTH, cx + 150), 4):
+            for y in range(max(0, cy - 150), min(HEIGHT, cy + 150), 4):
+                if math.hypot(x - cx, y - cy) <= 150 and lot_map.line_mask[x, y]:
+                    expected.add((x, y))
+        assert lot_map.line_samples((cx, cy), 150) == expected
@@ -0,0 +1,423 @@
+import functools
+import hashlib
+import os
+import sys
+
+import numpy as np
+
+WIDTH, HEIGHT = 800, 600
+
+# ================================
+# Yellow masks
+# ================================
+# Masks are indexed [x, y] like pygame.surfarray so lookups read the same as get_at((x, y)).
+
+def sensor_yellow(rgb):
+    # Same test as Car.cast_sensor_circle
+    r, g, b = (rgb[..., i].astype(np.int16) for i in range(3))
+    return (r > 200) & (g > 200) & (b < 100)
+
+def line_yellow(rgb, brightness_threshold=160, blue_threshold=120, rg_diff=80):
+    # Vectorized is_yellow from random_car.py
+    r, g, b = (rgb[..., i].astype(np.int16) for i in range(3))
+    return ((r > brightness_threshold) & (g > brightness_threshold)
+            & (b < blue_threshold) & (np.abs(r - g) < rg_diff))
+
+def rasterize_segments(segments, size=(WIDTH, HEIGHT), thickness=7):
+    # Paint LineSegment geometry into a mask, for scenes without a background image
+    width, height = size
+    mask = np.zeros((width, height), dtype=bool)
+    half = thickness / 2
+    for seg in segments:
+        (x1, y1), (x2, y2) = seg.start, seg.end
+        x0, x3 = int(max(0, min(x1, x2) - half)), int(min(width, max(x1, x2) + half + 1))
+        y0, y3 = int(max(0, min(y1, y2) - half)), int(min(height, max(y1, y2) + half + 1))
+        if x0 >= x3 or y0 >= y3:
+            continue
+        px, py = np.meshgrid(np.arange(x0, x3), np.arange(y0, y3), indexing="ij")
+        dx, dy = x2 - x1, y2 - y1
+        length_sq = dx * dx + dy * dy
+        t = 0.0 if length_sq == 0 else np.clip(((px - x1) * dx + (py - y1) * dy) / length_sq, 0, 1)
+        dist_sq = (px - (x1 + t * dx)) ** 2 + (py - (y1 + t * dy)) ** 2
+        mask[x0:x3, y0:y3] |= dist_sq <= half * half
+    return mask
+
+
+def distance_transform(mask):
+    # Exact Euclidean distance from every pixel to the nearest True pixel.
+    # Pass 1: distance along y within each column; pass 2: min over columns per row.
+    width, height = mask.shape
+    big = width + height
+    g = np.where(mask, 0, big).astype(np.int32)
+    for y in range(1, height):
+        np.minimum(g[:, y], g[:, y - 1] + 1, out=g[:, y])
+    for y in range(height - 2, -1, -1):
+        np.minimum(g[:, y], g[:, y + 1] + 1, out=g[:, y])
+
+    xs = np.arange(width)
+    dx_sq = (xs[:, None] - xs[None, :]) ** 2
+    g_sq = g.astype(np.int64) ** 2
+    dist_sq = np.empty((width, height), dtype=np.int64)
+    for y in range(height):
+        dist_sq[:, y] = (dx_sq + g_sq[None, :, y]).min(axis=1)
+    return np.sqrt(dist_sq).astype(np.float32)
+
+def summed_area_table(mask):
+    # sat[x, y] = number of True pixels in mask[:x, :y]
+    sat = np.zeros((mask.shape[0] + 1, mask.shape[1] + 1), dtype=np.int32)
+    np.cumsum(np.cumsum(mask, axis=0, dtype=np.int32), axis=1, out=sat[1:, 1:])
+    return sat
+
+
+# ================================
+# Disk tables
+# ================================
+# The cast_sensor_circle loop visits dx, dy in [-r, r) with dx^2 + dy^2 <= r^2.
+
+@functools.lru_cache(maxsize=None)
+def disk_offsets(radius):
+    d = np.arange(-radius, radius)
+    dx, dy = np.meshgrid(d, d, indexing="ij")
+    inside = dx ** 2 + dy ** 2 <= radius ** 2
+    return dx[inside], dy[inside]
+
+@functools.lru_cache(maxsize=None)
+def disk_spans(radius):
+    # Per column offset dx: the inclusive dy range [lo, hi] inside the disk
+    dx = np.arange(-radius, radius)
+    h = np.floor(np.sqrt(radius ** 2 - dx ** 2)).astype(np.int64)
+    return dx, -h, np.minimum(h, radius - 1)
+
+def disk_pixels(mask, x, y, radius):
+    # Pixel coordinates of the mask hits the loop would count, duplicates included.
+    # astype(int) truncates toward zero, matching int(self.x + dx).
+    width, height = mask.shape[:2]
+    dx, dy = disk_offsets(radius)
+    sx = (x + dx).astype(np.int64)
+    sy = (y + dy).astype(np.int64)
+    valid = (sx >= 0) & (sx < width) & (sy >= 0) & (sy < height)
+    sx, sy = sx[valid], sy[valid]
+    hit = mask[sx, sy]
+    return sx[hit], sy[hit]
+
+def count_in_disks(sat, mask, xs, ys, radius):
+    # Batched yellow count for car positions (xs, ys >= 0), identical to the per-pixel loop.
+    # Each disk is summed column by column from the summed-area table.
+    width, height = mask.shape
+    xs = np.atleast_1d(np.asarray(xs, dtype=float))
+    ys = np.atleast_1d(np.asarray(ys, dtype=float))
+    fx = np.floor(xs).astype(np.int64)[:, None]
+    fy = np.floor(ys).astype(np.int64)[:, None]
+    frac_x = (xs - np.floor(xs))[:, None] > 0
+    frac_y = (ys - np.floor(ys))[:, None] > 0
+    dx, lo, hi = disk_spans(radius)
+
+    # int(x + dx) truncates x + dx in (-1, 0) to 0, so column -1 folds onto column 0
+    col = fx + dx
+    col = np.where((col == -1) & frac_x, 0, col)
+    valid = (col >= 0) & (col < width)
+    col = np.clip(col, 0, width - 1)
+
+    top = fy + lo
+    bottom = fy + hi
+    y0 = np.clip(top, 0, height)
+    y1 = np.clip(bottom + 1, 0, height)
+    y1 = np.maximum(y0, y1)
+    counts = sat[col + 1, y1] - sat[col, y1] - sat[col + 1, y0] + sat[col, y0]
+
+    # Same folding for row -1 onto row 0
+    fold = frac_y & (top <= -1) & (bottom >= -1)
+    counts = counts + (fold & mask[col, 0])
+    return np.where(valid, counts, 0).sum(axis=1)
+
+
+# ================================
+# Line segments
+# ================================
+# Line pixels are sampled on a fixed lattice every `step` px (world-aligned, so the
+# samples do not shift as the car moves). Neighbouring samples are merged into long
+# segments: vertical runs of MIN_VERTICAL_RUN or more first, then horizontal runs of
+# what is left. A horizontal run covers exactly the 4 px stubs it replaces.
+
+LINE_STEP = 4
+MIN_VERTICAL_RUN = 3
+
+def _runs(mask):
+    # Runs of True along axis 0 -> (start, stop, column) arrays, stop exclusive
+    padded = np.zeros((mask.shape[0] + 2, mask.shape[1]), dtype=np.int8)
+    padded[1:-1] = mask
+    # Transposed so nonzero() orders by column first and starts pair with stops
+    edges = np.diff(padded, axis=0).T
+    col, start = np.nonzero(edges == 1)
+    _, stop = np.nonzero(edges == -1)
+    return start, stop, col
+
+def merge_line_samples(lattice, step=LINE_STEP):
+    # lattice: bool [i, j] for sample (i * step, j * step) -> int (N, 4) segments (x1, y1, x2, y2)
+    start, stop, col = _runs(lattice.T)
+    long = stop - start >= MIN_VERTICAL_RUN
+    start, stop, col = start[long], stop[long], col[long]
+    vertical = np.stack([col * step, start * step, col * step, (stop - 1) * step], axis=1)
+
+    rest = lattice.copy()
+    for j0, j1, i in zip(start.tolist(), stop.tolist(), col.tolist()):
+        rest[i, j0:j1] = False
+    start, stop, row = _runs(rest)
+    horizontal = np.stack([start * step - 2, row * step, (stop - 1) * step + 2, row * step], axis=1)
+    return np.concatenate([vertical, horizontal]).astype(np.int64).reshape(-1, 4)
+
+def segment_distances(segments, x, y):
+    # Distance from (x, y) to each segment
+    x1, y1, x2, y2 = (segments[:, i].astype(float) for i in range(4))
+    dx, dy = x2 - x1, y2 - y1
+    length_sq = dx * dx + dy * dy
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = np.where(length_sq > 0, ((x - x1) * dx + (y - y1) * dy) / length_sq, 0.0)
+    t = np.clip(t, 0, 1)
+    return np.hypot(x - (x1 + t * dx), y - (y1 + t * dy))
+
+
+# ================================
+# YellowMap
+# ================================
+
+class YellowMap:
+    def __init__(self, sensor_mask, line_mask=None, distance=None, sat=None, line_segments=None):
+        self.sensor_mask = sensor_mask                       # cast_sensor_circle pixels
+        self.line_mask = sensor_mask if line_mask is None else line_mask  # is_yellow pixels
+        self.width, self.height = sensor_mask.shape
+        self._distance = distance
+        self._sat = sat
+        self._segments = {} if line_segments is None else {LINE_STEP: line_segments}
+        self._buckets = {}
+
+    @property
+    def distance(self):
+        # Distance (px) from each pixel to the nearest parking line pixel
+        if self._distance is None:
+            self._distance = distance_transform(self.line_mask)
+        return self._distance
+
+    @property
+    def sat(self):
+        # Summed-area table of sensor_mask
+        if self._sat is None:
+            self._sat = summed_area_table(self.sensor_mask)
+        return self._sat
+
+    @classmethod
+    def from_rgb(cls, rgb):
+        return cls(sensor_yellow(rgb), line_yellow(rgb))
+
+    @classmethod
+    def from_surface(cls, surface):
+        import pygame
+        return cls.from_rgb(pygame.surfarray.array3d(surface))
+
+    @classmethod
+    def from_image(cls, path, size=(WIDTH, HEIGHT), cache_dir=None):
+        # Reuses the precomputed masks and distance field when the image is unchanged
+        cache = YellowCache(cache_dir or default_cache_dir(path))
+        key = image_key(path, size)
+        cached = cache.load(key)
+        if cached is not None:
+            return cached
+
+        import pygame
+        image = pygame.transform.scale(pygame.image.load(path), size)
+        yellow_map = cls.from_surface(image)
+        cache.save(key, yellow_map)
+        return yellow_map
+
+    @classmethod
+    def from_segments(cls, segments, size=(WIDTH, HEIGHT), thickness=7):
+        return cls(rasterize_segments(segments, size, thickness))
+
+    def count_in_disk(self, x, y, radius):
+        return int(count_in_disks(self.sat, self.sensor_mask, x, y, radius)[0])
+
+    def count_in_disks(self, xs, ys, radius):
+        # Many car positions at once -> int array of yellow counts
+        return count_in_disks(self.sat, self.sensor_mask, xs, ys, radius)
+
+    def points_in_disk(self, x, y, radius):
+        sx, sy = disk_pixels(self.sensor_mask, x, y, radius)
+        return list(zip(sx.tolist(), sy.tolist()))
+
+    def distance_to_line(self, x, y):
+        # Positions off the map (a car clamped onto the screen edge sits at x == width)
+        # read the nearest edge pixel
+        x = min(max(int(x), 0), self.width - 1)
+        y = min(max(int(y), 0), self.height - 1)
+        return float(self.distance[x, y])
+
+    def line_within(self, x, y, radius):
+        # Is any parking line pixel within radius of (x, y)?
+        return self.distance_to_line(x, y) <= radius
+
+    def count_in_rect(self, x0, y0, x1, y1):
+        # Yellow sensor pixels in [x0, x1) x [y0, y1), clipped to the map
+        x0, x1 = max(0, x0), min(self.width, x1)
+        y0, y1 = max(0, y0), min(self.height, y1)
+        if x0 >= x1 or y0 >= y1:
+            return 0
+        sat = self.sat
+        return int(sat[x1, y1] - sat[x0, y1] - sat[x1, y0] + sat[x0, y0])
+
+    def line_segments(self, step=LINE_STEP):
+        # Merged line segments for the whole map, computed once per step
+        if step not in self._segments:
+            self._segments[step] = merge_line_samples(self.line_mask[::step, ::step], step)
+        return self._segments[step]
+
+    def segment_buckets(self, step=LINE_STEP, cell_size=32):
+        # line_segments(step) indices per cell_size cell, for LineTracker; computed once
+        key = (step, cell_size)
+        if key not in self._buckets:
+            cols = -(-self.width // cell_size)
+            rows = -(-self.height // cell_size)
+            buckets = [[[] for _ in range(rows)] for _ in range(cols)]
+            for index, (x1, y1, x2, y2) in enumerate(self.line_segments(step).tolist()):
+                c0, c1 = max(0, min(x1, x2) // cell_size), min(cols - 1, max(x1, x2) // cell_size)
+                r0, r1 = max(0, min(y1, y2) // cell_size), min(rows - 1, max(y1, y2) // cell_size)
+                for c in range(c0, c1 + 1):
+                    for r in range(r0, r1 + 1):
+                        buckets[c][r].append(index)
+            arrays = [[np.array(b, dtype=np.int64) for b in column] for column in buckets]
+            occupied = np.array([[len(b) > 0 for b in column] for column in buckets], dtype=bool)
+            self._buckets[key] = arrays, occupied
+        return self._buckets[key]
+
+    def line_samples(self, car_position, sensor_range, step=4):
+        # Line pixels on a step px grid within sensor_range of the car, as a set of (x, y)
+        cx, cy = car_position
+        xs = np.arange(max(0, cx - sensor_range), min(self.width, cx + sensor_range), step)
+        ys = np.arange(max(0, cy - sensor_range), min(self.height, cy + sensor_range), step)
+        if len(xs) == 0 or len(ys) == 0:
+            return set()
+        px, py = np.meshgrid(xs, ys, indexing="ij")
+        keep = (np.hypot(px - cx, py - cy) <= sensor_range) & self.line_mask[px, py]
+        return set(zip(px[keep].tolist(), py[keep].tolist()))
+
+
+class LineTracker:
+    # Keeps the set of merged line segments within `radius` of the car. Segments are
+    # bucketed into coarse cells; on each update only cells that straddle the previous
+    # or current disk edge (the annulus between the two disks) are re-tested, since a
+    # segment entirely inside or outside both disks cannot change state.
+    def __init__(self, yellow_map, radius, step=LINE_STEP, cell_size=32):
+        self.segments = yellow_map.line_segments(step)
+        self.radius = radius
+        self.cell_size = cell_size
+        self.buckets, self.occupied = yellow_map.segment_buckets(step, cell_size)
+        cols, rows = self.occupied.shape
+        self.cell_x0 = np.arange(cols)[:, None] * cell_size
+        self.cell_y0 = np.arange(rows)[None, :] * cell_size
+        self.reset()
+
+    def reset(self):
+        self.active = np.zeros(len(self.segments), dtype=bool)
+        self.center = None
+
+    def active_indices(self):
+        return np.nonzero(self.active)[0]
+
+    def _cell_extents(self, x, y, cols, rows):
+        # Nearest and farthest distance from (x, y) to the cells in the cols x rows window
+        size = self.cell_size
+        x0, y0 = self.cell_x0[cols], self.cell_y0[:, rows]
+        near_x = np.maximum(np.maximum(x0 - x, x - (x0 + size)), 0)
+        near_y = np.maximum(np.maximum(y0 - y, y - (y0 + size)), 0)
+        far_x = np.maximum(np.abs(x - x0), np.abs(x - (x0 + size)))
+        far_y = np.maximum(np.abs(y - y0), np.abs(y - (y0 + size)))
+        return np.hypot(near_x, near_y), np.hypot(far_x, far_y)
+
+    def update(self, x, y):
+        # Move the disk to (x, y) -> (added, removed) segment indices
+        if self.center == (x, y):
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty
+        radius, size = self.radius, self.cell_size
+        # Cells outside the bounding box of both disks are outside both, so only the
+        # window around them is tested
+        ox, oy = (x, y) if self.center is None else self.center
+        n_cols, n_rows = self.occupied.shape
+        c0, c1 = max(0, int((min(x, ox) - radius) // size)), min(n_cols, int((max(x, ox) + radius) // size) + 1)
+        r0, r1 = max(0, int((min(y, oy) - radius) // size)), min(n_rows, int((max(y, oy) + radius) // size) + 1)
+        window = slice(c0, c1), slice(r0, r1)
+        near, far = self._cell_extents(x, y, *window)
+        inside = far <= radius
+        outside = near > radius
+        if self.center is None:
+            changed = ~outside
+        else:
+            old_near, old_far = self._cell_extents(*self.center, *window)
+            changed = ~((inside & (old_far <= radius)) | (outside & (old_near > radius)))
+        self.center = (x, y)
+
+        cols, rows = np.nonzero(changed & self.occupied[window])
+        if not len(cols):
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty
+        cols, rows = cols + c0, rows + r0
+        buckets = self.buckets
+        candidates = np.unique(np.concatenate([buckets[c][r] for c, r in zip(cols.tolist(), rows.tolist())]))
+        within = segment_distances(self.segments[candidates], x, y) <= radius
+        was = self.active[candidates]
+        added, removed = candidates[within & ~was], candidates[~within & was]
+        self.active[added] = True
+        self.active[removed] = False
+        return added, removed
+
+
+# ================================
+# On-disk cache
+# ================================
+# One set of .npy files per (image bytes, size, thresholds) hash, loaded memory-mapped.
+
+CACHE_VERSION = 2
+CACHE_ARRAYS = ("sensor_mask", "line_mask", "distance", "sat", "line_segments")
+
+def default_cache_dir(path):
+    return os.path.join(os.path.dirname(os.path.abspath(path)), ".yellow_cache")
+
+def image_key(path, size):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        digest.update(f.read())
+    digest.update(f"{size[0]}x{size[1]}:v{CACHE_VERSION}".encode())
+    return digest.hexdigest()[:16]
+
+
+class YellowCache:
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _path(self, key, name):
+        return os.path.join(self.directory, f"{key}_{name}.npy")
+
+    def load(self, key):
+        paths = [self._path(key, name) for name in CACHE_ARRAYS]
+        if not all(os.path.exists(p) for p in paths):
+            return None
+        sensor_mask, line_mask, distance, sat, segments = (np.load(p, mmap_mode="r") for p in paths)
+        return YellowMap(sensor_mask, line_mask, distance, sat, np.asarray(segments))
+
+    def save(self, key, yellow_map):
+        os.makedirs(self.directory, exist_ok=True)
+        for name in CACHE_ARRAYS:
+            # Write then rename so a crashed precompute never leaves a half file behind
+            path = self._path(key, name)
+            tmp = path + ".tmp.npy"
+            array = yellow_map.line_segments() if name == "line_segments" else getattr(yellow_map, name)
+            np.save(tmp, np.ascontiguousarray(array))
+            os.replace(tmp, path)
+
+
+if __name__ == "__main__":
+    # Precompute: python yellow.py background.png [cache_dir]
+    from assets import asset_path
+    image_path = sys.argv[1] if len(sys.argv) > 1 else asset_path("background.png")
+    yellow_map = YellowMap.from_image(image_path, cache_dir=sys.argv[2] if len(sys.argv) > 2 else None)
+    print(f"{image_path}: {int(yellow_map.sensor_mask.sum())} sensor pixels, "
+          f"{int(yellow_map.line_mask.sum())} line pixels cached")